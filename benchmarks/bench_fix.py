@@ -0,0 +1,66 @@
+"""Compare regex rules against FIX field rules on the example configs.
+
+    python benchmarks/bench_fix.py [--lines N] [--padding N]
+
+Both configs describe the same order lifecycle; the generated messages are
+'|' delimited with named tags so that both rule sets classify them.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from logfsm.config import Config
+from logfsm.rule_engine import compile_rules, classify_line_ids
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+MESSAGES = [
+    ("NewOrderSingle", {"OrdType": "2", "Side": "1"}),
+    ("ExecutionReport", {"ExecType": "0", "OrdStatus": "0", "LeavesQty": "100"}),
+    ("ExecutionReport", {"ExecType": "F", "OrdStatus": "1", "LeavesQty": "40"}),
+    ("ExecutionReport", {"ExecType": "F", "OrdStatus": "2", "LeavesQty": "0"}),
+    ("ExecutionReport", {"ExecType": "8", "OrdStatus": "8", "LeavesQty": "0"}),
+    ("Heartbeat", {}),
+]
+
+
+def make_lines(n, padding, seed=1):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n):
+        msg_type, fields = rng.choice(MESSAGES)
+        parts = [f"2023-10-26T12:{i // 60000 % 60:02d}:{i // 1000 % 60:02d}.{i % 1000:03d} INFO {msg_type}"]
+        parts += [f"Text{j}=FILLER{rng.randrange(10**6)}" for j in range(padding)]
+        parts += [f"{k}={v}" for k, v in fields.items()]
+        parts.append(f"ClOrdID=ORD{rng.randrange(n // 4 + 1)}")
+        lines.append("|".join(parts))
+    return lines
+
+
+def bench(name, cfg_path, lines):
+    compiled = compile_rules(Config.load(cfg_path))
+    start = time.perf_counter()
+    matched = sum(1 for ln in lines if classify_line_ids(ln, compiled) is not None)
+    elapsed = time.perf_counter() - start
+    print(f"{name:6s} {len(lines) / elapsed:12,.0f} lines/s  {matched} FSM events  {elapsed:.3f}s")
+    return elapsed
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--lines", type=int, default=100_000)
+    p.add_argument("--padding", type=int, default=20, help="extra fields per message")
+    args = p.parse_args()
+
+    lines = make_lines(args.lines, args.padding)
+    regex = bench("regex", os.path.join(EXAMPLES, "rules.example.yaml"), lines)
+    fix = bench("fix", os.path.join(EXAMPLES, "rules.fix.example.yaml"), lines)
+    print(f"fix speedup: {regex / fix:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Scaling of threaded classification across thread counts.
+
+    python benchmarks/bench_threads.py [--entities N] [--rules N] [--threads 1,2,4,8,16,32]
+
+Runs classify_threaded over a synthetic log (see benchmarks.loggen) with
+each available regex engine. On a standard CPython build with the stdlib
+re engine threads only add overhead; speedups need a free-threaded build or
+the regex package, which releases the GIL while matching.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from logfsm.config import Config
+from logfsm.rule_engine import compile_rules, classify_threaded, gil_enabled, REGEX_ENGINES
+
+from benchmarks.loggen import LogSpec, generate_lines, make_config
+
+
+def available_engines():
+    engines = []
+    for name in REGEX_ENGINES:
+        try:
+            __import__(name)
+        except ImportError:
+            continue
+        engines.append(name)
+    return engines
+
+
+def bench(lines, compiled, threads, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        classify_threaded(lines, compiled, threads)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--entities", type=int, default=20000)
+    p.add_argument("--rules", type=int, default=50)
+    p.add_argument("--threads", default="1,2,4,8,16,32", help="comma-separated thread counts")
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args()
+
+    spec = LogSpec(entities=args.entities, rules=args.rules)
+    lines = generate_lines(spec)
+    counts = [int(n) for n in args.threads.split(",")]
+    print(f"{len(lines):,} lines, {args.rules} rules, Python {sys.version.split()[0]}, "
+          f"GIL {'enabled' if gil_enabled() else 'disabled'}, {os.cpu_count()} CPUs")
+
+    for engine in available_engines():
+        cfg = Config(dict(make_config(spec), regex_engine=engine))
+        compiled = compile_rules(cfg)
+        base = None
+        for threads in counts:
+            elapsed = bench(lines, compiled, threads, args.repeat)
+            base = elapsed if base is None else base
+            print(f"{engine:6s} {threads:3d} threads {len(lines) / elapsed:12,.0f} lines/s  "
+                  f"{base / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Synthetic order-log generator for benchmarks.
+
+    python -m benchmarks.loggen --entities 10000 --rules 50 --config-out rules.yaml > synth.log
+
+Every entity walks through `states_per_entity` events, each produced by one
+of `rules` generated rules; the matching rules config is returned alongside
+(and written with --config-out) so the log can be fed to logfsm directly.
+"""
+import argparse
+import random
+import sys
+from dataclasses import dataclass, asdict
+
+from logfsm.normalizer import ns_to_timestamp
+
+BASE_EPOCH_NS = 1698321600 * 10**9  # 2023-10-26T12:00:00Z
+LINE_SPACING_NS = 7 * 10**6
+
+
+@dataclass
+class LogSpec:
+    entities: int = 5000
+    states_per_entity: int = 4
+    rules: int = 10
+    line_length: int = 120
+    match_ratio: float = 0.8
+    out_of_order: float = 0.05
+    seed: int = 1
+
+
+def make_config(spec: LogSpec) -> dict:
+    rules = []
+    for i in range(spec.rules):
+        rules.append({
+            "name": f"RULE_{i:04d}",
+            "regex": f"(?i)evt{i:04d} .*oid=(?P<order_id>[A-Z0-9]+)",
+            "state": f"STATE_{i % max(1, spec.states_per_entity * 2):03d}",
+        })
+    return {
+        "signal_rules": rules,
+        "entity_id_field": "order_id",
+        "start_state": "START",
+        "unknown_state": "UNKNOWN",
+    }
+
+
+def _pad(line: str, length: int, rng) -> str:
+    filler = []
+    size = len(line)
+    while size < length:
+        word = f"k{rng.randrange(100)}=v{rng.randrange(10**6)}"
+        filler.append(word)
+        size += len(word) + 1
+    return line + (" " + " ".join(filler) if filler else "")
+
+
+def generate_lines(spec: LogSpec):
+    # returns the log lines for spec; matched lines carry a rule keyword and
+    # an entity id, the rest are noise that matches no rule
+    if not 0 < spec.match_ratio <= 1:
+        raise ValueError("match_ratio must be in (0, 1]")
+    rng = random.Random(spec.seed)
+    matched = spec.entities * spec.states_per_entity
+    noise = round(matched * (1 - spec.match_ratio) / spec.match_ratio)
+    total = matched + noise
+
+    # interleave entity lifecycles at random
+    kinds = [e for e in range(spec.entities) for _ in range(spec.states_per_entity)]
+    kinds += [None] * noise
+    rng.shuffle(kinds)
+
+    lines = []
+    for n, entity in enumerate(kinds):
+        ts = ns_to_timestamp(BASE_EPOCH_NS + n * LINE_SPACING_NS)
+        if entity is None:
+            body = f"{ts} INFO heartbeat seq={rng.randrange(10**6)}"
+        else:
+            rule = rng.randrange(spec.rules)
+            body = f"{ts} INFO EVT{rule:04d} status=ok oid=ORD{entity:08d}"
+        lines.append(_pad(body, spec.line_length, rng))
+
+    # out-of-order lines: swap random neighbours
+    if total > 1:
+        for _ in range(int(total * spec.out_of_order)):
+            i = rng.randrange(total - 1)
+            lines[i], lines[i + 1] = lines[i + 1], lines[i]
+    return lines
+
+
+def main():
+    p = argparse.ArgumentParser(description="Generate a synthetic order log on stdout")
+    defaults = LogSpec()
+    for name, value in asdict(defaults).items():
+        p.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    p.add_argument("--config-out", help="write the matching rules.yaml here")
+    args = p.parse_args()
+    spec = LogSpec(**{k: getattr(args, k) for k in asdict(defaults)})
+
+    if args.config_out:
+        import yaml
+        with open(args.config_out, "w", encoding="utf-8") as f:
+            yaml.safe_dump(make_config(spec), f, sort_keys=False)
+    out = sys.stdout
+    for line in generate_lines(spec):
+        out.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Throughput benchmarks for the logfsm pipeline stages.
+
+    python -m benchmarks.run                       # print lines/s per stage
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json --tolerance 0.25
+
+Each stage runs over the same synthetic log (see benchmarks.loggen) and
+reports items/s and the process peak RSS after the stage. --compare exits
+non-zero when a stage's throughput falls more than --tolerance below the
+baseline. Baselines are machine specific: regenerate them on the machine
+that runs the comparison.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from dataclasses import asdict
+
+from logfsm.config import Config
+from logfsm.rule_engine import compile_rules, classify_line, classify_line_ids, classify_batch
+from logfsm.normalizer import normalize_line
+from logfsm.rule_suggester import suggest_rules_from_lines
+from logfsm.fsm_builder import build_fsm, build_fsm_ids, fsm_to_dot
+from logfsm.stats import peak_rss_mb
+
+from .loggen import LogSpec, generate_lines, make_config
+
+
+def _time(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_benchmarks(spec: LogSpec, repeat: int = 1) -> dict:
+    lines = generate_lines(spec)
+    cfg = Config(make_config(spec))
+    compiled = compile_rules(cfg)
+    stages = {}
+
+    def stage(name, fn, items):
+        seconds, result = _time(fn, repeat)
+        stages[name] = {
+            "seconds": seconds,
+            "items": items,
+            "items_per_s": items / seconds if seconds else None,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        return result
+
+    n = len(lines)
+    stage("normalize_line", lambda: [normalize_line(ln) for ln in lines], n)
+    events = stage("classify_line", lambda: [classify_line(ln, compiled, cfg) for ln in lines], n)
+    records = stage("classify_line_ids", lambda: [r for r in (classify_line_ids(ln, compiled) for ln in lines) if r], n)
+    stage("classify_batch", lambda: classify_batch(lines, compiled), n)
+    unmatched = [ev.raw_line for ev in events if ev.rule_name is None]
+    stage("suggest_rules_from_lines", lambda: suggest_rules_from_lines(unmatched), len(unmatched))
+    fsm_events = [ev for ev in events if ev.entity_id and ev.state]
+    fsm = stage("build_fsm", lambda: build_fsm(fsm_events, cfg.start_state), len(fsm_events))
+    stage("build_fsm_ids", lambda: build_fsm_ids(records, compiled.start_id, compiled.symbols), len(records))
+    edges = sum(len(d) for d in fsm.transitions.values())
+    stage("fsm_to_dot", lambda: fsm_to_dot(fsm), edges)
+
+    def end_to_end():
+        recs = []
+        for ln in lines:
+            rec = classify_line_ids(ln, compiled)
+            if rec is not None:
+                recs.append(rec)
+        return fsm_to_dot(build_fsm_ids(recs, compiled.start_id, compiled.symbols))
+
+    stage("end_to_end", end_to_end, n)
+
+    return {
+        "spec": asdict(spec),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "lines": n,
+        "stages": stages,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    # list of regression messages for stages slower than baseline by more
+    # than tolerance (a fraction of the baseline throughput)
+    problems = []
+    if results["spec"] != baseline.get("spec"):
+        problems.append("baseline was recorded with a different log spec")
+        return problems
+    for name, base in baseline.get("stages", {}).items():
+        cur = results["stages"].get(name)
+        if cur is None or not base.get("items_per_s") or not cur.get("items_per_s"):
+            continue
+        floor = base["items_per_s"] * (1 - tolerance)
+        if cur["items_per_s"] < floor:
+            problems.append(
+                f"{name}: {cur['items_per_s']:,.0f}/s is below baseline "
+                f"{base['items_per_s']:,.0f}/s (-{tolerance:.0%} allowed)"
+            )
+    return problems
+
+
+def format_results(results: dict) -> str:
+    rows = [f"{results['lines']:,} lines, Python {results['python']}",
+            f"{'stage':26s} {'items/s':>14s} {'seconds':>9s} {'peak MB':>9s}"]
+    for name, st in results["stages"].items():
+        rss = f"{st['peak_rss_mb']:9.1f}" if st["peak_rss_mb"] is not None else f"{'-':>9s}"
+        rate = f"{st['items_per_s']:14,.0f}" if st["items_per_s"] else f"{'-':>14s}"
+        rows.append(f"{name:26s} {rate} {st['seconds']:9.3f} {rss}")
+    return "\n".join(rows)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark logfsm pipeline stages on a synthetic log")
+    defaults = LogSpec()
+    for name, value in asdict(defaults).items():
+        p.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    p.add_argument("--repeat", type=int, default=3, help="keep the best of N runs per stage")
+    p.add_argument("--json", help="write results as JSON to this path")
+    p.add_argument("--save-baseline", help="write results as the new baseline")
+    p.add_argument("--compare", help="baseline JSON to compare against")
+    p.add_argument("--tolerance", type=float, default=0.25)
+    args = p.parse_args(argv)
+    spec = LogSpec(**{k: getattr(args, k) for k in asdict(defaults)})
+
+    results = run_benchmarks(spec, repeat=args.repeat)
+    print(format_results(results))
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline, args.tolerance)
+        for msg in problems:
+            print(f"REGRESSION {msg}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
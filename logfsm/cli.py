@@ -1,11 +1,14 @@
 import sys
 import argparse
-from .config import Config
-from .rule_engine import compile_rules, classify_line
-from .rule_suggester import suggest_rules_from_lines
-from .fsm_builder import build_fsm, fsm_to_dot
+
+# Subcommand dependencies are imported inside the commands so that starting
+# logfsm only pays for argparse; see TestStartup in tests/test_cli.py.
 
 def cmd_suggest_rules(args):
+    from .config import Config
+    from .rule_engine import compile_rules, classify_line
+    from .rule_suggester import suggest_rules_from_lines
+
     raw_lines = [line.rstrip("\n") for line in sys.stdin]
 
     cfg = Config.load(args.config) if args.config else Config({"signal_rules": []})
@@ -18,46 +21,362 @@ def cmd_suggest_rules(args):
             unmatched.append(ln)
 
     suggestions = suggest_rules_from_lines(unmatched, top_n=args.top_n)
+    print_suggestions(suggestions)
 
-    print("# Suggested candidate patterns (normalized form, count):")
+    if args.save is not None:
+        save_suggestions(suggestions, args.config, args.save)
+        print(f"\nWrote draft rules to {args.save}")
+
+def print_suggestions(suggestions, file=None):
+    print("# Suggested candidate patterns (normalized form, count):", file=file)
     for pattern, count in suggestions:
-        print(f"- {count}x  {pattern}")
+        print(f"- {count}x  {pattern}", file=file)
+
+def save_suggestions(suggestions, config_path, path):
+    from .config import Config
+    cfg_out = Config.load(config_path) if config_path else Config({"signal_rules": []})
+    for i, (pattern, count) in enumerate(suggestions):
+        cfg_out.signal_rules.append({
+            "name": f"AUTO_RULE_{i}",
+            "regex": pattern,
+            "state": "TBD_STATE"
+        })
+    cfg_out.save(path)
+
+def cmd_analyze(args):
+    # suggest-rules and build-fsm over a single read and classification of
+    # stdin: unmatched lines feed rule mining (already normalized by
+    # classify_line) and FSM events feed build_fsm
+    from .config import Config
+    from .rule_engine import compile_rules, classify_line
+    from .fsm_builder import build_fsm
+    from .rule_suggester import suggest_rules_from_normalized
+    from .stats import PipelineStats, NULL_STATS
 
+    stats = NULL_STATS
+    if args.stats or args.stats_json:
+        stats = PipelineStats()
+
+    with stats.stage("load_config"):
+        cfg = Config.load(args.config)
+        compiled = compile_rules(cfg)
+
+    unmatched = []
+    events = []
+    classifier = None
+    with stats.stage("classify"):
+        if args.cache:
+            classified = classify_cached([ln.rstrip("\n") for ln in stats.track_lines(sys.stdin)],
+                                         compiled, cfg, args.cache)
+        elif args.templates:
+            classifier = template_classifier(compiled, cfg, args.templates)
+            classified = (classifier.classify(ln.rstrip("\n")) for ln in stats.track_lines(sys.stdin))
+        else:
+            classified = (classify_line(ln.rstrip("\n"), compiled, cfg) for ln in stats.track_lines(sys.stdin))
+        for ev in classified:
+            if ev.rule_name is None:
+                unmatched.append(ev.normalized_line)
+            elif ev.entity_id and ev.state:
+                events.append(ev)
+        if cfg.alias_fields:
+            from .correlate import correlate_events
+            events = correlate_events(events)
+        if cfg.terminal_states or cfg.entity_ttl:
+            from .lifecycle import split_lifecycles
+            events = list(split_lifecycles(events, cfg.terminal_states, cfg.entity_ttl))
+    stats.set("unmatched_lines", len(unmatched))
+    stats.set("fsm_events", len(events))
+
+    with stats.stage("suggest_rules"):
+        suggestions = suggest_rules_from_normalized(unmatched, top_n=args.top_n)
+    # stdout carries the DOT unless --output-dot is given
+    print_suggestions(suggestions, file=sys.stderr if not args.output_dot else None)
     if args.save is not None:
-        cfg_out = Config.load(args.config) if args.config else Config({"signal_rules": []})
-        for i, (pattern, count) in enumerate(suggestions):
-            cfg_out.signal_rules.append({
-                "name": f"AUTO_RULE_{i}",
-                "regex": pattern,
-                "state": "TBD_STATE"
-            })
-        cfg_out.save(args.save)
-        print(f"\nWrote draft rules to {args.save}")
+        save_suggestions(suggestions, args.config, args.save)
+        print(f"Wrote draft rules to {args.save}", file=sys.stderr)
+
+    with stats.stage("build_fsm"):
+        fsm = build_fsm(events, cfg.start_state, latency=args.latency)
+    finish_build(fsm, args, stats, classifier=classifier)
+
+def classify_cached(lines, compiled, cfg, cache_path):
+    from .incremental import ClassificationCache, classify_incremental
+    events, cache, reevaluated = classify_incremental(lines, compiled, cfg, ClassificationCache.load(cache_path))
+    cache.save(cache_path)
+    print(f"{reevaluated} of {len(lines)} lines re-evaluated (classification cache {cache_path})", file=sys.stderr)
+    return events
+
+def iter_classified(lines, compiled, cfg, classifier=None):
+    from .rule_engine import classify_line
+    if classifier is not None:
+        classified = (classifier.classify(ln.rstrip("\n")) for ln in lines)
+    else:
+        classified = (classify_line(ln.rstrip("\n"), compiled, cfg) for ln in lines)
+    for ev in classified:
+        if ev.entity_id and ev.state:
+            yield ev
+
+def template_classifier(compiled, cfg, capacity):
+    from .templates import TemplateClassifier
+    return TemplateClassifier(compiled, cfg, capacity)
+
+def report_templates(classifier):
+    lines = classifier.hits + classifier.misses
+    print(f"{classifier.hits} of {lines} lines classified from cached templates "
+          f"({classifier.misses} templates evaluated)", file=sys.stderr)
 
 def cmd_build_fsm(args):
-    raw_lines = [line.rstrip("\n") for line in sys.stdin]
+    import functools
+    from .config import Config
+    from .rule_engine import compile_rules, classify_line_ids
+    from .fsm_builder import build_fsm, build_fsm_ids
+    from .stats import PipelineStats, NULL_STATS
+
+    stats = NULL_STATS
+    if args.stats or args.stats_json or args.progress:
+        stats = PipelineStats(progress_every=args.progress)
+
+    with stats.stage("load_config"):
+        cfg = Config.load(args.config)
+        compiled = compile_rules(cfg)
+
+    # per-template classification; otherwise every line is matched against
+    # the rules
+    classifier = None
+    classify_ids = functools.partial(classify_line_ids, compiled_rules=compiled)
+    if args.templates:
+        classifier = template_classifier(compiled, cfg, args.templates)
+        classify_ids = classifier.classify_ids
+
+    paths = None
+    if args.variants:
+        from .paths import make_collector
+        paths = make_collector(args.variant_capacity)
+
+    dimensions = None
+    if args.output_dimensions:
+        from .dimensions import DimensionBreakdown
+        dimensions = DimensionBreakdown(cfg.dimensions, cfg.dimension_limit)
+
+    # aliases can link ids after their first events, and dimension values
+    # are read from the events, so both need every ClassifiedEvent in
+    # memory before any entity is counted
+    full_events = bool(cfg.alias_fields) or dimensions is not None
+    lifecycle = cfg.terminal_states or cfg.entity_ttl
+    if args.threads and (lifecycle or cfg.alias_fields):
+        print("--threads has no effect with terminal_states, entity_ttl or alias_fields in the config",
+              file=sys.stderr)
+    if args.spill_mb and cfg.alias_fields:
+        print("--spill-mb has no effect with alias_fields in the config: every event is kept in memory",
+              file=sys.stderr)
+    if lifecycle and not (args.save_events or args.window or args.latency or full_events):
+        # stream stdin so memory stays proportional to in-flight entities;
+        # reading, classification and building share one stage here
+        from .lifecycle import build_fsm_streaming
+        with stats.stage("stream"):
+            events = iter_classified(stats.track_lines(sys.stdin), compiled, cfg, classifier)
+            fsm = build_fsm_streaming(events, cfg.start_state, cfg.terminal_states, cfg.entity_ttl, paths)
+        finish_build(fsm, args, stats, paths, classifier=classifier)
+        return
+
+    if args.spill_mb and not (args.save_events or args.window or full_events):
+        # bounded memory: classify straight from stdin and group events by
+        # entity in sorted runs on disk instead of in per-entity lists
+        from .spill import build_fsm_external, build_fsm_ids_external
+        names = None
+        with stats.stage("stream"):
+            lines = stats.track_lines(sys.stdin)
+            if args.latency:
+                events = iter_classified(lines, compiled, cfg, classifier)
+                if lifecycle:
+                    from .lifecycle import split_lifecycles
+                    events = split_lifecycles(events, cfg.terminal_states, cfg.entity_ttl)
+                fsm = build_fsm_external(events, cfg.start_state, True, paths, args.spill_mb)
+            else:
+                records = (rec for rec in (classify_ids(ln.rstrip("\n")) for ln in lines)
+                           if rec is not None)
+                fsm = build_fsm_ids_external(records, compiled.start_id, compiled.symbols, paths, args.spill_mb)
+                names = compiled.symbols.names
+        finish_build(fsm, args, stats, paths, names, classifier)
+        return
+
+    with stats.stage("read"):
+        raw_lines = [line.rstrip("\n") for line in stats.track_lines(sys.stdin)]
+
+    if not (args.save_events or args.window or args.latency or full_events):
+        # plain FSM: stay on symbol ids and skip normalization entirely
+        with stats.stage("classify"):
+            records = []
+            if args.threads and classifier is None:
+                from .rule_engine import iter_classified_batches
+                for batch in iter_classified_batches(raw_lines, compiled, args.threads):
+                    records.extend(batch.records())
+            else:
+                for ln in raw_lines:
+                    rec = classify_ids(ln)
+                    if rec is not None:
+                        records.append(rec)
+        stats.set("fsm_events", len(records))
+        if stats.enabled:
+            stats.set("entities", len({rec[0] for rec in records}))
+        with stats.stage("build_fsm"):
+            fsm = build_fsm_ids(records, compiled.start_id, compiled.symbols, paths)
+        finish_build(fsm, args, stats, paths, compiled.symbols.names, classifier)
+        return
+
+    with stats.stage("classify"):
+        classified_events = list(iter_classified(raw_lines, compiled, cfg, classifier))
+        if cfg.alias_fields:
+            from .correlate import correlate_events
+            classified_events = correlate_events(classified_events)
+        if lifecycle:
+            # same restarts as the streaming path, but with every event kept
+            from .lifecycle import split_lifecycles
+            classified_events = list(split_lifecycles(classified_events, cfg.terminal_states, cfg.entity_ttl))
+    stats.set("fsm_events", len(classified_events))
+    if stats.enabled:
+        stats.set("entities", len({ev.entity_id for ev in classified_events}))
+
+    if args.save_events:
+        from .event_store import write_event_store
+        with stats.stage("save_events"):
+            n = write_event_store(args.save_events, classified_events, cfg.start_state)
+        print(f"{n} classified events written to {args.save_events}", file=sys.stderr)
+
+    if args.window:
+        if classifier is not None:
+            report_templates(classifier)
+        with stats.stage("render"):
+            write_output(window_dots(classified_events, cfg.start_state, args), args.output_dot)
+        stats.report(args.stats, args.stats_json)
+        return
+
+    with stats.stage("build_fsm"):
+        fsm = build_fsm(classified_events, cfg.start_state, latency=args.latency, paths=paths,
+                        dimensions=dimensions)
+    if dimensions is not None:
+        write_dimensions(dimensions, args.output_dimensions)
+    finish_build(fsm, args, stats, paths, classifier=classifier)
+
+def finish_build(fsm, args, stats, paths=None, names=None, classifier=None):
+    if classifier is not None:
+        report_templates(classifier)
+    stats.set("edges", sum(len(dests) for dests in fsm.transitions.values()))
+    with stats.stage("render"):
+        write_fsm(fsm, args)
+        if paths is not None:
+            write_variants(paths, args, names)
+    stats.report(args.stats, args.stats_json)
+
+def write_variants(paths, args, names=None):
+    from .paths import variants_to_json
+    with open(args.variants, "w", encoding="utf-8") as f:
+        f.write(variants_to_json(paths, args.top_variants, names))
+    print(f"Top {args.top_variants} lifecycle variants written to {args.variants}", file=sys.stderr)
+
+def write_dimensions(dimensions, path):
+    from .dimensions import dimensions_to_json
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(dimensions_to_json(dimensions))
+    print(f"Per-dimension FSMs ({', '.join(dimensions.names)}) written to {path}", file=sys.stderr)
+
+def write_fsm(fsm, args):
+    from .writers import write_fsm_file
+    write_dot(fsm, args.output_dot, args.min_count, args.top_k)
+    for fmt, path in (("json", args.output_json), ("csv", args.output_csv), ("npz", args.output_npz)):
+        if path:
+            write_fsm_file(fsm, path, fmt)
+            print(f"FSM {fmt.upper()} written to {path}", file=sys.stderr)
+
+def window_dots(events, start_state, args):
+    from .fsm_builder import fsm_to_dot
+    from .models import FSM
+    from .normalizer import ns_to_timestamp
+    from .windows import iter_window_fsms, diff_fsms
+
+    parts = []
+    prev = FSM(transitions={})
+    for start, fsm in iter_window_fsms(events, start_state, args.window, args.slide):
+        if args.window_diff:
+            fsm, prev = diff_fsms(prev, fsm), fsm
+        parts.append(f"// window {ns_to_timestamp(start)} +{args.window:g}s")
+        parts.append(fsm_to_dot(fsm))
+    return "\n".join(parts)
+
+def cmd_fsm_from_events(args):
+    if args.workers:
+        from .parallel import build_fsm_from_store_sharded
+        fsm = build_fsm_from_store_sharded(args.events, args.start_state, args.workers)
+    else:
+        from .event_store import EventStore
+        from .fsm_builder import build_fsm_from_store
+        with EventStore(args.events) as store:
+            fsm = build_fsm_from_store(store, args.start_state)
+    write_dot(fsm, args.output_dot)
+
+def cmd_check(args):
+    import json
+    from .config import Config
+    from .rule_engine import compile_rules, first_match, ids_from_match
+    from .conformance import ConformanceChecker, load_model
 
     cfg = Config.load(args.config)
     compiled = compile_rules(cfg)
+    correlator = None
+    if cfg.alias_fields:
+        from .correlate import EntityCorrelator
+        correlator = EntityCorrelator()
+    checker = ConformanceChecker(load_model(args.model), cfg.start_state, cfg.terminal_states,
+                                 compiled.symbols, cfg.entity_ttl, correlator)
 
-    classified_events = []
-    for ln in raw_lines:
-        ev = classify_line(ln, compiled, cfg)
-        if ev.entity_id and ev.state:
-            classified_events.append(ev)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for ln in sys.stdin:
+            ln = ln.rstrip("\n")
+            rule, m = first_match(ln, compiled)
+            rec = ids_from_match(ln, rule, m)
+            if rec is None:
+                continue
+            entity_id, ts, state_id, rule_id = rec
+            aliases = ()
+            if correlator is not None:
+                aliases = tuple(a for a in map(m.group, rule.alias_groups) if a)
+            edge = checker.check(entity_id, state_id, rule_id, ts, aliases)
+            if edge is not None:
+                from_state, to_state, trigger = checker.describe(edge)
+                out.write(json.dumps({"entity": entity_id, "from": from_state, "to": to_state,
+                                      "trigger": trigger, "timestamp": ts, "line": ln}) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
 
-    fsm = build_fsm(classified_events, cfg.start_state)
-    dot = fsm_to_dot(fsm)
+    print(f"{checker.events} events checked, {checker.violations} violations", file=sys.stderr)
+    if checker.violations:
+        sys.exit(1)
 
-    if args.output_dot:
-        with open(args.output_dot, "w", encoding="utf-8") as f:
+def write_dot(fsm, output_dot, min_count=0, top_k=None):
+    from .writers import write_dot as stream_dot, write_fsm_file
+    if output_dot:
+        write_fsm_file(fsm, output_dot, "dot", min_count, top_k)
+        print(f"FSM DOT written to {output_dot}")
+    else:
+        stream_dot(fsm, sys.stdout, min_count, top_k)
+
+def write_output(dot, output_dot):
+    if output_dot:
+        with open(output_dot, "w", encoding="utf-8") as f:
             f.write(dot)
-        print(f"FSM DOT written to {args.output_dot}")
+        print(f"FSM DOT written to {output_dot}")
     else:
         print(dot)
 
 def main():
     p = argparse.ArgumentParser(prog="logfsm", description="Log → Rules → FSM tool")
+    p.add_argument("--profile", metavar="OUT", help="profile the command and write the profile to OUT")
+    p.add_argument("--profile-mode", default="cprofile",
+                   help="cprofile: deterministic, pstats output; sample: low-overhead sampling, collapsed stacks for flame graphs")
+    p.add_argument("--profile-interval", type=float, default=0.001, help="sampling interval in seconds")
     sub = p.add_subparsers(dest="cmd", required=True)
 
     p_rules = sub.add_parser("suggest-rules", help="Mine candidate regex rules from stdin logs")
@@ -66,13 +385,95 @@ def main():
     p_rules.add_argument("--save", help="write updated draft config to this path")
     p_rules.set_defaults(func=cmd_suggest_rules)
 
+    p_analyze = sub.add_parser("analyze", help="Suggest rules and build the FSM from one classification of stdin logs")
+    p_analyze.add_argument("--config", required=True, help="rules.yaml with signal_rules[] etc")
+    p_analyze.add_argument("--top-n", type=int, default=20)
+    p_analyze.add_argument("--save", help="write updated draft config to this path")
+    p_analyze.add_argument("--cache", help="classification cache; after a rule edit only lines the changed rules can affect are re-evaluated")
+    p_analyze.add_argument("--templates", type=int, metavar="N",
+                           help="evaluate rules once per line template, caching up to N templates (e.g. 65536)")
+    p_analyze.add_argument("--output-dot", help="write Graphviz DOT instead of printing")
+    p_analyze.add_argument("--output-json", help="also write the FSM as JSON to this path")
+    p_analyze.add_argument("--output-csv", help="also write the FSM as a CSV edge list to this path")
+    p_analyze.add_argument("--output-npz", help="also write the FSM as an NPZ adjacency (numpy.load) to this path")
+    p_analyze.add_argument("--min-count", type=int, default=0, help="leave edges seen fewer than N times out of the DOT output")
+    p_analyze.add_argument("--top-k", type=int, help="keep only the K most frequent edges out of each state in the DOT output")
+    p_analyze.add_argument("--latency", action="store_true", help="track per-edge latency quantiles between consecutive events")
+    p_analyze.add_argument("--stats", action="store_true", help="print per-stage timings and throughput to stderr")
+    p_analyze.add_argument("--stats-json", help="write per-stage timings and throughput as JSON to this path")
+    p_analyze.set_defaults(func=cmd_analyze)
+
     p_fsm = sub.add_parser("build-fsm", help="Build FSM DOT from stdin logs using rules")
     p_fsm.add_argument("--config", required=True, help="rules.yaml with signal_rules[] etc")
     p_fsm.add_argument("--output-dot", help="write Graphviz DOT instead of printing")
+    p_fsm.add_argument("--save-events", help="also write classified events to this columnar event store")
+    p_fsm.add_argument("--output-json", help="also write the FSM as JSON to this path")
+    p_fsm.add_argument("--output-csv", help="also write the FSM as a CSV edge list to this path")
+    p_fsm.add_argument("--output-npz", help="also write the FSM as an NPZ adjacency (numpy.load) to this path")
+    p_fsm.add_argument("--min-count", type=int, default=0, help="leave edges seen fewer than N times out of the DOT output")
+    p_fsm.add_argument("--top-k", type=int, help="keep only the K most frequent edges out of each state in the DOT output")
+    p_fsm.add_argument("--variants", help="write the most common per-entity state sequences as JSON to this path")
+    p_fsm.add_argument("--top-variants", type=int, default=20, metavar="K", help="number of variants to write (default 20)")
+    p_fsm.add_argument("--variant-capacity", type=int, metavar="N",
+                       help="count variants approximately with at most N counters instead of an exact trie")
+    p_fsm.add_argument("--output-dimensions",
+                       help="write one FSM per value of each of the config's dimensions to this JSON path")
+    p_fsm.add_argument("--latency", action="store_true", help="track per-edge latency quantiles between consecutive events")
+    p_fsm.add_argument("--window", type=float, help="emit one FSM per time window of this many seconds")
+    p_fsm.add_argument("--slide", type=float, help="window step in seconds for sliding windows (default: tumbling)")
+    p_fsm.add_argument("--window-diff", action="store_true", help="emit count changes between consecutive windows")
+    p_fsm.add_argument("--threads", type=int, metavar="N",
+                       help="classify on N threads (scales on free-threaded Python or with regex_engine: regex)")
+    p_fsm.add_argument("--templates", type=int, metavar="N",
+                       help="evaluate rules once per line template, caching up to N templates (e.g. 65536)")
+    p_fsm.add_argument("--spill-mb", type=float, metavar="MB",
+                       help="group events by entity in sorted runs on disk, buffering about MB of events in memory")
+    p_fsm.add_argument("--stats", action="store_true", help="print per-stage timings and throughput to stderr")
+    p_fsm.add_argument("--stats-json", help="write per-stage timings and throughput as JSON to this path")
+    p_fsm.add_argument("--progress", type=int, metavar="N", help="report progress to stderr every N lines")
     p_fsm.set_defaults(func=cmd_build_fsm)
 
+    p_events = sub.add_parser("fsm-from-events", help="Build FSM DOT from an event store written by build-fsm --save-events")
+    p_events.add_argument("--events", required=True, help="event store file")
+    p_events.add_argument("--start-state", help="override the start state recorded in the store")
+    p_events.add_argument("--output-dot", help="write Graphviz DOT instead of printing")
+    p_events.add_argument("--workers", type=int, help="count transitions in N processes, sharded by entity")
+    p_events.set_defaults(func=cmd_fsm_from_events)
+
+    p_check = sub.add_parser("check", help="Flag transitions in stdin logs that a reference FSM does not allow")
+    p_check.add_argument("--config", required=True, help="rules.yaml used to classify the logs")
+    p_check.add_argument("--model", required=True, help="reference FSM written by build-fsm --output-json or --output-npz")
+    p_check.add_argument("--output", help="write violations (JSON lines) to this path instead of stdout")
+    p_check.set_defaults(func=cmd_check)
+
     args = p.parse_args()
-    args.func(args)
+    if args.cmd == "analyze" and args.cache and args.templates:
+        p_analyze.error("--templates cannot be combined with --cache")
+    if args.cmd == "build-fsm" and args.window and args.variants:
+        p_fsm.error("--variants cannot be combined with --window")
+    if args.cmd == "build-fsm" and args.window and args.output_dimensions:
+        p_fsm.error("--output-dimensions cannot be combined with --window")
+    if args.cmd == "build-fsm" and args.spill_mb:
+        for flag, value in (("--save-events", args.save_events), ("--window", args.window),
+                            ("--output-dimensions", args.output_dimensions)):
+            if value:
+                p_fsm.error(f"--spill-mb cannot be combined with {flag}")
+    if args.cmd == "build-fsm" and args.threads:
+        # threads only classify on the plain symbol-id path
+        for flag, value in (("--latency", args.latency), ("--window", args.window),
+                            ("--save-events", args.save_events), ("--spill-mb", args.spill_mb),
+                            ("--output-dimensions", args.output_dimensions)):
+            if value:
+                p_fsm.error(f"--threads cannot be combined with {flag}")
+    if args.cmd == "build-fsm" and args.threads and args.templates:
+        p_fsm.error("--threads cannot be combined with --templates")
+    if args.profile:
+        from .profiling import run_profiled, PROFILE_MODES
+        if args.profile_mode not in PROFILE_MODES:
+            p.error(f"--profile-mode must be one of: {', '.join(PROFILE_MODES)}")
+        run_profiled(args.func, args, args.profile, args.profile_mode, args.profile_interval)
+    else:
+        args.func(args)
 
 if __name__ == "__main__":
     main()
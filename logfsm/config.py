@@ -1,4 +1,9 @@
-import yaml
+def _yaml():
+    # imported on first use, preferring the libyaml-backed C loader/dumper
+    import yaml
+    return (yaml,
+            getattr(yaml, "CSafeLoader", yaml.SafeLoader),
+            getattr(yaml, "CSafeDumper", yaml.SafeDumper))
 
 class Config:
     def __init__(self, cfg):
@@ -6,11 +11,21 @@ class Config:
         self.entity_id_field = cfg.get("entity_id_field", "order_id")
         self.start_state = cfg.get("start_state", "START")
         self.unknown_state = cfg.get("unknown_state", "UNKNOWN")
+        self.terminal_states = cfg.get("terminal_states", [])
+        self.entity_ttl = cfg.get("entity_ttl", None)
+        self.regex_engine = cfg.get("regex_engine", "re")
+        # capture groups holding other ids of the same entity
+        self.alias_fields = cfg.get("alias_fields", [])
+        # capture groups to break FSMs down by, and the distinct values kept
+        # per dimension before the rest are counted under OTHER
+        self.dimensions = cfg.get("dimensions", [])
+        self.dimension_limit = cfg.get("dimension_limit", 100)
 
     @staticmethod
     def load(path: str):
+        yaml, loader, _ = _yaml()
         with open(path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=loader)
         return Config(data)
 
     def save(self, path: str):
@@ -20,5 +35,17 @@ class Config:
             "start_state": self.start_state,
             "unknown_state": self.unknown_state,
         }
+        if self.terminal_states:
+            data["terminal_states"] = self.terminal_states
+        if self.entity_ttl is not None:
+            data["entity_ttl"] = self.entity_ttl
+        if self.alias_fields:
+            data["alias_fields"] = self.alias_fields
+        if self.dimensions:
+            data["dimensions"] = self.dimensions
+            data["dimension_limit"] = self.dimension_limit
+        if self.regex_engine != "re":
+            data["regex_engine"] = self.regex_engine
+        yaml, _, dumper = _yaml()
         with open(path, "w", encoding="utf-8") as f:
-            yaml.safe_dump(data, f, sort_keys=False)
+            yaml.dump(data, f, Dumper=dumper, sort_keys=False)
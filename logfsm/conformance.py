@@ -0,0 +1,89 @@
+import json
+from .models import FSM
+from .fsm_builder import decode_fsm, iter_edges, fsm_from_dict
+from .normalizer import timestamp_to_ns, MISSING_TS
+from .symbols import SymbolTable
+
+
+class ConformanceChecker:
+    # Streams events against a reference FSM. The model's edges are
+    # interned into the symbol table (pass the rules' table so ids from
+    # classify_line_ids can be checked directly) and kept as a set of
+    # (from, to, trigger) id triples; per entity only the current state is
+    # held. Entities start over as build-fsm's lifecycles do: they are
+    # dropped on reaching a terminal state or after ttl seconds of log time
+    # idle. With a correlator, aliases are resolved to their entity's first
+    # id as they are seen; build-fsm links them over the whole log, so ids
+    # only linked after both have logged are checked apart until then.
+    # check() is one set lookup and one dict update.
+
+    def __init__(self, model: FSM, start_state: str, terminal_states=(), symbols=None,
+                 ttl: float = None, correlator=None):
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        intern = self.symbols.intern
+        self.start_id = intern(start_state)
+        self.allowed = {
+            (intern(from_state), intern(to_state), intern(trigger))
+            for from_state, to_state, trigger, _, _ in iter_edges(decode_fsm(model))
+        }
+        self.terminal_ids = frozenset(intern(s) for s in terminal_states)
+        self.ttl_ns = int(ttl * 1_000_000_000) if ttl else None
+        self.correlator = correlator
+        self.now = MISSING_TS
+        # entity -> current state id, least recently active first
+        self.current = {}
+        self._last_seen = {}
+        self.events = 0
+        self.violations = 0
+
+    def expire(self):
+        cutoff = self.now - self.ttl_ns
+        current = self.current
+        while current:
+            eid = next(iter(current))
+            if self._last_seen[eid] > cutoff:
+                break
+            del current[eid]
+            del self._last_seen[eid]
+
+    def check(self, entity_id, state_id: int, rule_id: int, timestamp: str = None, aliases=()):
+        # returns the offending (from_id, to_id, rule_id) or None
+        if self.correlator is not None:
+            self.correlator.observe(entity_id, aliases)
+            entity_id = self.correlator.resolve(entity_id)
+        if self.ttl_ns is not None:
+            if timestamp:
+                t = timestamp_to_ns(timestamp)
+                if t > self.now:
+                    self.now = t
+            self.expire()
+        prev = self.current.pop(entity_id, self.start_id)
+        if state_id in self.terminal_ids:
+            self._last_seen.pop(entity_id, None)
+        else:
+            self.current[entity_id] = state_id
+            if self.ttl_ns is not None:
+                self._last_seen[entity_id] = self.now
+        self.events += 1
+        edge = (prev, state_id, rule_id)
+        if edge in self.allowed:
+            return None
+        self.violations += 1
+        return edge
+
+    def check_names(self, entity_id, state: str, trigger: str, timestamp: str = None, aliases=()):
+        intern = self.symbols.intern
+        return self.check(entity_id, intern(state), intern(trigger or "UNKNOWN_RULE"), timestamp, aliases)
+
+    def describe(self, edge) -> tuple:
+        lookup = self.symbols.lookup
+        return tuple(lookup(i) for i in edge)
+
+
+def load_model(path: str) -> FSM:
+    # an FSM written by --output-json or --output-npz
+    if path.endswith(".npz"):
+        from .writers import read_npz
+        return read_npz(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return fsm_from_dict(json.load(f))
@@ -0,0 +1,107 @@
+from array import array
+
+# Correlation of entity id aliases. An order that changes id mid-lifecycle
+# (ClOrdID -> OrigClOrdID on cancel/replace) shows up under several ids;
+# rules capture the other ids in the config's alias_fields groups, every
+# (entity id, alias) pair seen is unioned, and each event is then
+# attributed to the first-seen id of its set. Unions have to be complete
+# before events are attributed, since a link can arrive after earlier
+# events of either id.
+
+
+class UnionFind:
+    # Disjoint sets over hashable keys. Keys get dense indices on first
+    # sight and the forest lives in flat int arrays (parent, set size,
+    # first-seen member) rather than per-key objects, with union by size and
+    # path halving, so find and union are near-constant amortized time.
+
+    def __init__(self):
+        self._index = {}
+        self._keys = []
+        self._parent = array("i")
+        self._size = array("i")
+        self._first = array("i")
+        self.sets = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def add(self, key) -> int:
+        i = self._index.get(key)
+        if i is None:
+            i = self._index[key] = len(self._keys)
+            self._keys.append(key)
+            self._parent.append(i)
+            self._size.append(1)
+            self._first.append(i)
+            self.sets += 1
+        return i
+
+    def _root(self, i: int) -> int:
+        parent = self._parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a, b):
+        ra = self._root(self.add(a))
+        rb = self._root(self.add(b))
+        if ra == rb:
+            return
+        size = self._size
+        if size[ra] < size[rb]:
+            ra, rb = rb, ra
+        self._parent[rb] = ra
+        size[ra] += size[rb]
+        self._first[ra] = min(self._first[ra], self._first[rb])
+        self.sets -= 1
+
+    def find(self, key):
+        # first-seen key of key's set; unknown keys are their own set
+        i = self._index.get(key)
+        if i is None:
+            return key
+        return self._keys[self._first[self._root(i)]]
+
+    def groups(self):
+        # {first-seen key: [members in first-seen order]} for sets of 2+
+        members = {}
+        for i, key in enumerate(self._keys):
+            members.setdefault(self._first[self._root(i)], []).append(key)
+        return {self._keys[first]: keys for first, keys in members.items() if len(keys) > 1}
+
+
+class EntityCorrelator:
+    def __init__(self):
+        self.aliases = UnionFind()
+
+    def observe(self, entity_id, aliases=()):
+        # ids are registered in the order events are observed, which makes
+        # the earliest id of an entity its canonical one
+        self.aliases.add(entity_id)
+        for alias in aliases:
+            if alias and alias != entity_id:
+                self.aliases.union(entity_id, alias)
+
+    def resolve(self, entity_id):
+        return self.aliases.find(entity_id)
+
+
+def correlate_events(events, correlator: EntityCorrelator = None) -> list:
+    # links the aliases of all events, then rewrites each event's entity_id
+    # to its set's canonical id in place; returns the events as a list
+    events = list(events)
+    correlator = correlator if correlator is not None else EntityCorrelator()
+    observe = correlator.observe
+    for ev in events:
+        if ev.entity_id:
+            observe(ev.entity_id, ev.aliases)
+    resolve = correlator.resolve
+    for ev in events:
+        if ev.entity_id:
+            ev.entity_id = resolve(ev.entity_id)
+    return events
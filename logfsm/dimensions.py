@@ -0,0 +1,86 @@
+import json
+from collections import defaultdict
+from .models import FSM
+from .fsm_builder import fsm_to_dict
+from .sketch import LatencySketch
+
+# Per-dimension FSM breakdowns for the `dimensions` hook of build_fsm. Rules
+# capture dimension values (venue, symbol, service, ...) into named groups
+# listed under the config's `dimensions`; each entity is assigned, per
+# dimension, the first value any of its events captured, and all of its
+# transitions are also counted in that value's FSM. So every per-value FSM
+# holds complete lifecycles, and all of them are filled in the same pass as
+# the overall FSM.
+
+OTHER = "OTHER"
+UNSET = "UNSET"
+DIMENSION_LIMIT = 100
+
+
+class DimensionBreakdown:
+    # The first `limit` distinct values of a dimension get their own FSM;
+    # entities with any later value are counted under OTHER, so memory is
+    # bounded by limit + 2 FSMs per dimension however many values the logs
+    # hold. Entities that never captured the dimension are counted under
+    # UNSET.
+
+    def __init__(self, names, limit: int = DIMENSION_LIMIT):
+        if limit < 0:
+            raise ValueError("limit must not be negative")
+        self.names = tuple(names)
+        self.limit = limit
+        self.fsms = {name: {} for name in self.names}
+        self.entities = {name: defaultdict(int) for name in self.names}
+        self._kept = {name: set() for name in self.names}
+
+    def _new_fsm(self) -> FSM:
+        # latencies stay empty unless build_fsm tracks latency
+        return FSM(transitions=defaultdict(lambda: defaultdict(int)),
+                   latencies=defaultdict(lambda: defaultdict(LatencySketch)))
+
+    def _key(self, name: str, value) -> str:
+        if value is None:
+            return UNSET
+        kept = self._kept[name]
+        if value in kept:
+            return value
+        if len(kept) < self.limit:
+            kept.add(value)
+            return value
+        return OTHER
+
+    def value_of(self, evs, i: int):
+        # first value of dimension i captured by the entity's events
+        for ev in evs:
+            if ev.dimensions and ev.dimensions[i] is not None:
+                return ev.dimensions[i]
+        return None
+
+    def fsms_for(self, evs):
+        # the FSMs one entity's transitions are counted in, one per dimension
+        out = []
+        for i, name in enumerate(self.names):
+            key = self._key(name, self.value_of(evs, i))
+            fsms = self.fsms[name]
+            fsm = fsms.get(key)
+            if fsm is None:
+                fsm = fsms[key] = self._new_fsm()
+            self.entities[name][key] += 1
+            out.append(fsm)
+        return out
+
+
+def dimensions_to_dict(breakdown: DimensionBreakdown) -> dict:
+    dims = {}
+    for name in breakdown.names:
+        entities = breakdown.entities[name]
+        values = sorted(breakdown.fsms[name].items(), key=lambda kv: entities[kv[0]], reverse=True)
+        dims[name] = {
+            value: dict(entities=entities[value], **fsm_to_dict(fsm))
+            for value, fsm in values
+        }
+    return {"limit": breakdown.limit, "dimensions": dims}
+
+
+def dimensions_to_json(breakdown: DimensionBreakdown) -> str:
+    return json.dumps(dimensions_to_dict(breakdown), indent=2)
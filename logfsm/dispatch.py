@@ -0,0 +1,122 @@
+import re
+import string
+from .fix import parse_fix, MSG_TYPE_TAG
+
+_LEADING_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+_LITERAL_CHARS = frozenset(string.ascii_letters + string.digits + " _-=:,;/<>@#%&'\"!~`")
+_QUANTIFIERS = frozenset("*+?{")
+MIN_LITERAL = 3
+MAX_ROUTES = 4096
+
+
+def required_literal(regex: str):
+    # The literal text a pattern starts with, which every match must
+    # contain, as (literal, ignorecase); None when the pattern has no usable
+    # leading literal. Patterns with alternation or verbose mode are not
+    # analysed.
+    flags = ""
+    m = _LEADING_FLAGS.match(regex)
+    if m:
+        flags = m.group(1)
+        regex = regex[m.end():]
+    if "x" in flags or "|" in regex:
+        return None
+    if regex.startswith("^"):
+        regex = regex[1:]
+    elif regex.startswith("\\A"):
+        regex = regex[2:]
+
+    chars = []
+    i = 0
+    while i < len(regex):
+        c = regex[i]
+        if c in _LITERAL_CHARS:
+            i += 1
+        elif c == "\\" and i + 1 < len(regex) and regex[i + 1] in string.punctuation:
+            c = regex[i + 1]
+            i += 2
+        else:
+            break
+        if i < len(regex) and regex[i] in _QUANTIFIERS:
+            break
+        chars.append(c)
+
+    literal = "".join(chars)
+    if len(literal) < MIN_LITERAL:
+        return None
+    ignorecase = "i" in flags
+    return (literal.lower() if ignorecase else literal), ignorecase
+
+
+class RuleDispatcher:
+    # Routes a line to the rules that can possibly match it. Regex rules are
+    # keyed on their required leading literal and FIX rules on their MsgType
+    # predicate; each distinct key is checked once per line (a substring
+    # test or a field lookup) and the resulting signature maps to the
+    # candidate rules, in config order so first-match semantics hold. Rules
+    # without a key are candidates for every line.
+
+    def __init__(self, rules):
+        self.size = len(rules)
+        self.literals = []
+        self.ignorecase = []
+        self.uses_fix = any(rule.fix for rule in rules)
+        self.routes_msg_type = False
+        literal_index = {}
+        self._keys = []
+        for rule in rules:
+            key = None
+            if rule.fix:
+                msg_type = dict(rule.predicates).get(MSG_TYPE_TAG)
+                if msg_type is not None:
+                    key = ("msg_type", msg_type)
+                    self.routes_msg_type = True
+            else:
+                lit = required_literal(rule.pattern.pattern)
+                if lit is not None:
+                    idx = literal_index.get(lit)
+                    if idx is None:
+                        idx = literal_index[lit] = len(self.literals)
+                        self.literals.append(lit[0])
+                        self.ignorecase.append(lit[1])
+                    key = ("literal", idx)
+            self._keys.append((rule, key))
+        self._any_ignorecase = any(self.ignorecase)
+        self._checks = list(zip(self.literals, self.ignorecase))
+        self._routes = {}
+
+    def _candidates(self, present, msg_type):
+        out = []
+        for rule, key in self._keys:
+            if key is None:
+                out.append(rule)
+            elif key[0] == "literal":
+                if present[key[1]]:
+                    out.append(rule)
+            elif key[1] == msg_type:
+                out.append(rule)
+        return tuple(out)
+
+    def route(self, raw_line: str):
+        # returns (candidate rules, parsed FIX fields or None)
+        if self._any_ignorecase and raw_line.isascii():
+            folded = raw_line.lower()
+        else:
+            # re's case-insensitive matching pairs some non-ASCII letters
+            # with ASCII ones (e.g. dotless i), so no line-level folding is
+            # safe: treat case-insensitive literals as present
+            folded = None
+        present = tuple(
+            (lit in folded if folded is not None else True) if ic else lit in raw_line
+            for lit, ic in self._checks
+        )
+        fields = parse_fix(raw_line) if self.uses_fix else None
+        msg_type = fields.get(MSG_TYPE_TAG) if self.routes_msg_type else None
+
+        sig = (present, msg_type)
+        candidates = self._routes.get(sig)
+        if candidates is None:
+            if len(self._routes) >= MAX_ROUTES:
+                self._routes.clear()
+            candidates = self._routes[sig] = self._candidates(present, msg_type)
+        return candidates, fields
@@ -0,0 +1,170 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+from .normalizer import timestamp_to_ns
+
+# Columnar store of classified events, little-endian throughout:
+#
+#   MAGIC
+#   block*     uint64 n | int64 ts[n] | int32 entity[n] | int32 state[n]
+#              | int32 rule[n] | padding to 8 bytes
+#   footer     utf-8 JSON: start_state, dictionaries, block offsets
+#   uint64 footer length | MAGIC
+#
+# entity/state/rule are indexes into the footer dictionaries; rule -1 means
+# the event had no rule name. Blocks are written as they fill, so the writer
+# only holds one block plus the dictionaries in memory, and the reader maps
+# the columns straight out of the file.
+
+MAGIC = b"LFSMEVT1"
+BLOCK_SIZE = 1 << 20
+_LITTLE = sys.byteorder == "little"
+
+
+class EventStoreWriter:
+    def __init__(self, path: str, start_state: str, block_size: int = BLOCK_SIZE):
+        self.path = path
+        self.start_state = start_state
+        self.block_size = block_size
+        self.entities = {}
+        self.states = {}
+        self.rules = {}
+        self.blocks = []
+        self.count = 0
+        self._f = open(path, "wb")
+        self._f.write(MAGIC)
+        self._reset()
+
+    def _reset(self):
+        self._ts = array("q")
+        self._entity = array("i")
+        self._state = array("i")
+        self._rule = array("i")
+
+    @staticmethod
+    def _code(table, key):
+        code = table.get(key)
+        if code is None:
+            code = table[key] = len(table)
+        return code
+
+    def add(self, ev):
+        if not (ev.entity_id and ev.state):
+            return
+        self._ts.append(timestamp_to_ns(ev.timestamp))
+        self._entity.append(self._code(self.entities, ev.entity_id))
+        self._state.append(self._code(self.states, ev.state))
+        self._rule.append(self._code(self.rules, ev.rule_name) if ev.rule_name else -1)
+        if len(self._ts) >= self.block_size:
+            self._flush()
+
+    def _flush(self):
+        n = len(self._ts)
+        if not n:
+            return
+        self.blocks.append([self._f.tell(), n])
+        self._f.write(struct.pack("<Q", n))
+        for col in (self._ts, self._entity, self._state, self._rule):
+            if not _LITTLE:
+                col.byteswap()
+            col.tofile(self._f)
+        if n % 2:
+            self._f.write(b"\0" * 4)
+        self.count += n
+        self._reset()
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._flush()
+        footer = json.dumps({
+            "version": 1,
+            "start_state": self.start_state,
+            "count": self.count,
+            "entities": list(self.entities),
+            "states": list(self.states),
+            "rules": list(self.rules),
+            "blocks": self.blocks,
+        }).encode("utf-8")
+        self._f.write(footer)
+        self._f.write(struct.pack("<Q", len(footer)))
+        self._f.write(MAGIC)
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_event_store(path: str, events, start_state: str, block_size: int = BLOCK_SIZE) -> int:
+    with EventStoreWriter(path, start_state, block_size) as w:
+        for ev in events:
+            w.add(ev)
+    return w.count
+
+
+def _column(buf, typecode):
+    if _LITTLE:
+        return buf.cast(typecode)
+    col = array(typecode, bytes(buf))
+    col.byteswap()
+    return col
+
+
+class EventStore:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mm)
+        size = len(self._buf)
+        tail = len(MAGIC) + 8
+        if size < len(MAGIC) + tail or self._buf[:8] != MAGIC or self._buf[size - 8:] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a logfsm event store")
+        (footer_len,) = struct.unpack_from("<Q", self._buf, size - tail)
+        footer = json.loads(bytes(self._buf[size - tail - footer_len:size - tail]).decode("utf-8"))
+        self.start_state = footer["start_state"]
+        self.entities = footer["entities"]
+        self.states = footer["states"]
+        self.rules = footer["rules"]
+        self.blocks = footer["blocks"]
+        self.count = footer["count"]
+
+    def __len__(self):
+        return self.count
+
+    def iter_blocks(self):
+        # yields (timestamps, entity_codes, state_codes, rule_codes) per block
+        for offset, n in self.blocks:
+            pos = offset + 8
+            ts = _column(self._buf[pos:pos + 8 * n], "q")
+            pos += 8 * n
+            cols = []
+            for typecode in "iii":
+                cols.append(_column(self._buf[pos:pos + 4 * n], typecode))
+                pos += 4 * n
+            yield (ts, *cols)
+
+    def iter_records(self):
+        # yields (entity_id, timestamp_ns, state, rule_name) with strings decoded
+        entities, states, rules = self.entities, self.states, self.rules
+        for ts, ent, st, rl in self.iter_blocks():
+            for t, e, s, r in zip(ts, ent, st, rl):
+                yield entities[e], t, states[s], (rules[r] if r >= 0 else None)
+
+    def close(self):
+        if self._buf is not None:
+            self._buf.release()
+            self._buf = None
+            self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
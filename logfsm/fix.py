@@ -0,0 +1,145 @@
+SOH = "\x01"
+
+# FIX tag numbers for the field names accepted in rules and logs
+TAGS = {
+    "BeginString": "8",
+    "BodyLength": "9",
+    "CheckSum": "10",
+    "ClOrdID": "11",
+    "CumQty": "14",
+    "ExecID": "17",
+    "LastPx": "31",
+    "LastQty": "32",
+    "MsgSeqNum": "34",
+    "MsgType": "35",
+    "OrderID": "37",
+    "OrderQty": "38",
+    "OrdStatus": "39",
+    "OrdType": "40",
+    "OrigClOrdID": "41",
+    "Price": "44",
+    "SenderCompID": "49",
+    "SendingTime": "52",
+    "Side": "54",
+    "Symbol": "55",
+    "TargetCompID": "56",
+    "Text": "58",
+    "TimeInForce": "59",
+    "TransactTime": "60",
+    "ExecType": "150",
+    "LeavesQty": "151",
+    "ExDestination": "100",
+    "SecurityExchange": "207",
+}
+
+MSG_TYPES = {
+    "Heartbeat": "0",
+    "Reject": "3",
+    "ExecutionReport": "8",
+    "OrderCancelReject": "9",
+    "NewOrderSingle": "D",
+    "OrderCancelRequest": "F",
+    "OrderCancelReplaceRequest": "G",
+}
+
+_TAG_KEYS = {name.lower(): tag for name, tag in TAGS.items()}
+_MSG_TYPE_KEYS = {name.lower(): code for name, code in MSG_TYPES.items()}
+MSG_TYPE_TAG = TAGS["MsgType"]
+
+
+def resolve_tag(name) -> str:
+    name = str(name)
+    if name.isdigit():
+        return name
+    try:
+        return _TAG_KEYS[name.lower()]
+    except KeyError:
+        raise ValueError(f"unknown FIX tag name: {name}") from None
+
+
+# raw key text -> tag number; only space-free keys are cached, which keeps
+# it bounded by the distinct field names in the log
+_KEY_CACHE = {}
+
+
+def _tag_for(key: str) -> str:
+    if " " in key:
+        key = key.rsplit(None, 1)[-1] if key.strip() else ""
+        return key if key.isdigit() else _TAG_KEYS.get(key.lower(), key)
+    tag = key if key.isdigit() else _TAG_KEYS.get(key.lower(), key)
+    _KEY_CACHE[key] = tag
+    return tag
+
+
+def parse_fix(line: str) -> dict:
+    # Splits a message into {tag number: value} in one pass. Fields are
+    # SOH or '|' delimited; anything before the first tag (a log prefix) is
+    # ignored. Lines with neither delimiter are split on whitespace, which
+    # also accepts "ExecutionReport ExecType=F ClOrdID=..." style log lines.
+    # Field names are mapped to tag numbers, a bare message type name sets
+    # MsgType, and the first occurrence of a tag wins.
+    if SOH in line:
+        parts = line.split(SOH)
+    elif "|" in line:
+        parts = line.split("|")
+    else:
+        parts = line.split()
+
+    fields = {}
+    cache = _KEY_CACHE
+    for part in parts:
+        key, sep, value = part.partition("=")
+        if sep:
+            tag = cache.get(key) or _tag_for(key)
+            if tag not in fields:
+                fields[tag] = value
+        elif MSG_TYPE_TAG not in fields:
+            word = key.rsplit(None, 1)[-1] if " " in key and key.strip() else key
+            code = _MSG_TYPE_KEYS.get(word.lower())
+            if code is not None:
+                fields[MSG_TYPE_TAG] = code
+    return fields
+
+
+class FieldMatch(dict):
+    # captured values of a FixRule, with the parts of the re.Match API
+    # that classification uses; a match is truthy even with no captures
+    def __bool__(self):
+        return True
+
+    def groupdict(self):
+        return self
+
+    def group(self, name):
+        return self.get(name)
+
+
+class FixRule:
+    def __init__(self, name: str, fields: dict, state: str, capture: dict = None):
+        self.name = name
+        self.state = state
+        self.fix = True
+        self.predicates = []
+        for tag, value in fields.items():
+            tag = resolve_tag(tag)
+            value = str(value)
+            if tag == MSG_TYPE_TAG:
+                value = _MSG_TYPE_KEYS.get(value.lower(), value)
+            self.predicates.append((tag, value))
+        self.captures = [(group, resolve_tag(tag)) for group, tag in (capture or {}).items()]
+        self.groupindex = {group: i + 1 for i, (group, _) in enumerate(self.captures)}
+        # filled in by compile_rules
+        self.rule_id = None
+        self.state_id = None
+        self.entity_group = None
+        self.alias_groups = ()
+        self.dimension_groups = ()
+
+    def match_fields(self, fields: dict):
+        for tag, value in self.predicates:
+            if fields.get(tag) != value:
+                return None
+        return FieldMatch((group, fields.get(tag)) for group, tag in self.captures)
+
+    def match(self, raw_line: str):
+        return self.match_fields(parse_fix(raw_line))
@@ -1,7 +1,14 @@
+import json
 from collections import defaultdict
+from operator import itemgetter
 from .models import FSM
+from .normalizer import timestamp_to_ns
+from .sketch import LatencySketch, format_duration
 
-def build_fsm(events, start_state: str) -> FSM:
+def build_fsm(events, start_state: str, latency: bool = False, paths=None, dimensions=None) -> FSM:
+    # paths, when given, is a collector (see logfsm.paths) that receives
+    # each entity's state sequence; dimensions, a DimensionBreakdown (see
+    # logfsm.dimensions) whose per-value FSMs also count each transition
     per_entity = defaultdict(list)
     for ev in events:
         if ev.entity_id and ev.state:
@@ -11,22 +18,179 @@ def build_fsm(events, start_state: str) -> FSM:
         per_entity[eid].sort(key=lambda e: e.timestamp)
 
     transition_counts = defaultdict(lambda: defaultdict(int))
+    latencies = defaultdict(lambda: defaultdict(LatencySketch))
 
     for eid, evs in per_entity.items():
+        dim_fsms = dimensions.fsms_for(evs) if dimensions is not None else ()
         prev_state = start_state
+        prev_ts = None
         for ev in evs:
-            next_state = ev.state
-            trigger = ev.rule_name or "UNKNOWN_RULE"
-            transition_counts[prev_state][(next_state, trigger)] += 1
-            prev_state = next_state
+            edge = (ev.state, ev.rule_name or "UNKNOWN_RULE")
+            transition_counts[prev_state][edge] += 1
+            for dim_fsm in dim_fsms:
+                dim_fsm.transitions[prev_state][edge] += 1
+            if latency:
+                ts = timestamp_to_ns(ev.timestamp) if ev.timestamp else None
+                if ts is not None and prev_ts is not None:
+                    delay = (ts - prev_ts) / 1e9
+                    latencies[prev_state][edge].add(delay)
+                    for dim_fsm in dim_fsms:
+                        dim_fsm.latencies[prev_state][edge].add(delay)
+                prev_ts = ts
+            prev_state = ev.state
+        if paths is not None:
+            paths.add((start_state,) + tuple(ev.state for ev in evs))
 
+    return FSM(transitions=transition_counts, latencies=latencies if latency else {})
+
+def build_fsm_ids(records, start_id: int, symbols, paths=None) -> FSM:
+    # records are (entity_id, timestamp, state_id, rule_id) as produced by
+    # classify_line_ids; counts, and paths given to the collector, stay
+    # keyed by symbol ids
+    per_entity = defaultdict(list)
+    for eid, ts, state_id, rule_id in records:
+        per_entity[eid].append((ts, state_id, rule_id))
+
+    by_ts = itemgetter(0)
+    transition_counts = defaultdict(lambda: defaultdict(int))
+    for evs in per_entity.values():
+        evs.sort(key=by_ts)
+        prev = start_id
+        for _, state_id, rule_id in evs:
+            transition_counts[prev][(state_id, rule_id)] += 1
+            prev = state_id
+        if paths is not None:
+            paths.add((start_id,) + tuple(ev[1] for ev in evs))
+
+    return FSM(transitions=transition_counts, symbols=symbols)
+
+def decode_fsm(fsm: FSM) -> FSM:
+    if fsm.symbols is None:
+        return fsm
+    transitions = defaultdict(dict)
+    latencies = defaultdict(dict)
+    for from_state, to_state, trigger, count, sketch in iter_edges(fsm):
+        transitions[from_state][(to_state, trigger)] = count
+        if sketch is not None:
+            latencies[from_state][(to_state, trigger)] = sketch
+    return FSM(transitions=dict(transitions), latencies=dict(latencies))
+
+def count_code_transitions(blocks, start: int = -1) -> dict:
+    # blocks are (timestamps, entity, state, rule) columns of integer codes;
+    # returns {(prev_state, state, rule): count}, prev_state being start for
+    # each entity's first event, with the same per-entity timestamp ordering
+    # as build_fsm
+    per_entity = defaultdict(list)
+    for ts, ent, st, rl in blocks:
+        for t, e, s, r in zip(ts, ent, st, rl):
+            per_entity[e].append((t, s, r))
+
+    by_ts = itemgetter(0)
+    code_counts = defaultdict(int)
+    for evs in per_entity.values():
+        evs.sort(key=by_ts)
+        prev = start
+        for _, s, r in evs:
+            code_counts[(prev, s, r)] += 1
+            prev = s
+    return code_counts
+
+def fold_code_transitions(blocks, start: int = -1) -> dict:
+    # count_code_transitions for blocks that can be iterated twice, without
+    # a per-event list: entities whose timestamps never decrease in block
+    # order are counted straight off the columns, keeping only their last
+    # state; just the events of the other entities are grouped and sorted
+    last_ts = {}
+    disordered = set()
+    for ts, ent, _, _ in blocks:
+        for t, e in zip(ts, ent):
+            if t < last_ts.get(e, t):
+                disordered.add(e)
+            last_ts[e] = t
+
+    last_state = {}
+    per_entity = defaultdict(list)
+    code_counts = defaultdict(int)
+    for ts, ent, st, rl in blocks:
+        for t, e, s, r in zip(ts, ent, st, rl):
+            if e in disordered:
+                per_entity[e].append((t, s, r))
+                continue
+            code_counts[(last_state.get(e, start), s, r)] += 1
+            last_state[e] = s
+
+    by_ts = itemgetter(0)
+    for evs in per_entity.values():
+        evs.sort(key=by_ts)
+        prev = start
+        for _, s, r in evs:
+            code_counts[(prev, s, r)] += 1
+            prev = s
+    return code_counts
+
+def fsm_from_store_codes(code_counts, states, rules, start_state: str) -> FSM:
+    # strings are only looked up once per distinct edge; state code -1 is
+    # the start state and rule code -1 a missing rule name
+    transition_counts = defaultdict(lambda: defaultdict(int))
+    for (prev, s, r), count in code_counts.items():
+        from_state = states[prev] if prev >= 0 else start_state
+        trigger = rules[r] if r >= 0 else "UNKNOWN_RULE"
+        transition_counts[from_state][(states[s], trigger)] += count
     return FSM(transitions=transition_counts)
 
+def build_fsm_from_store(store, start_state: str = None) -> FSM:
+    # same counting as build_fsm, but grouped and counted on the store's
+    # integer codes
+    if start_state is None:
+        start_state = store.start_state
+    return fsm_from_store_codes(count_code_transitions(store.iter_blocks()), store.states, store.rules, start_state)
+
+def _edge_latency(fsm: FSM, from_state, edge):
+    dests = fsm.latencies.get(from_state)
+    sketch = dests.get(edge) if dests else None
+    return sketch if sketch is not None and sketch.count else None
+
+def iter_edges(fsm: FSM):
+    # yields (from_state, to_state, trigger, count, latency sketch or None)
+    # with symbol ids decoded back to names
+    names = fsm.symbols.names if fsm.symbols is not None else None
+    for from_state, dests in fsm.transitions.items():
+        for edge, count in dests.items():
+            sketch = _edge_latency(fsm, from_state, edge)
+            to_state, trigger = edge
+            if names is None:
+                yield from_state, to_state, trigger, count, sketch
+            else:
+                yield names[from_state], names[to_state], names[trigger], count, sketch
+
+def dot_edge(from_state, to_state, trigger, count, sketch) -> str:
+    label = f"{trigger}\\n({count})"
+    if sketch is not None:
+        label += (f"\\np50={format_duration(sketch.quantile(0.5))}"
+                  f" p99={format_duration(sketch.quantile(0.99))}")
+    return f'  "{from_state}" -> "{to_state}" [label="{label}"];'
+
 def fsm_to_dot(fsm: FSM) -> str:
     lines = ["digraph FSM {"]
-    for from_state, dests in fsm.transitions.items():
-        for (to_state, trigger), count in dests.items():
-            label = f"{trigger}\\n({count})"
-            lines.append(f'  "{from_state}" -> "{to_state}" [label="{label}"];')
+    for edge in iter_edges(fsm):
+        lines.append(dot_edge(*edge))
     lines.append("}")
     return "\n".join(lines)
+
+def edge_to_dict(from_state, to_state, trigger, count, sketch) -> dict:
+    edge = {"from": from_state, "to": to_state, "trigger": trigger, "count": count}
+    if sketch is not None:
+        edge["latency"] = sketch.to_dict()
+    return edge
+
+def fsm_to_dict(fsm: FSM) -> dict:
+    return {"transitions": [edge_to_dict(*edge) for edge in iter_edges(fsm)]}
+
+def fsm_to_json(fsm: FSM) -> str:
+    return json.dumps(fsm_to_dict(fsm), indent=2)
+
+def fsm_from_dict(data: dict) -> FSM:
+    transitions = defaultdict(dict)
+    for edge in data.get("transitions", []):
+        transitions[edge["from"]][(edge["to"], edge["trigger"])] = edge["count"]
+    return FSM(transitions=dict(transitions))
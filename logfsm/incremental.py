@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import struct
+import sys
+from array import array
+from .rule_engine import first_match, event_from_match
+
+# Incremental re-classification across rule edits. Every rule gets a
+# fingerprint of what decides whether it matches a line (its regex, or its
+# FIX fields and captures, plus the regex engine); names and states are
+# left out since they only label the result. A cache file stores the
+# fingerprints of the config it was built with and, per line of the log,
+# the position of the first rule that matched (-1 for none).
+#
+# Under first-match semantics a line cached as matched by rule i is known
+# not to match any rule before i. With a new config, the line's result only
+# has to be re-evaluated against new rules outside that known set: if its
+# rule is unchanged and only known non-matching rules precede it, no other
+# rule is tried and that rule is only matched again for its captures.
+# Unmatched lines are only tried against added or edited rules. The plan is
+# worked out once per cached position, so each line costs a lookup plus the
+# rules that actually changed (and its own rule, for captures).
+#
+#   MAGIC | uint64 header length | utf-8 JSON header | int32 position[lines]
+
+MAGIC = b"LFSMCLS1"
+_LITTLE = sys.byteorder == "little"
+
+
+def rule_fingerprint(rule: dict, engine: str = "re") -> str:
+    if "fix" in rule:
+        key = {"fix": rule["fix"], "capture": rule.get("capture")}
+    else:
+        key = {"regex": rule["regex"], "engine": engine}
+    return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def config_fingerprints(cfg) -> list:
+    return [rule_fingerprint(rule, cfg.regex_engine) for rule in cfg.signal_rules]
+
+
+def lines_digest(lines) -> str:
+    h = hashlib.sha1()
+    for ln in lines:
+        h.update(ln.encode("utf-8", errors="replace"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+class ClassificationCache:
+    def __init__(self, fingerprints, positions, digest: str):
+        self.fingerprints = list(fingerprints)
+        self.positions = positions
+        self.digest = digest
+
+    def __len__(self):
+        return len(self.positions)
+
+    def save(self, path: str):
+        header = json.dumps({"digest": self.digest, "lines": len(self.positions),
+                             "fingerprints": self.fingerprints}).encode("utf-8")
+        positions = self.positions
+        if not _LITTLE:
+            positions = array("i", positions)
+            positions.byteswap()
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            positions.tofile(f)
+
+    @classmethod
+    def load(cls, path: str):
+        # None when there is no cache at path yet
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a logfsm classification cache")
+            (size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(size).decode("utf-8"))
+            positions = array("i")
+            positions.fromfile(f, header["lines"])
+        if not _LITTLE:
+            positions.byteswap()
+        return cls(header["fingerprints"], positions, header["digest"])
+
+
+class _Plans(dict):
+    # old position (-1 for unmatched) -> (new rules still to try, in order;
+    # position of the cached rule in the new config, or -1), worked out on
+    # first use
+
+    def __init__(self, old, new, compiled):
+        super().__init__()
+        self.old = old
+        self.new = new
+        self.compiled = compiled
+        self.first_new = {}
+        for j, fp in enumerate(new):
+            self.first_new.setdefault(fp, j)
+
+    def __missing__(self, i):
+        old, new = self.old, self.new
+        known = set(old[:i] if i >= 0 else old)
+        fallback = self.first_new.get(old[i], -1) if i >= 0 else -1
+        stop = fallback if fallback >= 0 else len(new)
+        plan = self[i] = ([self.compiled[j] for j in range(stop) if new[j] not in known], fallback)
+        return plan
+
+
+def classify_incremental(lines, compiled, cfg, cache: ClassificationCache = None):
+    # Returns (events, new cache, reevaluated): the ClassifiedEvent of every
+    # line as classify_line gives it, the cache for the current config, and
+    # the number of lines any rule had to be tried on. The old cache is only
+    # used when it was built from the same lines.
+    lines = lines if isinstance(lines, list) else list(lines)
+    fingerprints = config_fingerprints(cfg)
+    digest = lines_digest(lines)
+    position_of = {id(rule): j for j, rule in enumerate(compiled)}
+    positions = array("i")
+    events = []
+    reevaluated = 0
+
+    if cache is None or cache.digest != digest or len(cache) != len(lines):
+        for ln in lines:
+            rule, m = first_match(ln, compiled)
+            positions.append(position_of[id(rule)] if m else -1)
+            events.append(event_from_match(ln, rule, m, cfg))
+        return events, ClassificationCache(fingerprints, positions, digest), len(lines)
+
+    plans = _Plans(cache.fingerprints, fingerprints, compiled)
+    for ln, old_pos in zip(lines, cache.positions):
+        candidates, fallback = plans[old_pos]
+        rule, m = None, None
+        if candidates:
+            reevaluated += 1
+            rule, m = first_match(ln, candidates)
+        if not m and fallback >= 0:
+            # still the first match; matched again only for its captures
+            rule = compiled[fallback]
+            m = first_match(ln, (rule,))[1]
+        positions.append(position_of[id(rule)] if m else -1)
+        events.append(event_from_match(ln, rule, m, cfg))
+    return events, ClassificationCache(fingerprints, positions, digest), reevaluated
@@ -0,0 +1,132 @@
+from collections import OrderedDict, defaultdict
+from .models import FSM
+from .normalizer import timestamp_to_ns, MISSING_TS
+
+
+class EntityLifecycleManager:
+    # Streaming counterpart of build_fsm: events are buffered per in-flight
+    # entity only. An entity is finalized -- its buffered events sorted by
+    # timestamp and folded into the transition counts, exactly as build_fsm
+    # would count them -- as soon as it reaches a terminal state or has been
+    # idle for ttl seconds of log time, and is then forgotten. An entity
+    # that logs again after being finalized starts over from start_state.
+
+    def __init__(self, start_state: str, terminal_states=(), ttl: float = None, paths=None):
+        self.start_state = start_state
+        self.paths = paths
+        self.terminal_states = frozenset(terminal_states)
+        self.ttl_ns = int(ttl * 1_000_000_000) if ttl else None
+        self.transitions = defaultdict(lambda: defaultdict(int))
+        self.now = MISSING_TS
+        self.finalized = 0
+        self.expired = 0
+        # entity -> buffered events, least recently active first
+        self._active = OrderedDict()
+        self._last_seen = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._active)
+
+    def add(self, ev):
+        if not (ev.entity_id and ev.state):
+            return
+        if ev.timestamp:
+            t = timestamp_to_ns(ev.timestamp)
+            if t > self.now:
+                self.now = t
+        # expire first, so an entity returning after ttl idle starts over
+        if self.ttl_ns is not None:
+            self.expire()
+
+        eid = ev.entity_id
+        evs = self._active.get(eid)
+        if evs is None:
+            evs = self._active[eid] = []
+        else:
+            self._active.move_to_end(eid)
+        evs.append(ev)
+        self._last_seen[eid] = self.now
+
+        if ev.state in self.terminal_states:
+            self._finalize(eid)
+
+    def expire(self, now: int = None):
+        if self.ttl_ns is None:
+            return
+        cutoff = (self.now if now is None else now) - self.ttl_ns
+        while self._active:
+            eid = next(iter(self._active))
+            if self._last_seen[eid] > cutoff:
+                break
+            self._finalize(eid)
+            self.expired += 1
+
+    def _finalize(self, eid):
+        evs = self._active.pop(eid)
+        del self._last_seen[eid]
+        evs.sort(key=lambda e: e.timestamp)
+        prev_state = self.start_state
+        for ev in evs:
+            trigger = ev.rule_name or "UNKNOWN_RULE"
+            self.transitions[prev_state][(ev.state, trigger)] += 1
+            prev_state = ev.state
+        if self.paths is not None:
+            self.paths.add((self.start_state,) + tuple(ev.state for ev in evs))
+        self.finalized += 1
+
+    def finish(self) -> FSM:
+        while self._active:
+            self._finalize(next(iter(self._active)))
+        return FSM(transitions=self.transitions)
+
+
+def build_fsm_streaming(events, start_state: str, terminal_states=(), ttl: float = None, paths=None) -> FSM:
+    manager = EntityLifecycleManager(start_state, terminal_states, ttl, paths)
+    for ev in events:
+        manager.add(ev)
+    return manager.finish()
+
+
+def split_lifecycles(events, terminal_states=(), ttl: float = None):
+    # For build paths that need every event (latency, windows, event stores,
+    # aliases, dimensions): yields the events with an entity's lifecycles
+    # told apart exactly where EntityLifecycleManager would finalize them,
+    # after a terminal state or ttl seconds of log time idle. The n-th
+    # restart of an entity is renamed "<id>#<n>", so build_fsm counts it
+    # from start_state again. Events are updated in place.
+    terminal_states = frozenset(terminal_states)
+    ttl_ns = int(ttl * 1_000_000_000) if ttl else None
+    now = MISSING_TS
+    # entity -> log time last seen, least recently active first
+    active = OrderedDict()
+    restarts = {}
+    for ev in events:
+        if not (ev.entity_id and ev.state):
+            yield ev
+            continue
+        if ev.timestamp:
+            t = timestamp_to_ns(ev.timestamp)
+            if t > now:
+                now = t
+        if ttl_ns is not None:
+            cutoff = now - ttl_ns
+            while active:
+                first = next(iter(active))
+                if active[first] > cutoff:
+                    break
+                del active[first]
+                restarts[first] = restarts.get(first, 0) + 1
+
+        eid = ev.entity_id
+        if eid in active:
+            active.move_to_end(eid)
+        active[eid] = now
+        n = restarts.get(eid, 0)
+        if n:
+            ev.entity_id = f"{eid}#{n}"
+
+        if ev.state in terminal_states:
+            del active[eid]
+            restarts[eid] = n + 1
+        yield ev
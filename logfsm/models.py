@@ -1,5 +1,6 @@
-from dataclasses import dataclass
-from typing import Optional, Dict, Tuple
+from array import array
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Tuple, Any, List
 
 @dataclass
 class ClassifiedEvent:
@@ -9,8 +10,49 @@ class ClassifiedEvent:
     entity_id: Optional[str]
     rule_name: Optional[str]
     state: Optional[str]
+    # other ids of the same entity captured by the rule (alias_fields)
+    aliases: Tuple[str, ...] = ()
+    # values of the config's dimensions captured by the rule, in config
+    # order (None where not captured); empty when the rule captures none
+    dimensions: Tuple[Optional[str], ...] = ()
 
 @dataclass
 class FSM:
     # transitions[from_state][(to_state, trigger_rule)] = count
     transitions: Dict[str, Dict[Tuple[str, str], int]]
+    # latencies[from_state][(to_state, trigger_rule)] = LatencySketch of the
+    # time between the two events; only filled when latency is tracked
+    latencies: Dict[str, Dict[Tuple[str, str], Any]] = field(default_factory=dict)
+    # when set, states and triggers above are SymbolTable ids rather than
+    # strings; fsm_to_dot and the other writers decode them
+    symbols: Optional[Any] = None
+
+@dataclass
+class ClassifiedBatch:
+    # one row per input line, as parallel columns: index of the matching
+    # rule in the compiled rules (-1 for no match), its rule and state
+    # symbol ids (-1 when unmatched or the rule has no state), the entity
+    # id (None when not captured) and the timestamp in ns since the epoch
+    # (MISSING_TS when absent; only parsed for matched lines)
+    rule: array = field(default_factory=lambda: array("i"))
+    rule_id: array = field(default_factory=lambda: array("i"))
+    state_id: array = field(default_factory=lambda: array("i"))
+    entity_id: List[Optional[str]] = field(default_factory=list)
+    timestamp: array = field(default_factory=lambda: array("q"))
+
+    def __len__(self):
+        return len(self.rule)
+
+    def extend(self, other: "ClassifiedBatch"):
+        self.rule.extend(other.rule)
+        self.rule_id.extend(other.rule_id)
+        self.state_id.extend(other.state_id)
+        self.entity_id.extend(other.entity_id)
+        self.timestamp.extend(other.timestamp)
+
+    def records(self):
+        # (entity_id, timestamp, state_id, rule_id) for rows that yield an
+        # FSM event, the record form build_fsm_ids takes
+        for eid, ts, state_id, rule_id in zip(self.entity_id, self.timestamp, self.state_id, self.rule_id):
+            if eid and state_id >= 0:
+                yield eid, ts, state_id, rule_id
@@ -1,9 +1,14 @@
 import re
+import calendar
+import time
 
 TS_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d+')
 LONG_ID_PATTERN = re.compile(r'[A-Z0-9]{6,}')
 NUM_PATTERN = re.compile(r'\d+(\.\d+)?')
 
+# sorts before every real timestamp, like "" does for the string form
+MISSING_TS = -(1 << 63)
+
 def normalize_line(raw: str) -> str:
     line = TS_PATTERN.sub("<TS>", raw)
     line = LONG_ID_PATTERN.sub("<ID>", line)
@@ -14,3 +19,18 @@ def normalize_line(raw: str) -> str:
 def extract_timestamp(raw: str) -> str:
     m = TS_PATTERN.search(raw)
     return m.group(0) if m else ""
+
+def timestamp_to_ns(ts) -> int:
+    # ts is the TS_PATTERN form returned by extract_timestamp, taken as UTC
+    if not ts:
+        return MISSING_TS
+    secs = calendar.timegm((
+        int(ts[0:4]), int(ts[5:7]), int(ts[8:10]),
+        int(ts[11:13]), int(ts[14:16]), int(ts[17:19]),
+    ))
+    return secs * 1_000_000_000 + int(ts[20:29].ljust(9, "0"))
+
+def ns_to_timestamp(ns: int) -> str:
+    secs, frac = divmod(ns, 1_000_000_000)
+    base = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(secs))
+    return f"{base}.{frac // 1_000_000:03d}"
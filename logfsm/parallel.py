@@ -0,0 +1,357 @@
+import multiprocessing as mp
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import traceback
+from array import array
+from collections import defaultdict
+from itertools import chain
+from multiprocessing import shared_memory
+from .models import FSM
+from .symbols import SymbolTable
+
+# Multi-process classification of a log file. Each worker classifies its
+# own newline-aligned byte range of the file and writes fixed-width event
+# records into a shared-memory ring; the parent copies the columns out of
+# the ring into typed arrays (a memcpy per slot, no per-event objects) and
+# only ever receives small "slot filled" messages, so neither lines nor
+# events are pickled. The columns have to be kept until every worker is
+# done, since FSM counting needs each entity's events in file order and
+# workers fill their rings concurrently. Entity ids are coded per worker;
+# the new names of each slot ride along with its message and the parent
+# maps them into one global entity SymbolTable while merging. State and
+# rule ids agree everywhere since compile_rules numbers them
+# deterministically from the config.
+
+SLOT_RECORDS = 1 << 16
+SLOTS = 4
+READ_BLOCK = 8 << 20
+# seconds between checks for workers that died without reporting
+WORKER_POLL = 1.0
+# bytes per record: int64 ts, int32 entity, int32 state, int32 rule
+RECORD_BYTES = 20
+
+
+class ShmRing:
+    # `slots` slots of `slot_records` records each, stored column-wise per
+    # slot (ts[], entity[], state[], rule[]) so that every column can be
+    # viewed as a typed memoryview without copying
+
+    def __init__(self, slots: int = SLOTS, slot_records: int = SLOT_RECORDS, name: str = None):
+        self.slots = slots
+        self.slot_records = slot_records
+        self.slot_bytes = slot_records * RECORD_BYTES
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_bytes)
+        else:
+            self.shm = _attach(name)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def _spans(self, slot: int, n: int):
+        base = slot * self.slot_bytes
+        cap = self.slot_records
+        return ((base, "q", 8 * n),
+                (base + 8 * cap, "i", 4 * n),
+                (base + 12 * cap, "i", 4 * n),
+                (base + 16 * cap, "i", 4 * n))
+
+    def write(self, slot: int, ts, entity, state, rule):
+        n = len(ts)
+        buf = self.shm.buf
+        for (off, _, size), col in zip(self._spans(slot, n), (ts, entity, state, rule)):
+            buf[off:off + size] = col.tobytes()
+
+    def columns(self, slot: int, n: int):
+        # typed views onto the slot; release them before the slot is reused
+        buf = self.shm.buf
+        return [buf[off:off + size].cast(fmt) for off, fmt, size in self._spans(slot, n)]
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def _attach(name: str):
+    # Workers share the parent's resource tracker, which already tracks
+    # the segment; the parent unlinks it
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def split_ranges(path: str, parts: int):
+    # [(start, end)] byte ranges covering the file, each ending just after
+    # a newline (or at EOF), at most `parts` of them and none empty
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            target = max(size * i // parts, bounds[-1])
+            if target >= size:
+                break
+            f.seek(target)
+            f.readline()
+            pos = f.tell()
+            if pos > bounds[-1] and pos < size:
+                bounds.append(pos)
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _iter_blocks(path: str, start: int, end: int):
+    # text blocks of whole lines from [start, end)
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        carry = b""
+        while remaining > 0:
+            data = f.read(min(READ_BLOCK, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            data = carry + data
+            cut = data.rfind(b"\n") + 1 if remaining > 0 else len(data)
+            carry = data[cut:]
+            if cut:
+                yield data[:cut].decode("utf-8", errors="replace")
+        if carry:
+            yield carry.decode("utf-8", errors="replace")
+
+
+def _worker(worker, cfg, path, start, end, ring_name, slots, slot_records, free, filled):
+    from .rule_engine import compile_rules, classify_batch
+    ring = None
+    try:
+        ring = ShmRing(slots, slot_records, ring_name)
+        compiled = compile_rules(cfg)
+        codes = {}
+        new_names = []
+        slot = 0
+        ts, ent, st, rl = array("q"), array("i"), array("i"), array("i")
+
+        def flush():
+            nonlocal slot, ts, ent, st, rl, new_names
+            free.acquire()
+            ring.write(slot, ts, ent, st, rl)
+            filled.put((worker, slot, len(ts), new_names))
+            slot = (slot + 1) % slots
+            ts, ent, st, rl = array("q"), array("i"), array("i"), array("i")
+            new_names = []
+
+        for text in _iter_blocks(path, start, end):
+            batch = classify_batch(text, compiled)
+            for eid, t, state_id, rule_id in batch.records():
+                code = codes.get(eid)
+                if code is None:
+                    code = codes[eid] = len(codes)
+                    new_names.append(eid)
+                ts.append(t)
+                ent.append(code)
+                st.append(state_id)
+                rl.append(rule_id)
+                if len(ts) == slot_records:
+                    flush()
+        if len(ts) or new_names:
+            flush()
+        filled.put((worker, None, 0, None))
+    except BaseException:
+        filled.put((worker, None, -1, traceback.format_exc()))
+    finally:
+        if ring is not None:
+            ring.close()
+
+
+def _append_column(out, view):
+    # array.frombytes only takes byte-formatted buffers
+    with view.cast("B") as raw:
+        out.frombytes(raw)
+
+
+def classify_file_columns(path: str, cfg, workers: int = None,
+                          slots: int = SLOTS, slot_records: int = SLOT_RECORDS):
+    # Returns (blocks, entities): one (timestamps, entity, state, rule)
+    # block of typed arrays per worker, in file order, with entities given
+    # as codes into the entities SymbolTable and timestamps in ns
+    workers = workers or os.cpu_count() or 1
+    ranges = split_ranges(path, workers)
+    ctx = mp.get_context()
+    filled = ctx.Queue()
+    rings, frees, procs = [], [], []
+    entities = SymbolTable()
+    blocks = [_new_columns() for _ in ranges]
+    try:
+        for w, (start, end) in enumerate(ranges):
+            ring = ShmRing(slots, slot_records)
+            free = ctx.Semaphore(slots)
+            rings.append(ring)
+            frees.append(free)
+            proc = ctx.Process(target=_worker, name=f"logfsm-worker-{w}", daemon=True,
+                               args=(w, cfg, path, start, end, ring.name, slots, slot_records, free, filled))
+            proc.start()
+            procs.append(proc)
+
+        global_codes = [[] for _ in ranges]
+        finished = set()
+        while len(finished) < len(ranges):
+            try:
+                w, slot, n, payload = filled.get(timeout=WORKER_POLL)
+            except queue.Empty:
+                # a worker killed by a signal (or the OOM killer) never
+                # sends its last message; any other exit does
+                for w, proc in enumerate(procs):
+                    if w not in finished and proc.exitcode not in (None, 0):
+                        raise RuntimeError(f"classification worker {w} died with exit code {proc.exitcode}")
+                continue
+            if slot is None:
+                if n < 0:
+                    raise RuntimeError(f"classification worker {w} failed:\n{payload}")
+                finished.add(w)
+                continue
+            codes = global_codes[w]
+            intern = entities.intern
+            codes.extend(intern(name) for name in payload)
+            cols = rings[w].columns(slot, n)
+            try:
+                ts, ent, st, rl = cols
+                out_ts, out_ent, out_st, out_rl = blocks[w]
+                _append_column(out_ts, ts)
+                out_ent.extend(map(codes.__getitem__, ent))
+                _append_column(out_st, st)
+                _append_column(out_rl, rl)
+            finally:
+                for view in cols:
+                    view.release()
+            frees[w].release()
+    finally:
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        for ring in rings:
+            ring.close()
+            ring.unlink()
+    return blocks, entities
+
+
+def classify_file_parallel(path: str, cfg, workers: int = None,
+                           slots: int = SLOTS, slot_records: int = SLOT_RECORDS):
+    # Returns (records, entities): the FSM event records of the file as
+    # build_fsm_ids takes them, with entities given as codes into the
+    # entities SymbolTable and timestamps in ns, in file order per worker
+    blocks, entities = classify_file_columns(path, cfg, workers, slots, slot_records)
+    records = chain.from_iterable(zip(ent, ts, st, rl) for ts, ent, st, rl in blocks)
+    return list(records), entities
+
+
+def build_fsm_parallel(path: str, cfg, workers: int = None, **ring_options):
+    # counts straight off the columns, without a record per event
+    from .rule_engine import compile_rules
+    from .fsm_builder import fold_code_transitions
+    compiled = compile_rules(cfg)
+    blocks, _ = classify_file_columns(path, cfg, workers, **ring_options)
+    transitions = defaultdict(lambda: defaultdict(int))
+    for (prev, state_id, rule_id), count in fold_code_transitions(blocks, compiled.start_id).items():
+        transitions[prev][(state_id, rule_id)] += count
+    return FSM(transitions=transitions, symbols=compiled.symbols)
+
+
+# Entity-sharded FSM building. Transitions only depend on one entity's
+# events, so events are partitioned by entity into shards, each shard is
+# grouped, sorted and counted by its own process, and the per-shard
+# {(prev, state, rule): count} tables are summed. Partitioning happens in
+# the workers: events held by the parent would have to be walked there
+# one by one first, which alone costs more than counting them serially.
+
+def _new_columns():
+    return array("q"), array("i"), array("i"), array("i")
+
+
+def _sum_counts(parts):
+    total = defaultdict(int)
+    for part in parts:
+        for key, count in part.items():
+            total[key] += count
+    return total
+
+
+def _shard_file(tmpdir, mapper, shard):
+    return os.path.join(tmpdir, f"m{mapper:04d}-s{shard:04d}.bin")
+
+
+def _partition(blocks, out):
+    # kept apart from _map_store so no view into the store outlives it
+    shards = len(out)
+    for ts, ent, st, rl in blocks:
+        for t, e, s, r in zip(ts, ent, st, rl):
+            cols = out[e % shards]
+            cols[0].append(t)
+            cols[1].append(e)
+            cols[2].append(s)
+            cols[3].append(r)
+
+
+def _map_store(args):
+    # partition one range of store blocks into per-shard column files
+    from .event_store import EventStore
+    path, mapper, first, last, shards, tmpdir = args
+    out = [_new_columns() for _ in range(shards)]
+    with EventStore(path) as store:
+        store.blocks = store.blocks[first:last]
+        _partition(store.iter_blocks(), out)
+    for shard, cols in enumerate(out):
+        with open(_shard_file(tmpdir, mapper, shard), "wb") as f:
+            array("q", [len(cols[0])]).tofile(f)
+            for col in cols:
+                col.tofile(f)
+
+
+def _load_columns(path):
+    with open(path, "rb") as f:
+        n = array("q")
+        n.fromfile(f, 1)
+        cols = _new_columns()
+        for col in cols:
+            col.fromfile(f, n[0])
+    return cols
+
+
+def _reduce_store(args):
+    # count one shard from every mapper's output, in block order
+    from .fsm_builder import count_code_transitions
+    tmpdir, shard, mappers = args
+    blocks = (_load_columns(_shard_file(tmpdir, m, shard)) for m in range(mappers))
+    return dict(count_code_transitions(blocks))
+
+
+def build_fsm_from_store_sharded(path: str, start_state: str = None, workers: int = None) -> FSM:
+    # build_fsm_from_store on a process pool without moving events through
+    # the parent: mappers each read a range of blocks from the mmapped
+    # store and write their events to per-shard files (shard = entity code
+    # mod workers); reducers then count one shard each
+    from .event_store import EventStore
+    from .fsm_builder import fsm_from_store_codes
+    workers = workers or os.cpu_count() or 1
+    with EventStore(path) as store:
+        n_blocks = len(store.blocks)
+        states, rules = store.states, store.rules
+        if start_state is None:
+            start_state = store.start_state
+    mappers = max(1, min(workers, n_blocks))
+    step = -(-n_blocks // mappers)
+
+    tmpdir = tempfile.mkdtemp(prefix="logfsm-shards-")
+    try:
+        with mp.get_context().Pool(workers) as pool:
+            pool.map(_map_store, [(path, m, m * step, (m + 1) * step, workers, tmpdir)
+                                  for m in range(mappers)])
+            parts = pool.map(_reduce_store, [(tmpdir, shard, mappers) for shard in range(workers)])
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return fsm_from_store_codes(_sum_counts(parts), states, rules, start_state)
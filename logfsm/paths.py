@@ -0,0 +1,173 @@
+import heapq
+import json
+from itertools import count as _counter
+
+# Lifecycle variant collectors for the `paths` hook of build_fsm,
+# build_fsm_ids and build_fsm_streaming: each entity's full state sequence,
+# start state first, is passed to add() once the entity is counted.
+
+
+class PathTrie:
+    # Exact variant counts in a prefix trie. Nodes live in parallel lists
+    # (children dict, parent, label, entities passing through, entities
+    # ending here), so memory grows with the number of distinct prefixes,
+    # not with the number of entities.
+
+    exact = True
+
+    def __init__(self):
+        self._children = [{}]
+        self._parent = [-1]
+        self._label = [None]
+        self._through = [0]
+        self._ends = [0]
+        self.total = 0
+
+    def __len__(self) -> int:
+        # number of distinct variants
+        return sum(1 for n in self._ends if n)
+
+    @property
+    def nodes(self) -> int:
+        return len(self._children)
+
+    def add(self, path, n: int = 1):
+        self.total += n
+        node = 0
+        self._through[0] += n
+        children = self._children
+        for label in path:
+            child = children[node].get(label)
+            if child is None:
+                child = children[node][label] = len(children)
+                children.append({})
+                self._parent.append(node)
+                self._label.append(label)
+                self._through.append(0)
+                self._ends.append(0)
+            node = child
+            self._through[node] += n
+        self._ends[node] += n
+
+    def _find(self, path):
+        node = 0
+        for label in path:
+            node = self._children[node].get(label)
+            if node is None:
+                return None
+        return node
+
+    def count(self, path) -> int:
+        node = self._find(path)
+        return self._ends[node] if node is not None else 0
+
+    def prefix_count(self, prefix) -> int:
+        node = self._find(prefix)
+        return self._through[node] if node is not None else 0
+
+    def _path(self, node):
+        labels = []
+        while node > 0:
+            labels.append(self._label[node])
+            node = self._parent[node]
+        return tuple(reversed(labels))
+
+    def top(self, k: int = None):
+        # [(path, count, error)] most frequent first; error is always 0
+        ends = self._ends
+        nodes = (node for node, n in enumerate(ends) if n)
+        if k is None:
+            best = sorted(nodes, key=ends.__getitem__, reverse=True)
+        else:
+            best = heapq.nlargest(k, nodes, key=ends.__getitem__)
+        return [(self._path(node), ends[node], 0) for node in best]
+
+
+class SpaceSaving:
+    # Heavy-hitter counter (Metwally et al.) with at most `capacity` keys.
+    # A new key arriving when full replaces the key with the smallest count
+    # and inherits that count as its error, so every reported count is an
+    # overestimate by at most its error, and any key with a true count above
+    # total / capacity is guaranteed to be kept. The minimum is found
+    # through a lazily pruned heap.
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+        self._heap = []
+        self._seq = _counter()
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, key, n: int = 1):
+        self.total += n
+        counts = self.counts
+        c = counts.get(key)
+        if c is None:
+            if len(counts) < self.capacity:
+                c = 0
+                self.errors[key] = 0
+            else:
+                c = self._evict_min()
+                self.errors[key] = c
+        c += n
+        counts[key] = c
+        heap = self._heap
+        heapq.heappush(heap, (c, next(self._seq), key))
+        if len(heap) > 4 * self.capacity:
+            self._heap = [(v, next(self._seq), k) for k, v in counts.items()]
+            heapq.heapify(self._heap)
+
+    def _evict_min(self) -> int:
+        heap = self._heap
+        counts = self.counts
+        while True:
+            c, _, key = heapq.heappop(heap)
+            if counts.get(key) == c:
+                del counts[key]
+                del self.errors[key]
+                return c
+
+    def top(self, k: int = None):
+        # [(key, count, error)] by estimated count, highest first
+        items = self.counts.items()
+        if k is None:
+            best = sorted(items, key=lambda kv: kv[1], reverse=True)
+        else:
+            best = heapq.nlargest(k, items, key=lambda kv: kv[1])
+        return [(key, c, self.errors[key]) for key, c in best]
+
+
+class TopVariants(SpaceSaving):
+    # bounded-memory variant counter: only `capacity` paths are tracked
+
+    exact = False
+
+    def add(self, path, n: int = 1):
+        super().add(tuple(path), n)
+
+
+def make_collector(capacity: int = None):
+    return PathTrie() if capacity is None else TopVariants(capacity)
+
+
+def variants_to_dict(collector, k: int = None, names=None) -> dict:
+    # names maps symbol ids back to state names for id-keyed paths
+    variants = []
+    for path, c, error in collector.top(k):
+        if names is not None:
+            path = [names[s] for s in path]
+        entry = {"path": list(path), "count": c}
+        if not collector.exact:
+            entry["error"] = error
+        variants.append(entry)
+    return {"total": collector.total, "exact": collector.exact, "variants": variants}
+
+
+def variants_to_json(collector, k: int = None, names=None) -> str:
+    return json.dumps(variants_to_dict(collector, k, names), indent=2)
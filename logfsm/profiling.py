@@ -0,0 +1,148 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from .rule_engine import CompiledRule
+from .fix import FixRule
+
+PROFILE_MODES = ("cprofile", "sample")
+
+
+class RuleTimer:
+    # Per-rule match time. While installed, the match methods of every
+    # regex and FIX rule are wrapped to count calls and hits and add up
+    # the time spent; `active` names the rule currently matching so the
+    # sampler can attribute samples to it.
+
+    def __init__(self):
+        self.rules = {}
+        self.active = None
+
+    def _wrap(self, method):
+        timer = self
+        clock = time.perf_counter
+
+        def timed(rule, arg):
+            timer.active = rule.name
+            start = clock()
+            try:
+                m = method(rule, arg)
+            finally:
+                elapsed = clock() - start
+                timer.active = None
+            row = timer.rules.get(rule.name)
+            if row is None:
+                row = timer.rules[rule.name] = [0, 0, 0.0]
+            row[0] += 1
+            row[2] += elapsed
+            if m:
+                row[1] += 1
+            return m
+
+        return timed
+
+    @contextmanager
+    def installed(self):
+        saved = (CompiledRule.match, FixRule.match_fields)
+        CompiledRule.match = self._wrap(saved[0])
+        FixRule.match_fields = self._wrap(saved[1])
+        try:
+            yield self
+        finally:
+            CompiledRule.match, FixRule.match_fields = saved
+
+    def format(self) -> str:
+        rows = [f"{'rule':24s} {'calls':>10s} {'hits':>10s} {'total s':>9s} {'us/call':>9s}"]
+        by_time = sorted(self.rules.items(), key=lambda kv: kv[1][2], reverse=True)
+        for name, (calls, hits, seconds) in by_time:
+            rows.append(f"{name:24s} {calls:10,d} {hits:10,d} {seconds:9.3f} "
+                        f"{seconds / calls * 1e6:9.2f}")
+        return "\n".join(rows)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    # Low-overhead sampling profiler: a daemon thread snapshots the target
+    # thread's stack every `interval` seconds and counts collapsed stacks
+    # (root first, ';' separated), the input format of flamegraph.pl and
+    # speedscope. Samples taken inside a rule match get a "rule:NAME" leaf.
+
+    def __init__(self, interval: float = 0.001, rule_timer: RuleTimer = None):
+        self.interval = interval
+        self.rule_timer = rule_timer
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def _sample(self):
+        own = (__file__, threading.__file__)
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            labels = []
+            while frame is not None:
+                if frame.f_code.co_filename not in own:
+                    labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if not labels:
+                continue
+            labels.reverse()
+            rule = self.rule_timer.active if self.rule_timer is not None else None
+            if rule is not None:
+                labels.append(f"rule:{rule}")
+            self.stacks[";".join(labels)] += 1
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._sample, name="logfsm-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def run_profiled(func, args, out: str, mode: str = "cprofile", interval: float = 0.001, stream=None):
+    # Runs func(args) under the chosen profiler and writes the profile to
+    # out: a pstats file for "cprofile" (snakeviz, gprof2dot, pstats) or
+    # collapsed stacks for "sample". The per-rule match table goes to
+    # stream (stderr by default). The profile is written even if func fails.
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"unknown profile mode: {mode}")
+    stream = stream if stream is not None else sys.stderr
+    timer = RuleTimer()
+
+    if mode == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        begin, end = profiler.enable, profiler.disable
+    else:
+        profiler = StackSampler(interval, timer)
+        begin, end = profiler.start, profiler.stop
+
+    try:
+        with timer.installed():
+            begin()
+            try:
+                return func(args)
+            finally:
+                end()
+    finally:
+        if mode == "cprofile":
+            profiler.dump_stats(out)
+        else:
+            profiler.write(out)
+        print(f"Profile written to {out}", file=stream)
+        if timer.rules:
+            print(timer.format(), file=stream)
@@ -0,0 +1,201 @@
+from collections import defaultdict, deque
+from fractions import Fraction
+from .models import FSM
+from .fsm_builder import decode_fsm
+from .sketch import LatencySketch
+
+# Post-processing passes over FSM.transitions. Each takes a decoded or
+# id-keyed FSM, returns a new name-keyed FSM and leaves its input alone.
+# Passes are linear in the number of edges except merge_equivalent_states,
+# which is O(edges * log states).
+
+CHAIN_SEP = " > "
+
+def _copy(fsm: FSM):
+    fsm = decode_fsm(fsm)
+    transitions = {s: dict(dests) for s, dests in fsm.transitions.items() if dests}
+    latencies = {s: dict(dests) for s, dests in fsm.latencies.items() if dests}
+    return transitions, latencies
+
+def prune_edges(fsm: FSM, min_count: int = 1, min_share: float = 0.0) -> FSM:
+    # drops edges seen fewer than min_count times or carrying less than
+    # min_share of their source state's outgoing count
+    transitions, latencies = _copy(fsm)
+    out = {}
+    for from_state, dests in transitions.items():
+        total = sum(dests.values())
+        kept = {edge: count for edge, count in dests.items()
+                if count >= min_count and count >= min_share * total}
+        if kept:
+            out[from_state] = kept
+    kept_latencies = {}
+    for from_state, dests in latencies.items():
+        kept = {edge: sk for edge, sk in dests.items() if edge in out.get(from_state, ())}
+        if kept:
+            kept_latencies[from_state] = kept
+    return FSM(transitions=out, latencies=kept_latencies)
+
+def _states(transitions):
+    states = dict.fromkeys(transitions)
+    for dests in transitions.values():
+        for to_state, _ in dests:
+            states.setdefault(to_state)
+    return list(states)
+
+def equivalence_classes(fsm: FSM, keep=()) -> list:
+    # Partition refinement with a worklist of splitter blocks, after
+    # Hopcroft and Paige-Tarjan: two states are equivalent when, for every
+    # block, their shares of outgoing count into it per trigger are equal
+    # (so proportional distributions compare equal). Splitting by a block
+    # only re-keys that block's predecessors, and a block split while not
+    # waiting as a splitter leaves one piece off the worklist, so the work
+    # is O(edges * log states). States without outgoing edges, and states
+    # in keep, are never merged. Returns the blocks with more than one
+    # state, each in first-seen state order.
+    transitions, _ = _copy(fsm)
+    states = _states(transitions)
+    keep = set(keep)
+    total = {s: sum(dests.values()) for s, dests in transitions.items()}
+    preds = defaultdict(list)
+    for from_state, dests in transitions.items():
+        for (to_state, trigger), count in dests.items():
+            preds[to_state].append((from_state, trigger, count))
+
+    block = {}
+    members = []
+    mergeable = [s for s in states if s not in keep and s in transitions]
+    if mergeable:
+        members.append(set(mergeable))
+        block.update(dict.fromkeys(mergeable, 0))
+    for s in states:
+        if s not in block:
+            block[s] = len(members)
+            members.append({s})
+
+    work = deque(range(len(members)))
+    waiting = set(work)
+    while work:
+        b = work.popleft()
+        waiting.discard(b)
+        splitter = members[b]
+        weights = defaultdict(lambda: defaultdict(int))
+        for to_state in splitter:
+            for from_state, trigger, count in preds[to_state]:
+                weights[from_state][trigger] += count
+        touched = defaultdict(list)
+        for s in weights:
+            touched[block[s]].append(s)
+
+        for b, states_in in touched.items():
+            if len(members[b]) == 1:
+                continue
+            pieces = defaultdict(list)
+            for s in states_in:
+                shares = weights[s]
+                pieces[tuple(sorted((trigger, Fraction(count, total[s])) for trigger, count in shares.items()))].append(s)
+            pieces = list(pieces.values())
+            if len(states_in) == len(members[b]):
+                # no untouched rest: block b keeps the largest piece
+                if len(pieces) == 1:
+                    continue
+                pieces.remove(max(pieces, key=len))
+            new_blocks = []
+            for piece in pieces:
+                new_block = len(members)
+                members.append(set(piece))
+                members[b].difference_update(piece)
+                for s in piece:
+                    block[s] = new_block
+                new_blocks.append(new_block)
+            # a block already waiting as a splitter needs all its pieces
+            # queued; otherwise the largest piece can be left out
+            if b not in waiting:
+                new_blocks.append(b)
+                new_blocks.remove(max(new_blocks, key=lambda i: len(members[i])))
+            work.extend(new_blocks)
+            waiting.update(new_blocks)
+
+    groups = defaultdict(list)
+    for s in states:
+        groups[block[s]].append(s)
+    return [group for group in groups.values() if len(group) > 1]
+
+def _merge_sketches(a, b):
+    out = LatencySketch(a.relative_accuracy, a.max_bins)
+    out.merge(a)
+    out.merge(b)
+    return out
+
+def merge_equivalent_states(fsm: FSM, keep=(), sep: str = "|") -> FSM:
+    # merges each equivalence class into one state named by joining its
+    # members with sep; counts (and latency sketches) of edges that become
+    # identical are added
+    transitions, latencies = _copy(fsm)
+    rename = {}
+    for group in equivalence_classes(fsm, keep):
+        name = sep.join(group)
+        for s in group:
+            rename[s] = name
+    if not rename:
+        return FSM(transitions=transitions, latencies=latencies)
+
+    out = defaultdict(lambda: defaultdict(int))
+    for from_state, dests in transitions.items():
+        src = rename.get(from_state, from_state)
+        for (to_state, trigger), count in dests.items():
+            out[src][(rename.get(to_state, to_state), trigger)] += count
+    merged_latencies = defaultdict(dict)
+    for from_state, dests in latencies.items():
+        src = rename.get(from_state, from_state)
+        for (to_state, trigger), sketch in dests.items():
+            edge = (rename.get(to_state, to_state), trigger)
+            prev = merged_latencies[src].get(edge)
+            merged_latencies[src][edge] = sketch if prev is None else _merge_sketches(prev, sketch)
+    return FSM(transitions={s: dict(d) for s, d in out.items()}, latencies=dict(merged_latencies))
+
+def collapse_chains(fsm: FSM, keep=(), sep: str = CHAIN_SEP) -> FSM:
+    # Removes pass-through states: a state with exactly one incoming and one
+    # outgoing edge carrying the same count (every entity that enters also
+    # leaves), not a self-loop and not in keep. P -t1-> S -t2-> N becomes
+    # P -"t1 > t2"-> N, so counts are preserved exactly. Latency is dropped
+    # on collapsed edges since the two delays cannot be added as sketches.
+    transitions, latencies = _copy(fsm)
+    keep = set(keep)
+    incoming = defaultdict(dict)
+    for from_state, dests in transitions.items():
+        for to_state, trigger in dests:
+            incoming[to_state][(from_state, trigger)] = None
+
+    for s in list(transitions):
+        dests = transitions.get(s)
+        ins = incoming.get(s)
+        if s in keep or not dests or len(dests) != 1 or not ins or len(ins) != 1:
+            continue
+        (to_state, t2), count = next(iter(dests.items()))
+        from_state, t1 = next(iter(ins))
+        if to_state == s or from_state == s or transitions[from_state][(s, t1)] != count:
+            continue
+
+        new_edge = (to_state, f"{t1}{sep}{t2}")
+        del transitions[from_state][(s, t1)]
+        transitions[from_state][new_edge] = transitions[from_state].get(new_edge, 0) + count
+        del transitions[s]
+        latencies.pop(s, None)
+        if from_state in latencies:
+            latencies[from_state].pop((s, t1), None)
+        del incoming[s]
+        targets = incoming[to_state]
+        del targets[(s, t2)]
+        targets[(from_state, new_edge[1])] = None
+
+    return FSM(transitions=transitions, latencies={s: d for s, d in latencies.items() if d})
+
+def reduce_fsm(fsm: FSM, keep=(), min_count: int = 1, min_share: float = 0.0,
+               merge: bool = True, collapse: bool = True) -> FSM:
+    # prune, then merge equivalent states, then collapse chains
+    fsm = prune_edges(fsm, min_count, min_share)
+    if merge:
+        fsm = merge_equivalent_states(fsm, keep)
+    if collapse:
+        fsm = collapse_chains(fsm, keep)
+    return fsm
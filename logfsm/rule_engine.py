@@ -1,42 +1,133 @@
+import os
 import re
-from .models import ClassifiedEvent
-from .normalizer import normalize_line, extract_timestamp
+import sys
+import mmap
+from collections import deque
+from functools import partial
+from itertools import islice
+from .models import ClassifiedEvent, ClassifiedBatch
+from .normalizer import normalize_line, extract_timestamp, timestamp_to_ns, MISSING_TS, TS_PATTERN
+from .symbols import SymbolTable
+from .fix import FixRule, parse_fix
+from .dispatch import RuleDispatcher
+
+REGEX_ENGINES = ("re", "regex")
+
+def regex_engine(name: str = "re"):
+    # the module rules are compiled with; the third-party regex module
+    # releases the GIL while matching, which lets threaded classification
+    # scale on standard CPython builds
+    if name == "re":
+        return re
+    if name == "regex":
+        try:
+            import regex
+        except ImportError:
+            raise ValueError("regex_engine 'regex' requires the regex package (pip install regex)") from None
+        return regex
+    raise ValueError(f"unknown regex_engine: {name} (expected one of {', '.join(REGEX_ENGINES)})")
 
 class CompiledRule:
-    def __init__(self, name: str, regex: str, state: str):
+    def __init__(self, name: str, regex: str, state: str, engine=re):
         self.name = name
         self.state = state
-        self.pattern = re.compile(regex)
+        self.pattern = engine.compile(regex)
+        if engine is re:
+            self._search = self.pattern.search
+        else:
+            self._search = partial(self.pattern.search, concurrent=True)
+        self.groupindex = self.pattern.groupindex
+        self.fix = False
+        # filled in by compile_rules
+        self.rule_id = None
+        self.state_id = None
+        self.entity_group = None
+        self.alias_groups = ()
+        self.dimension_groups = ()
 
     def match(self, raw_line: str):
-        return self.pattern.search(raw_line)
+        return self._search(raw_line)
+
+class CompiledRules(list):
+    # the compiled rules in config order, plus the symbol table holding
+    # their state and rule names and the id of the config's start state
+    def __init__(self, rules=(), symbols=None, start_id=None):
+        super().__init__(rules)
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.start_id = start_id
+        self.dispatcher = None
 
 def compile_rules(cfg):
-    compiled = []
+    engine = regex_engine(cfg.regex_engine)
+    symbols = SymbolTable()
+    compiled = CompiledRules(symbols=symbols, start_id=symbols.intern(cfg.start_state))
     for rule in cfg.signal_rules:
-        compiled.append(
-            CompiledRule(
+        if "fix" in rule:
+            cr = FixRule(
+                name=rule["name"],
+                fields=rule["fix"],
+                state=rule["state"],
+                capture=rule.get("capture")
+            )
+        else:
+            cr = CompiledRule(
                 name=rule["name"],
                 regex=rule["regex"],
-                state=rule["state"]
+                state=rule["state"],
+                engine=engine
             )
-        )
+        cr.rule_id = symbols.intern(cr.name)
+        cr.state_id = symbols.intern(cr.state)
+        if cfg.entity_id_field in cr.groupindex:
+            cr.entity_group = cfg.entity_id_field
+        cr.alias_groups = tuple(f for f in cfg.alias_fields if f in cr.groupindex)
+        if any(f in cr.groupindex for f in cfg.dimensions):
+            cr.dimension_groups = tuple(f if f in cr.groupindex else None for f in cfg.dimensions)
+        compiled.append(cr)
+    compiled.dispatcher = RuleDispatcher(compiled)
     return compiled
 
+def first_match(raw_line: str, compiled_rules):
+    # first rule in config order that matches, with its match object;
+    # FIX field rules share a single parse of the line
+    dispatcher = getattr(compiled_rules, "dispatcher", None)
+    if dispatcher is not None and dispatcher.size == len(compiled_rules):
+        candidates, fields = dispatcher.route(raw_line)
+    else:
+        candidates, fields = compiled_rules, None
+    for rule in candidates:
+        if rule.fix:
+            if fields is None:
+                fields = parse_fix(raw_line)
+            m = rule.match_fields(fields)
+        else:
+            m = rule.match(raw_line)
+        if m:
+            return rule, m
+    return None, None
+
 def classify_line(raw_line: str, compiled_rules, cfg):
+    rule, m = first_match(raw_line, compiled_rules)
+    return event_from_match(raw_line, rule, m, cfg)
+
+def event_from_match(raw_line: str, rule, m, cfg):
+    # the ClassifiedEvent for a line given its first_match result
     norm = normalize_line(raw_line)
     ts = extract_timestamp(raw_line)
     match_rule = None
     entity_id_val = None
     state = None
+    aliases = ()
+    dimensions = ()
 
-    for rule in compiled_rules:
-        m = rule.match(raw_line)
-        if m:
-            match_rule = rule.name
-            state = rule.state
-            entity_id_val = m.groupdict().get(cfg.entity_id_field, None)
-            break
+    if m:
+        match_rule = rule.name
+        state = rule.state
+        entity_id_val = m.groupdict().get(cfg.entity_id_field, None)
+        if rule.alias_groups:
+            aliases = tuple(a for a in map(m.group, rule.alias_groups) if a)
+        if rule.dimension_groups:
+            dimensions = tuple(m.group(g) if g else None for g in rule.dimension_groups)
 
     return ClassifiedEvent(
         raw_line=raw_line,
@@ -44,5 +135,119 @@ def classify_line(raw_line: str, compiled_rules, cfg):
         timestamp=ts,
         entity_id=entity_id_val,
         rule_name=match_rule,
-        state=state
+        state=state,
+        aliases=aliases,
+        dimensions=dimensions
     )
+
+def classify_line_ids(raw_line: str, compiled_rules):
+    # FSM-building fast path over rules from compile_rules: returns
+    # (entity_id, timestamp, state_id, rule_id) for a line that yields an
+    # FSM event, else None, without normalizing or building a ClassifiedEvent
+    rule, m = first_match(raw_line, compiled_rules)
+    return ids_from_match(raw_line, rule, m)
+
+def ids_from_match(raw_line: str, rule, m):
+    if not m or rule.entity_group is None or not rule.state:
+        return None
+    entity_id = m.group(rule.entity_group)
+    if not entity_id:
+        return None
+    return entity_id, extract_timestamp(raw_line), rule.state_id, rule.rule_id
+
+# a line of a bytes buffer, with its "\n" if it has one
+_BUFFER_LINE = re.compile(rb"[^\n]*\n|[^\n]+")
+
+def _buffer_lines(buf):
+    # decoded lines of a bytes-like buffer; the regex scans the buffer in
+    # place, so only one line at a time is copied out of an mmap
+    for m in _BUFFER_LINE.finditer(buf):
+        line = m.group()
+        if line.endswith(b"\n"):
+            line = line[:-1]
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        yield line.decode("utf-8", errors="replace")
+
+def _batch_lines(block):
+    # str and bytes-like blocks are split on "\n" only (dropping a "\r"
+    # before it), as iterating a file gives lines, not on every character
+    # str.splitlines treats as a line break
+    if isinstance(block, (bytes, bytearray, memoryview, mmap.mmap)):
+        return _buffer_lines(block)
+    if isinstance(block, str):
+        lines = block.split("\n")
+        if not lines[-1]:
+            lines.pop()
+        return [ln[:-1] if ln.endswith("\r") else ln for ln in lines]
+    return block
+
+def classify_batch(block, compiled_rules) -> ClassifiedBatch:
+    # Classifies a block of lines -- a list of lines, or a str/bytes/mmap
+    # buffer split on line breaks -- into ClassifiedBatch columns in one
+    # call; rules must come from compile_rules, which resolves the entity
+    # field, so no config lookups or per-line objects are needed
+    index = {id(rule): i for i, rule in enumerate(compiled_rules)}
+    batch = ClassifiedBatch()
+    rule_col, rule_id_col, state_col = batch.rule, batch.rule_id, batch.state_id
+    entity_col, ts_col = batch.entity_id, batch.timestamp
+    search_ts = TS_PATTERN.search
+
+    for raw_line in _batch_lines(block):
+        rule, m = first_match(raw_line, compiled_rules)
+        if not m:
+            rule_col.append(-1)
+            rule_id_col.append(-1)
+            state_col.append(-1)
+            entity_col.append(None)
+            ts_col.append(MISSING_TS)
+            continue
+        rule_col.append(index[id(rule)])
+        rule_id_col.append(rule.rule_id)
+        state_col.append(rule.state_id if rule.state else -1)
+        group = rule.entity_group
+        entity_col.append((m.group(group) or None) if group is not None else None)
+        ts = search_ts(raw_line)
+        ts_col.append(timestamp_to_ns(ts.group(0)) if ts else MISSING_TS)
+    return batch
+
+BATCH_LINES = 8192
+
+def gil_enabled() -> bool:
+    # False on free-threaded (3.13t+) builds running without the GIL
+    check = getattr(sys, "_is_gil_enabled", None)
+    return check() if check is not None else True
+
+def iter_classified_batches(lines, compiled_rules, threads: int = None, batch_lines: int = BATCH_LINES):
+    # Runs classify_batch over consecutive slices of lines on a thread pool
+    # and yields the batches in input order. Threads share the compiled
+    # rules, so nothing is copied or pickled; at most 2 * threads slices
+    # are in flight, so lines may be an unbounded iterator. Matching only
+    # runs in parallel where it releases the GIL: on free-threaded builds
+    # or with regex_engine: regex.
+    from concurrent.futures import ThreadPoolExecutor
+
+    threads = threads or os.cpu_count() or 1
+    it = _batch_lines(lines) if not isinstance(lines, list) else lines
+    it = iter(it)
+    slices = iter(lambda: list(islice(it, batch_lines)), [])
+    if threads <= 1:
+        for chunk in slices:
+            yield classify_batch(chunk, compiled_rules)
+        return
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="logfsm-classify") as pool:
+        pending = deque()
+        for chunk in slices:
+            pending.append(pool.submit(classify_batch, chunk, compiled_rules))
+            if len(pending) >= 2 * threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def classify_threaded(lines, compiled_rules, threads: int = None, batch_lines: int = BATCH_LINES) -> ClassifiedBatch:
+    # classify_batch over many threads, as one concatenated batch
+    out = ClassifiedBatch()
+    for batch in iter_classified_batches(lines, compiled_rules, threads, batch_lines):
+        out.extend(batch)
+    return out
@@ -2,8 +2,8 @@ from collections import Counter
 from .normalizer import normalize_line
 
 def suggest_rules_from_lines(lines, top_n=20):
-    freq = Counter()
-    for line in lines:
-        norm = normalize_line(line)
-        freq[norm] += 1
-    return freq.most_common(top_n)
+    return suggest_rules_from_normalized(map(normalize_line, lines), top_n)
+
+def suggest_rules_from_normalized(norms, top_n=20):
+    # for lines already normalized, e.g. ClassifiedEvent.normalized_line
+    return Counter(norms).most_common(top_n)
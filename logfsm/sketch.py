@@ -0,0 +1,96 @@
+import math
+
+# Values at or below this are counted as zero; latencies are in seconds.
+MIN_VALUE = 1e-9
+
+
+class LatencySketch:
+    # DDSketch-style quantile sketch: values land in logarithmic buckets
+    # whose width keeps every quantile within relative_accuracy of the true
+    # value. The bucket count only grows with the log of the value range and
+    # is capped at max_bins (lowest buckets are folded together), so memory
+    # per sketch is constant however many values are added. Sketches with
+    # the same accuracy merge exactly by adding bucket counts.
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= MIN_VALUE:
+            self.zero_count += 1
+            return
+        idx = math.ceil(math.log(value) / self._log_gamma)
+        bins = self.bins
+        bins[idx] = bins.get(idx, 0) + 1
+        if len(bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_bins
+        folded = sum(self.bins.pop(k) for k in keys[:excess + 1])
+        self.bins[keys[excess]] = folded
+
+    def merge(self, other: "LatencySketch"):
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different accuracy")
+        for idx, n in other.bins.items():
+            self.bins[idx] = self.bins.get(idx, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q: float):
+        if not self.count:
+            return None
+        if not 0 <= q <= 1:
+            raise ValueError("quantile must be between 0 and 1")
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for idx in sorted(self.bins):
+            seen += self.bins[idx]
+            if rank < seen:
+                value = 2 * self.gamma ** idx / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self, quantiles=(0.5, 0.9, 0.99)) -> dict:
+        out = {"count": self.count}
+        if self.count:
+            out["min"] = self.min
+            out["max"] = self.max
+            for q in quantiles:
+                out[f"p{q * 100:g}"] = self.quantile(q)
+        return out
+
+
+def format_duration(seconds: float) -> str:
+    if seconds is None:
+        return "-"
+    if seconds >= 1:
+        return f"{seconds:.3g}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3g}ms"
+    if seconds >= 1e-6:
+        return f"{seconds * 1e6:.3g}us"
+    return f"{seconds * 1e9:.3g}ns"
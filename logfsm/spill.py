@@ -0,0 +1,174 @@
+import heapq
+import os
+import struct
+import tempfile
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+from .models import FSM
+from .normalizer import timestamp_to_ns, MISSING_TS
+from .sketch import LatencySketch
+from .symbols import SymbolTable
+from .fsm_builder import decode_fsm
+
+# External-memory grouping of events by entity for FSM building. Events are
+# buffered up to a record budget, sorted by (entity, timestamp) and spilled
+# to a temp file as a sorted run; the runs are then k-way merged with
+# heapq.merge so each entity's events come out together and in time order
+# while only one record per run is held in memory. Sorting and merging are
+# both stable, so events with equal timestamps keep their input order, as
+# they do in build_fsm.
+
+# rough in-memory cost of one buffered record (tuple, entity str, ints)
+RECORD_BYTES = 200
+SPILL_MB = 256
+# runs merged at once; more runs are first merged into longer runs
+MAX_FANIN = 64
+READ_BUFFER = 1 << 16
+
+# run record: int64 ts, int32 state, int32 rule, uint32 entity length,
+# followed by the utf-8 entity id
+_HEADER = struct.Struct("<qiiI")
+
+
+def _write_run(records, tmpdir):
+    fd, path = tempfile.mkstemp(prefix="logfsm-run-", suffix=".bin", dir=tmpdir)
+    pack = _HEADER.pack
+    with os.fdopen(fd, "wb", buffering=READ_BUFFER) as f:
+        for eid, ts, state, rule in records:
+            raw = eid.encode("utf-8")
+            f.write(pack(ts, state, rule, len(raw)))
+            f.write(raw)
+    return path
+
+
+def _read_run(path):
+    unpack = _HEADER.unpack
+    size = _HEADER.size
+    with open(path, "rb", buffering=READ_BUFFER) as f:
+        while True:
+            head = f.read(size)
+            if not head:
+                return
+            ts, state, rule, n = unpack(head)
+            yield f.read(n).decode("utf-8"), ts, state, rule
+
+
+_BY_ENTITY_TS = itemgetter(0, 1)
+
+
+class SpillSorter:
+    # add() (entity_id, ts_ns, state_id, rule_id) records, then iterate
+    # groups() once; nothing touches the disk unless more than max_records
+    # are added
+
+    def __init__(self, max_records: int, tmpdir: str = None):
+        if max_records < 1:
+            raise ValueError("max_records must be at least 1")
+        self.max_records = max_records
+        self.tmpdir = tmpdir
+        self.runs = []
+        self.count = 0
+        self._buffer = []
+
+    @classmethod
+    def for_memory(cls, memory_mb: float = SPILL_MB, tmpdir: str = None):
+        return cls(max(1, int(memory_mb * (1 << 20)) // RECORD_BYTES), tmpdir)
+
+    def add(self, entity_id: str, ts: int, state_id: int, rule_id: int):
+        self._buffer.append((entity_id, ts, state_id, rule_id))
+        self.count += 1
+        if len(self._buffer) >= self.max_records:
+            self._spill()
+
+    def _spill(self):
+        self._buffer.sort(key=_BY_ENTITY_TS)
+        self.runs.append(_write_run(self._buffer, self.tmpdir))
+        self._buffer = []
+
+    def _merged(self):
+        if not self.runs:
+            self._buffer.sort(key=_BY_ENTITY_TS)
+            return iter(self._buffer)
+        if self._buffer:
+            self._spill()
+        # keep merges within MAX_FANIN open files; runs stay in input order
+        # so that ties still resolve to the earlier event
+        while len(self.runs) > MAX_FANIN:
+            first, rest = self.runs[:MAX_FANIN], self.runs[MAX_FANIN:]
+            merged = _write_run(heapq.merge(*map(_read_run, first), key=_BY_ENTITY_TS), self.tmpdir)
+            for path in first:
+                os.unlink(path)
+            self.runs = [merged] + rest
+        return heapq.merge(*map(_read_run, self.runs), key=_BY_ENTITY_TS)
+
+    def groups(self):
+        # yields (entity_id, [(ts, state_id, rule_id), ...]) per entity
+        for eid, recs in groupby(self._merged(), key=itemgetter(0)):
+            yield eid, [rec[1:] for rec in recs]
+
+    def close(self):
+        for path in self.runs:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self.runs = []
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _count(groups, start_id: int, latency: bool, paths, names=None):
+    transition_counts = defaultdict(lambda: defaultdict(int))
+    latencies = defaultdict(lambda: defaultdict(LatencySketch))
+    for _, evs in groups:
+        prev = start_id
+        prev_ts = None
+        for ts, state_id, rule_id in evs:
+            transition_counts[prev][(state_id, rule_id)] += 1
+            if latency:
+                ts = ts if ts != MISSING_TS else None
+                if ts is not None and prev_ts is not None:
+                    latencies[prev][(state_id, rule_id)].add((ts - prev_ts) / 1e9)
+                prev_ts = ts
+            prev = state_id
+        if paths is not None:
+            path = (start_id,) + tuple(ev[1] for ev in evs)
+            paths.add(path if names is None else tuple(names[s] for s in path))
+    return transition_counts, latencies if latency else {}
+
+
+def _ns(ts):
+    return ts if isinstance(ts, int) else timestamp_to_ns(ts)
+
+
+def build_fsm_ids_external(records, start_id: int, symbols, paths=None,
+                           memory_mb: float = SPILL_MB, tmpdir: str = None) -> FSM:
+    # build_fsm_ids with per-entity grouping done in sorted runs on disk;
+    # records may be any iterable, e.g. a generator over stdin
+    with SpillSorter.for_memory(memory_mb, tmpdir) as sorter:
+        for eid, ts, state_id, rule_id in records:
+            sorter.add(eid, _ns(ts), state_id, rule_id)
+        transitions, _ = _count(sorter.groups(), start_id, False, paths)
+    return FSM(transitions=transitions, symbols=symbols)
+
+
+def build_fsm_external(events, start_state: str, latency: bool = False, paths=None,
+                       memory_mb: float = SPILL_MB, tmpdir: str = None) -> FSM:
+    # build_fsm with per-entity grouping done in sorted runs on disk; state
+    # and rule names are coded through a SymbolTable for the run files
+    table = SymbolTable()
+    intern = table.intern
+    start_id = intern(start_state)
+    with SpillSorter.for_memory(memory_mb, tmpdir) as sorter:
+        for ev in events:
+            if ev.entity_id and ev.state:
+                sorter.add(ev.entity_id, timestamp_to_ns(ev.timestamp),
+                           intern(ev.state), intern(ev.rule_name or "UNKNOWN_RULE"))
+        transitions, latencies = _count(sorter.groups(), start_id, latency, paths, table.names)
+    return decode_fsm(FSM(transitions=transitions, latencies=latencies, symbols=table))
@@ -0,0 +1,130 @@
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class PipelineStats:
+    # Wall/CPU time per named stage plus run counters. Stages are timed
+    # around whole loops, never per line, so the cost is a few clock reads
+    # per run; per-line progress is only wired in when progress_every is set.
+
+    enabled = True
+
+    def __init__(self, progress_every: int = 0, stream=None):
+        self.progress_every = progress_every or 0
+        self.stream = stream if stream is not None else sys.stderr
+        self.stages = {}
+        self.counters = {}
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            st = self.stages.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0})
+            st["wall_s"] += time.perf_counter() - wall
+            st["cpu_s"] += time.process_time() - cpu
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name: str, value):
+        self.counters[name] = value
+
+    def track_lines(self, lines):
+        # counts lines as they are consumed, reporting progress if enabled
+        n = 0
+        every = self.progress_every
+        try:
+            for n, line in enumerate(lines, 1):
+                if every and n % every == 0:
+                    elapsed = time.perf_counter() - self._wall0
+                    print(f"[logfsm] {n:,} lines  {n / elapsed:,.0f} lines/s",
+                          file=self.stream, flush=True)
+                yield line
+        finally:
+            self.count("lines", n)
+
+    def to_dict(self) -> dict:
+        wall = time.perf_counter() - self._wall0
+        lines = self.counters.get("lines", 0)
+        out = {
+            "wall_s": wall,
+            "cpu_s": time.process_time() - self._cpu0,
+            "lines_per_s": lines / wall if wall else None,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": {},
+            "counters": dict(self.counters),
+        }
+        if lines and "fsm_events" in self.counters:
+            out["match_ratio"] = self.counters["fsm_events"] / lines
+        for name, st in self.stages.items():
+            row = dict(st)
+            if lines and st["wall_s"]:
+                row["lines_per_s"] = lines / st["wall_s"]
+            out["stages"][name] = row
+        return out
+
+    def format(self) -> str:
+        data = self.to_dict()
+        rows = [f"{'stage':16s} {'wall s':>9s} {'cpu s':>9s} {'lines/s':>12s}"]
+        for name, st in data["stages"].items():
+            rate = f"{st['lines_per_s']:12,.0f}" if "lines_per_s" in st else f"{'-':>12s}"
+            rows.append(f"{name:16s} {st['wall_s']:9.3f} {st['cpu_s']:9.3f} {rate}")
+        rows.append(f"{'total':16s} {data['wall_s']:9.3f} {data['cpu_s']:9.3f} "
+                    f"{data['lines_per_s'] or 0:12,.0f}")
+        for name, value in data["counters"].items():
+            rows.append(f"{name}: {value:,}" if isinstance(value, int) else f"{name}: {value}")
+        if "match_ratio" in data:
+            rows.append(f"match_ratio: {data['match_ratio']:.3f}")
+        if data["peak_rss_mb"] is not None:
+            rows.append(f"peak_rss_mb: {data['peak_rss_mb']:.1f}")
+        return "\n".join(rows)
+
+    def report(self, to_stderr: bool = False, json_path: str = None):
+        if to_stderr:
+            print(self.format(), file=self.stream)
+        if json_path:
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=2)
+
+
+class NullStats:
+    # stand-in when stats are off: every hook is a no-op
+
+    enabled = False
+
+    def stage(self, name: str):
+        return nullcontext()
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+    def set(self, name: str, value):
+        pass
+
+    def track_lines(self, lines):
+        return lines
+
+    def report(self, to_stderr: bool = False, json_path: str = None):
+        pass
+
+
+NULL_STATS = NullStats()
@@ -0,0 +1,29 @@
+class SymbolTable:
+    # Maps state and rule names to small dense integers and back. Ids are
+    # assigned in first-seen order, so a table built from the same config
+    # always produces the same ids.
+
+    def __init__(self, names=()):
+        self._ids = {}
+        self.names = []
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name: str) -> int:
+        sid = self._ids.get(name)
+        if sid is None:
+            sid = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return sid
+
+    def id_of(self, name: str):
+        return self._ids.get(name)
+
+    def lookup(self, sid: int) -> str:
+        return self.names[sid]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._ids
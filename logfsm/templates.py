@@ -0,0 +1,177 @@
+import re
+from collections import OrderedDict
+from .fix import FieldMatch
+from .rule_engine import first_match, event_from_match, ids_from_match
+
+# Template-level classification. A line's template is the line with every
+# ASCII digit replaced by one placeholder, so lines that only differ in
+# their numbers (timestamps, numeric ids, quantities) share a template,
+# while every other character keeps its text and position. Rules are only
+# evaluated on the first line of each template: a bounded LRU map keeps the
+# position of the first matching rule and the spans of the groups the
+# classification reads, and later lines of the template take their captures
+# from the same spans of their own text.
+#
+# For a rule that treats all digits alike -- each of its literals, classes
+# and escapes matches either every digit or none -- the regex engine takes
+# the same steps on every line of a template, so the cached outcome and
+# spans hold. Rules that can tell digits apart (a literal digit as in
+# exectype=0, a class like [45], a backreference, and every FIX rule,
+# whose tags are numbers) are evaluated again on each line, as are the
+# ones among them that come before the cached rule, so results are those
+# of classify_line.
+
+TEMPLATE_CACHE = 65536
+_DIGITS = "0123456789"
+_MASK = str.maketrans(_DIGITS, "\0" * len(_DIGITS))
+
+# escapes that match every digit or none (or no character at all)
+_UNIFORM_ESCAPES = frozenset("dDwWsSbBAZntrfv")
+_ALL_DIGIT_ESCAPES = frozenset("dwS")
+_REPEAT = re.compile(r"\{\d*,?\d*\}")
+_GROUP_NAME = re.compile(r"\(\?P?<(?![=!])[^>]*>")
+
+
+def _class_digits(regex: str, i: int):
+    # (index after the class starting at regex[i], number of digits it
+    # names), or (None, None) when the class cannot be analysed
+    i += 1
+    if regex.startswith("^", i):
+        i += 1
+    digits = set()
+    first = True
+    while i < len(regex):
+        c = regex[i]
+        if c == "]" and not first:
+            return i + 1, len(digits)
+        first = False
+        if c == "[":
+            return None, None
+        if c == "\\":
+            esc = regex[i + 1:i + 2]
+            if esc in _ALL_DIGIT_ESCAPES:
+                digits.update(_DIGITS)
+                i += 2
+                continue
+            if esc.isalnum() and esc not in _UNIFORM_ESCAPES:
+                return None, None
+            c = esc
+            i += 2
+        else:
+            i += 1
+        if regex.startswith("-", i) and i + 1 < len(regex) and regex[i + 1] not in "]\\[":
+            hi = regex[i + 1]
+            digits.update(d for d in _DIGITS if c <= d <= hi)
+            i += 2
+        elif c in _DIGITS:
+            digits.add(c)
+    return None, None
+
+
+def digit_uniform(regex: str) -> bool:
+    # True when no part of the pattern tells two digits apart; unknown
+    # escapes and classes count as telling them apart
+    i = 0
+    while i < len(regex):
+        c = regex[i]
+        if c == "\\":
+            esc = regex[i + 1:i + 2]
+            if esc.isalnum() and esc not in _UNIFORM_ESCAPES:
+                return False
+            i += 2
+        elif c == "[":
+            i, digits = _class_digits(regex, i)
+            if i is None or digits not in (0, len(_DIGITS)):
+                return False
+        elif c == "{" and _REPEAT.match(regex, i):
+            i = _REPEAT.match(regex, i).end()
+        elif c == "(" and regex.startswith(("(?P=", "(?("), i):
+            return False
+        elif c == "(" and _GROUP_NAME.match(regex, i):
+            i = _GROUP_NAME.match(regex, i).end()
+        elif c in _DIGITS:
+            return False
+        else:
+            i += 1
+    return True
+
+
+class TemplateClassifier:
+    def __init__(self, compiled, cfg, capacity: int = TEMPLATE_CACHE):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.compiled = compiled
+        self.cfg = cfg
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._position = {id(rule): i for i, rule in enumerate(compiled)}
+        self.sensitive = [rule.fix or not digit_uniform(rule.pattern.pattern) for rule in compiled]
+        # cached position -> rules to evaluate again on a hit
+        self._plans = {}
+        # the groups event_from_match and ids_from_match read, per rule
+        self._groups = {}
+        for rule in compiled:
+            groups = [cfg.entity_id_field, *rule.alias_groups, *filter(None, rule.dimension_groups)]
+            self._groups[id(rule)] = tuple(g for g in dict.fromkeys(groups) if g in rule.groupindex)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def template(self, raw_line: str) -> str:
+        return raw_line.translate(_MASK)
+
+    def _plan(self, pos: int):
+        # the digit-sensitive rules up to and including the cached one
+        # (all of them for an unmatched template), in config order
+        plan = self._plans.get(pos)
+        if plan is None:
+            stop = pos + 1 if pos >= 0 else len(self.compiled)
+            plan = self._plans[pos] = tuple(rule for rule, sensitive in zip(self.compiled[:stop], self.sensitive)
+                                            if sensitive)
+        return plan
+
+    def match(self, raw_line: str):
+        # first_match(raw_line, compiled), from the template cache when the
+        # line's template has been seen
+        key = raw_line.translate(_MASK)
+        cache = self._cache
+        entry = cache.get(key)
+        if entry is None:
+            self.misses += 1
+            rule, m = first_match(raw_line, self.compiled)
+            pos = self._position[id(rule)] if m else -1
+            spans = None
+            if m and not self.sensitive[pos]:
+                spans = tuple((group, m.span(group)) for group in self._groups[id(rule)])
+            cache[key] = (pos, spans)
+            if len(cache) > self.capacity:
+                cache.popitem(last=False)
+            return rule, m
+
+        self.hits += 1
+        cache.move_to_end(key)
+        pos, spans = entry
+        plan = self._plan(pos)
+        if plan:
+            rule, m = first_match(raw_line, plan)
+            if m:
+                return rule, m
+        if pos < 0:
+            return None, None
+        if spans is None:
+            # the cached rule tells digits apart and no longer matches
+            return first_match(raw_line, self.compiled[pos + 1:])
+        values = FieldMatch()
+        for group, (start, end) in spans:
+            values[group] = raw_line[start:end] if start >= 0 else None
+        return self.compiled[pos], values
+
+    def classify(self, raw_line: str):
+        rule, m = self.match(raw_line)
+        return event_from_match(raw_line, rule, m, self.cfg)
+
+    def classify_ids(self, raw_line: str):
+        rule, m = self.match(raw_line)
+        return ids_from_match(raw_line, rule, m)
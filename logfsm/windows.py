@@ -0,0 +1,70 @@
+import heapq
+from collections import defaultdict
+from .models import FSM
+from .normalizer import timestamp_to_ns
+
+NS_PER_SEC = 1_000_000_000
+
+def iter_window_fsms(events, start_state: str, size: float, step: float = None):
+    # Events must arrive in timestamp order, as they do in a log. Each
+    # transition is counted in every window [k*step, k*step + size) that
+    # contains the timestamp of the event causing it; a window is yielded as
+    # (start_ns, FSM) once an event at or past its end arrives, so only the
+    # current state per entity and the open windows are kept in memory.
+    # Transitions whose windows have already been yielded are dropped.
+    size_ns = int(size * NS_PER_SEC)
+    step_ns = int(step * NS_PER_SEC) if step else size_ns
+    if size_ns <= 0 or step_ns <= 0:
+        raise ValueError("window size and step must be positive")
+
+    current = {}
+    open_windows = {}
+    pending = []
+    closed_before = None
+
+    for ev in events:
+        if not (ev.entity_id and ev.state):
+            continue
+        prev_state = current.get(ev.entity_id, start_state)
+        current[ev.entity_id] = ev.state
+        if not ev.timestamp:
+            continue
+        t = timestamp_to_ns(ev.timestamp)
+
+        while pending and pending[0] + size_ns <= t:
+            first = heapq.heappop(pending)
+            closed_before = first + step_ns
+            yield first, FSM(transitions=open_windows.pop(first))
+
+        key = (ev.state, ev.rule_name or "UNKNOWN_RULE")
+        start = ((t - size_ns) // step_ns + 1) * step_ns
+        if closed_before is not None and start < closed_before:
+            start = closed_before
+        while start <= t:
+            counts = open_windows.get(start)
+            if counts is None:
+                counts = open_windows[start] = defaultdict(lambda: defaultdict(int))
+                heapq.heappush(pending, start)
+            counts[prev_state][key] += 1
+            start += step_ns
+
+    while pending:
+        first = heapq.heappop(pending)
+        yield first, FSM(transitions=open_windows.pop(first))
+
+def diff_fsms(before: FSM, after: FSM) -> FSM:
+    # count deltas after - before; edges whose count did not change are omitted
+    delta = defaultdict(lambda: defaultdict(int))
+    for from_state, dests in after.transitions.items():
+        for edge, count in dests.items():
+            delta[from_state][edge] += count
+    for from_state, dests in before.transitions.items():
+        for edge, count in dests.items():
+            delta[from_state][edge] -= count
+
+    transitions = {}
+    for from_state, dests in delta.items():
+        changed = {edge: count for edge, count in dests.items() if count}
+        if changed:
+            transitions[from_state] = changed
+    return FSM(transitions=transitions)
@@ -0,0 +1,161 @@
+import ast
+import csv
+import heapq
+import json
+import struct
+import sys
+import zipfile
+from array import array
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+from .models import FSM
+from .fsm_builder import iter_edges, dot_edge, edge_to_dict
+
+# Streamed FSM writers: each walks the edges once and writes to an open
+# file handle as it goes, so output size never has to fit in one string.
+# Every writer takes the same min_count/top_k pruning options and returns
+# the number of edges written.
+
+def select_edges(fsm: FSM, min_count: int = 0, top_k: int = None):
+    # iter_edges, dropping edges seen fewer than min_count times and keeping
+    # only the top_k most frequent edges out of each state
+    edges = iter_edges(fsm)
+    if min_count:
+        edges = (edge for edge in edges if edge[3] >= min_count)
+    if top_k is None:
+        yield from edges
+        return
+    by_count = itemgetter(3)
+    for _, group in groupby(edges, key=itemgetter(0)):
+        yield from heapq.nlargest(top_k, group, key=by_count)
+
+def write_dot(fsm: FSM, f, min_count: int = 0, top_k: int = None) -> int:
+    n = 0
+    f.write("digraph FSM {\n")
+    for edge in select_edges(fsm, min_count, top_k):
+        f.write(dot_edge(*edge))
+        f.write("\n")
+        n += 1
+    f.write("}\n")
+    return n
+
+def write_json(fsm: FSM, f, min_count: int = 0, top_k: int = None) -> int:
+    # same document as fsm_to_json, one edge object per line
+    n = 0
+    f.write('{"transitions": [')
+    for edge in select_edges(fsm, min_count, top_k):
+        f.write(",\n  " if n else "\n  ")
+        f.write(json.dumps(edge_to_dict(*edge)))
+        n += 1
+    f.write("\n]}\n")
+    return n
+
+LATENCY_COLUMNS = ("p50_s", "p90_s", "p99_s")
+
+def write_csv(fsm: FSM, f, min_count: int = 0, top_k: int = None) -> int:
+    # from,to,trigger,count edge list; latency quantile columns are added
+    # when the FSM tracks latency (empty for edges without samples)
+    latency = bool(fsm.latencies)
+    out = csv.writer(f, lineterminator="\n")
+    out.writerow(("from", "to", "trigger", "count") + (LATENCY_COLUMNS if latency else ()))
+    n = 0
+    for from_state, to_state, trigger, count, sketch in select_edges(fsm, min_count, top_k):
+        row = [from_state, to_state, trigger, count]
+        if latency:
+            if sketch is None:
+                row += [""] * len(LATENCY_COLUMNS)
+            else:
+                row += [sketch.quantile(q) for q in (0.5, 0.9, 0.99)]
+        out.writerow(row)
+        n += 1
+    return n
+
+# NPZ adjacency: a zip of .npy arrays readable with numpy.load (no numpy
+# needed to write it). from/to/trigger index the states and triggers name
+# arrays; count holds the edge counts. Latency sketches are not stored.
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+NPZ_ARRAYS = ("from", "to", "trigger", "count", "states", "triggers")
+
+def _npy_header(descr: str, length: int) -> bytes:
+    header = repr({"descr": descr, "fortran_order": False, "shape": (length,)})
+    # pad so the data starts on a 64-byte boundary, as numpy writes it
+    pad = -(len(NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = (header + " " * pad + "\n").encode("latin1")
+    return NPY_MAGIC + struct.pack("<H", len(header)) + header
+
+def _int_npy(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return _npy_header(f"<i{values.itemsize}", len(values)) + values.tobytes()
+
+def _str_npy(names) -> bytes:
+    width = max((len(name) for name in names), default=1) or 1
+    data = b"".join(name.ljust(width, "\0").encode("utf-32-le") for name in names)
+    return _npy_header(f"<U{width}", len(names)) + data
+
+def write_npz(fsm: FSM, f, min_count: int = 0, top_k: int = None) -> int:
+    # f is a binary file handle or a path
+    states, triggers = {}, {}
+    src, dst, trig = array("i"), array("i"), array("i")
+    counts = array("q")
+    for from_state, to_state, trigger, count, _ in select_edges(fsm, min_count, top_k):
+        src.append(states.setdefault(from_state, len(states)))
+        dst.append(states.setdefault(to_state, len(states)))
+        trig.append(triggers.setdefault(trigger, len(triggers)))
+        counts.append(count)
+
+    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in (("from", src), ("to", dst), ("trigger", trig), ("count", counts)):
+            zf.writestr(f"{name}.npy", _int_npy(data))
+        zf.writestr("states.npy", _str_npy(list(states)))
+        zf.writestr("triggers.npy", _str_npy(list(triggers)))
+    return len(counts)
+
+def _read_npy(data: bytes):
+    if not data.startswith(NPY_MAGIC):
+        raise ValueError("not a .npy array written by write_npz")
+    size = struct.unpack_from("<H", data, len(NPY_MAGIC))[0]
+    start = len(NPY_MAGIC) + 2
+    header = ast.literal_eval(data[start:start + size].decode("latin1"))
+    body = data[start + size:]
+    descr = header["descr"]
+    if descr.startswith("<U"):
+        width = int(descr[2:]) * 4
+        return [body[i:i + width].decode("utf-32-le").rstrip("\0")
+                for i in range(0, len(body), width)]
+    values = array({"<i4": "i", "<i8": "q"}[descr])
+    values.frombytes(body)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def read_npz(f) -> FSM:
+    # counts-only FSM from a file written by write_npz
+    with zipfile.ZipFile(f) as zf:
+        try:
+            arrays = {name: _read_npy(zf.read(f"{name}.npy")) for name in NPZ_ARRAYS}
+        except KeyError as e:
+            raise ValueError(f"not an FSM adjacency file: {e}") from None
+    states, triggers = arrays["states"], arrays["triggers"]
+    transitions = defaultdict(dict)
+    for s, d, t, count in zip(arrays["from"], arrays["to"], arrays["trigger"], arrays["count"]):
+        transitions[states[s]][(states[d], triggers[t])] = count
+    return FSM(transitions=dict(transitions))
+
+# format name -> (writer, file mode, open kwargs)
+FORMATS = {
+    "dot": (write_dot, "w", {"encoding": "utf-8"}),
+    "json": (write_json, "w", {"encoding": "utf-8"}),
+    "csv": (write_csv, "w", {"encoding": "utf-8", "newline": ""}),
+    "npz": (write_npz, "wb", {}),
+}
+
+def write_fsm_file(fsm: FSM, path: str, fmt: str, min_count: int = 0, top_k: int = None) -> int:
+    try:
+        writer, mode, kwargs = FORMATS[fmt]
+    except KeyError:
+        raise ValueError(f"unknown FSM output format: {fmt}") from None
+    with open(path, mode, **kwargs) as f:
+        return writer(fsm, f, min_count, top_k)
@@ -0,0 +1,15 @@
+from logfsm.models import ClassifiedEvent
+
+
+def make_event(entity_id, timestamp, rule_name, state, **fields):
+    # a classified event without its log line; extra fields (aliases,
+    # dimensions) are passed through to ClassifiedEvent
+    return ClassifiedEvent(
+        raw_line="",
+        normalized_line="",
+        timestamp=timestamp,
+        entity_id=entity_id,
+        rule_name=rule_name,
+        state=state,
+        **fields
+    )
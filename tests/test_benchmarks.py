@@ -0,0 +1,77 @@
+import pytest
+from benchmarks.loggen import LogSpec, generate_lines, make_config
+from benchmarks.run import run_benchmarks, compare
+from logfsm.config import Config
+from logfsm.rule_engine import compile_rules, classify_line
+from logfsm.normalizer import extract_timestamp
+
+
+class TestLogGenerator:
+    """Test the synthetic log generator."""
+    
+    def test_line_count_and_match_ratio(self):
+        """Test that the generated log has the requested shape."""
+        spec = LogSpec(entities=50, states_per_entity=4, rules=5, match_ratio=0.8, out_of_order=0)
+        lines = generate_lines(spec)
+        cfg = Config(make_config(spec))
+        compiled = compile_rules(cfg)
+        events = [classify_line(ln, compiled, cfg) for ln in lines]
+        matched = [ev for ev in events if ev.rule_name]
+        
+        assert len(matched) == 200
+        assert len(lines) == 250
+        assert len({ev.entity_id for ev in matched}) == 50
+    
+    def test_line_length(self):
+        """Test that lines are padded to at least the requested length."""
+        lines = generate_lines(LogSpec(entities=10, line_length=200))
+        assert all(len(ln) >= 200 for ln in lines)
+    
+    def test_out_of_order(self):
+        """Test that out_of_order controls how many lines are swapped."""
+        ordered = generate_lines(LogSpec(entities=20, out_of_order=0))
+        shuffled = generate_lines(LogSpec(entities=20, out_of_order=0.2))
+        
+        stamps = [extract_timestamp(ln) for ln in ordered]
+        assert stamps == sorted(stamps)
+        stamps = [extract_timestamp(ln) for ln in shuffled]
+        assert stamps != sorted(stamps)
+    
+    def test_deterministic(self):
+        """Test that the same seed gives the same log."""
+        assert generate_lines(LogSpec(entities=10)) == generate_lines(LogSpec(entities=10))
+        assert generate_lines(LogSpec(entities=10)) != generate_lines(LogSpec(entities=10, seed=2))
+    
+    def test_invalid_match_ratio(self):
+        """Test that a zero match ratio is rejected."""
+        with pytest.raises(ValueError):
+            generate_lines(LogSpec(match_ratio=0))
+
+
+class TestBenchmarkRunner:
+    """Test the benchmark runner and baseline comparison."""
+    
+    def test_run_benchmarks(self):
+        """Test that every stage reports a throughput."""
+        results = run_benchmarks(LogSpec(entities=20, rules=3))
+        
+        assert results["lines"] > 0
+        for name in ("normalize_line", "classify_line", "suggest_rules_from_lines",
+                     "build_fsm", "fsm_to_dot", "end_to_end"):
+            assert results["stages"][name]["items"] >= 0
+            assert "peak_rss_mb" in results["stages"][name]
+    
+    def test_compare_flags_regressions(self):
+        """Test that only stages slower than the tolerance are reported."""
+        spec = {"entities": 1}
+        baseline = {"spec": spec, "stages": {"a": {"items_per_s": 100.0}, "b": {"items_per_s": 100.0}}}
+        results = {"spec": spec, "stages": {"a": {"items_per_s": 80.0}, "b": {"items_per_s": 70.0}}}
+        
+        problems = compare(results, baseline, 0.25)
+        assert len(problems) == 1
+        assert problems[0].startswith("b:")
+    
+    def test_compare_different_spec(self):
+        """Test that baselines for another log spec are not compared."""
+        problems = compare({"spec": {"entities": 1}, "stages": {}}, {"spec": {"entities": 2}}, 0.25)
+        assert problems == ["baseline was recorded with a different log spec"]
@@ -3,9 +3,11 @@ import tempfile
 import os
 import sys
 import io
+import json
 from unittest.mock import patch, MagicMock
+import subprocess
 import yaml
-from logfsm.cli import cmd_suggest_rules, cmd_build_fsm, main
+from logfsm.cli import cmd_suggest_rules, cmd_build_fsm, cmd_fsm_from_events, cmd_check, cmd_analyze, main
 
 
 class TestCmdSuggestRules:
@@ -177,6 +179,22 @@ class TestCmdBuildFSM:
             args = MagicMock()
             args.config = config_path
             args.output_dot = None
+            args.save_events = None
+            args.window = None
+            args.stats = False
+            args.stats_json = None
+            args.progress = None
+            args.output_csv = None
+            args.output_npz = None
+            args.min_count = 0
+            args.top_k = None
+            args.variants = None
+            args.threads = None
+            args.spill_mb = None
+            args.output_dimensions = None
+            args.templates = None
+            args.latency = False
+            args.output_json = None
             
             with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
                 cmd_build_fsm(args)
@@ -221,6 +239,22 @@ class TestCmdBuildFSM:
             args = MagicMock()
             args.config = config_path
             args.output_dot = dot_path
+            args.save_events = None
+            args.window = None
+            args.stats = False
+            args.stats_json = None
+            args.progress = None
+            args.output_csv = None
+            args.output_npz = None
+            args.min_count = 0
+            args.top_k = None
+            args.variants = None
+            args.threads = None
+            args.spill_mb = None
+            args.output_dimensions = None
+            args.templates = None
+            args.latency = False
+            args.output_json = None
             
             with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
                 cmd_build_fsm(args)
@@ -267,6 +301,22 @@ class TestCmdBuildFSM:
             args = MagicMock()
             args.config = config_path
             args.output_dot = None
+            args.save_events = None
+            args.window = None
+            args.stats = False
+            args.stats_json = None
+            args.progress = None
+            args.output_csv = None
+            args.output_npz = None
+            args.min_count = 0
+            args.top_k = None
+            args.variants = None
+            args.threads = None
+            args.spill_mb = None
+            args.output_dimensions = None
+            args.templates = None
+            args.latency = False
+            args.output_json = None
             
             with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
                 cmd_build_fsm(args)
@@ -284,6 +334,1143 @@ class TestCmdBuildFSM:
             os.unlink(config_path)
 
 
+    def test_cmd_build_fsm_save_events_and_rebuild(self, capsys):
+        """Test saving classified events and rebuilding the FSM from them."""
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "ACK_NEW",
+                    "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "ACKED_NEW"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            config_path = f.name
+        
+        with tempfile.NamedTemporaryFile(suffix='.lfe', delete=False) as f:
+            events_path = f.name
+        
+        try:
+            mock_lines = [
+                "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+                "2023-10-26T12:35:00.123 INFO ExecutionReport ExecType=0 ClOrdID=ABC123",
+                "2023-10-26T12:35:30.456 INFO Unknown message"
+            ]
+            
+            args = MagicMock()
+            args.config = config_path
+            args.output_dot = None
+            args.save_events = events_path
+            args.window = None
+            args.stats = False
+            args.stats_json = None
+            args.progress = None
+            args.output_csv = None
+            args.output_npz = None
+            args.min_count = 0
+            args.top_k = None
+            args.variants = None
+            args.threads = None
+            args.spill_mb = None
+            args.output_dimensions = None
+            args.templates = None
+            args.latency = False
+            args.output_json = None
+            
+            with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                cmd_build_fsm(args)
+            
+            captured = capsys.readouterr()
+            assert f"2 classified events written to {events_path}" in captured.err
+            direct_dot = captured.out
+            
+            args = MagicMock()
+            args.events = events_path
+            args.start_state = None
+            args.output_dot = None
+            args.workers = None
+            
+            cmd_fsm_from_events(args)
+            
+            captured = capsys.readouterr()
+            assert captured.out == direct_dot
+            assert '"START" -> "NEW_REQUESTED"' in captured.out
+            
+            args.workers = 2
+            cmd_fsm_from_events(args)
+            
+            assert capsys.readouterr().out == direct_dot
+        
+        finally:
+            os.unlink(config_path)
+            os.unlink(events_path)
+
+
+    def test_cmd_build_fsm_latency_json(self, capsys):
+        """Test build_fsm command writing latency quantiles to JSON."""
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "ACK_NEW",
+                    "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "ACKED_NEW"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            config_path = f.name
+        
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            json_path = f.name
+        
+        try:
+            mock_lines = [
+                "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+                "2023-10-26T12:34:57.789 INFO ExecutionReport ExecType=0 ClOrdID=ABC123"
+            ]
+            
+            args = MagicMock()
+            args.config = config_path
+            args.output_dot = None
+            args.save_events = None
+            args.window = None
+            args.stats = False
+            args.stats_json = None
+            args.progress = None
+            args.output_csv = None
+            args.output_npz = None
+            args.min_count = 0
+            args.top_k = None
+            args.variants = None
+            args.threads = None
+            args.spill_mb = None
+            args.output_dimensions = None
+            args.templates = None
+            args.latency = True
+            args.output_json = json_path
+            
+            with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                cmd_build_fsm(args)
+            
+            captured = capsys.readouterr()
+            assert "p50=1s p99=1s" in captured.out
+            assert f"FSM JSON written to {json_path}" in captured.err
+            
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            
+            ack = [e for e in data["transitions"] if e["trigger"] == "ACK_NEW"][0]
+            assert ack["count"] == 1
+            assert ack["latency"]["p99"] == pytest.approx(1.0)
+        
+        finally:
+            os.unlink(config_path)
+            os.unlink(json_path)
+    
+    def test_cmd_build_fsm_terminal_states(self, capsys):
+        """Test build_fsm command streaming with terminal states configured."""
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "REJECT",
+                    "regex": r"(?i)executionreport.*exectype=8.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "REJECTED"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START",
+            "terminal_states": ["REJECTED"],
+            "entity_ttl": 600
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            config_path = f.name
+        
+        try:
+            mock_lines = [
+                "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+                "2023-10-26T12:35:00.123 INFO ExecutionReport ExecType=8 ClOrdID=ABC123",
+                "2023-10-26T12:36:00.123 INFO NewOrderSingle ClOrdID=DEF456",
+                "2023-10-26T12:37:00.123 INFO NewOrderSingle ClOrdID=ABC123"
+            ]
+            
+            # every path restarts ABC123 after its terminal state
+            for latency, spill_mb in ((False, None), (True, None), (True, 0.0001)):
+                args = MagicMock()
+                args.config = config_path
+                args.output_dot = None
+                args.save_events = None
+                args.window = None
+                args.stats = False
+                args.stats_json = None
+                args.progress = None
+                args.output_csv = None
+                args.output_npz = None
+                args.min_count = 0
+                args.top_k = None
+                args.variants = None
+                args.threads = None
+                args.spill_mb = spill_mb
+                args.output_dimensions = None
+                args.templates = None
+                args.latency = latency
+                args.output_json = None
+                
+                with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                    cmd_build_fsm(args)
+                
+                output = capsys.readouterr().out
+                assert '"START" -> "NEW_REQUESTED" [label="NEW_ORDER\\n(3)' in output
+                assert '"NEW_REQUESTED" -> "REJECTED" [label="REJECT\\n(1)' in output
+                assert '"REJECTED" ->' not in output
+        
+        finally:
+            os.unlink(config_path)
+    
+    def test_cmd_build_fsm_edge_list_outputs(self, capsys):
+        """Test build_fsm command writing CSV/NPZ outputs and a pruned DOT."""
+        from logfsm.writers import read_npz
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "REJECT",
+                    "regex": r"(?i)reject.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "REJECTED"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            config_path = f.name
+        
+        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as f:
+            csv_path = f.name
+        with tempfile.NamedTemporaryFile(suffix='.npz', delete=False) as f:
+            npz_path = f.name
+        
+        try:
+            mock_lines = [
+                "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+                "2023-10-26T12:35:00.123 INFO NewOrderSingle ClOrdID=DEF456",
+                "2023-10-26T12:35:01.123 INFO Reject ClOrdID=XYZ789"
+            ]
+            
+            args = MagicMock()
+            args.config = config_path
+            args.output_dot = None
+            args.save_events = None
+            args.window = None
+            args.latency = False
+            args.output_json = None
+            args.stats = False
+            args.stats_json = None
+            args.progress = None
+            args.output_csv = csv_path
+            args.output_npz = npz_path
+            args.min_count = 2
+            args.top_k = None
+            args.variants = None
+            args.threads = None
+            args.spill_mb = None
+            args.output_dimensions = None
+            args.templates = None
+            
+            with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                cmd_build_fsm(args)
+            
+            captured = capsys.readouterr()
+            assert '"START" -> "NEW_REQUESTED" [label="NEW_ORDER\\n(2)"];' in captured.out
+            assert "REJECTED" not in captured.out
+            assert f"FSM CSV written to {csv_path}" in captured.err
+            
+            with open(csv_path, 'r', encoding='utf-8') as f:
+                rows = f.read().splitlines()
+            assert rows[0] == "from,to,trigger,count"
+            assert "START,REJECTED,REJECT,1" in rows
+            
+            assert read_npz(npz_path).transitions == {
+                "START": {("NEW_REQUESTED", "NEW_ORDER"): 2, ("REJECTED", "REJECT"): 1}
+            }
+        
+        finally:
+            os.unlink(config_path)
+            os.unlink(csv_path)
+            os.unlink(npz_path)
+    
+    def test_cmd_build_fsm_variants(self, capsys):
+        """Test build_fsm command writing top lifecycle variants."""
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "ACK_NEW",
+                    "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "ACKED_NEW"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            config_path = f.name
+        
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            variants_path = f.name
+        
+        try:
+            mock_lines = [
+                "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+                "2023-10-26T12:34:57.789 INFO ExecutionReport ExecType=0 ClOrdID=ABC123",
+                "2023-10-26T12:35:00.123 INFO NewOrderSingle ClOrdID=DEF456",
+                "2023-10-26T12:35:01.123 INFO ExecutionReport ExecType=0 ClOrdID=DEF456",
+                "2023-10-26T12:35:02.123 INFO NewOrderSingle ClOrdID=GHI789"
+            ]
+            
+            for capacity in (None, 10):
+                args = MagicMock()
+                args.config = config_path
+                args.output_dot = None
+                args.save_events = None
+                args.window = None
+                args.latency = False
+                args.output_json = None
+                args.stats = False
+                args.stats_json = None
+                args.progress = None
+                args.output_csv = None
+                args.output_npz = None
+                args.min_count = 0
+                args.top_k = None
+                args.variants = variants_path
+                args.threads = None
+                args.spill_mb = None
+                args.output_dimensions = None
+                args.templates = None
+                args.top_variants = 1
+                args.variant_capacity = capacity
+                
+                with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                    cmd_build_fsm(args)
+                
+                captured = capsys.readouterr()
+                assert f"Top 1 lifecycle variants written to {variants_path}" in captured.err
+                
+                with open(variants_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                
+                assert data["total"] == 3
+                assert data["exact"] is (capacity is None)
+                assert data["variants"][0]["path"] == ["START", "NEW_REQUESTED", "ACKED_NEW"]
+                assert data["variants"][0]["count"] == 2
+        
+        finally:
+            os.unlink(config_path)
+            os.unlink(variants_path)
+    
+    def test_cmd_build_fsm_threads(self, capsys):
+        """Test build_fsm command classifying on a thread pool."""
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "ACK_NEW",
+                    "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "ACKED_NEW"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            config_path = f.name
+        
+        try:
+            mock_lines = [
+                "2023-10-26T12:34:57.789 INFO ExecutionReport ExecType=0 ClOrdID=ABC123",
+                "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+                "2023-10-26T12:35:00.123 INFO NewOrderSingle ClOrdID=DEF456"
+            ]
+            outputs = []
+            for threads in (None, 2):
+                args = MagicMock()
+                args.config = config_path
+                args.output_dot = None
+                args.save_events = None
+                args.window = None
+                args.latency = False
+                args.output_json = None
+                args.stats = False
+                args.stats_json = None
+                args.progress = None
+                args.output_csv = None
+                args.output_npz = None
+                args.min_count = 0
+                args.top_k = None
+                args.variants = None
+                args.threads = threads
+                args.spill_mb = None
+                args.output_dimensions = None
+                args.templates = None
+                
+                with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                    cmd_build_fsm(args)
+                outputs.append(capsys.readouterr().out)
+            
+            assert outputs[0] == outputs[1]
+            assert '"NEW_REQUESTED" -> "ACKED_NEW" [label="ACK_NEW\\n(1)"];' in outputs[1]
+            
+            with open(config_path, 'w', encoding='utf-8') as f:
+                yaml.safe_dump(dict(config_data, terminal_states=["ACKED_NEW"]), f)
+            with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                cmd_build_fsm(args)
+            assert "--threads has no effect with terminal_states" in capsys.readouterr().err
+        
+        finally:
+            os.unlink(config_path)
+    
+    def test_cmd_build_fsm_spill(self, capsys):
+        """Test build_fsm command grouping events in sorted runs on disk."""
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "ACK_NEW",
+                    "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "ACKED_NEW"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            config_path = f.name
+        
+        try:
+            mock_lines = [
+                "2023-10-26T12:34:57.789 INFO ExecutionReport ExecType=0 ClOrdID=ABC123",
+                "2023-10-26T12:35:00.123 INFO NewOrderSingle ClOrdID=DEF456",
+                "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+                "2023-10-26T12:35:01.123 INFO ExecutionReport ExecType=0 ClOrdID=DEF456"
+            ]
+            for latency in (False, True):
+                outputs = []
+                # a budget this small spills every event to its own run
+                for spill_mb in (None, 0.0001):
+                    args = MagicMock()
+                    args.config = config_path
+                    args.output_dot = None
+                    args.save_events = None
+                    args.window = None
+                    args.latency = latency
+                    args.output_json = None
+                    args.stats = False
+                    args.stats_json = None
+                    args.progress = None
+                    args.output_csv = None
+                    args.output_npz = None
+                    args.min_count = 0
+                    args.top_k = None
+                    args.variants = None
+                    args.threads = None
+                    args.spill_mb = spill_mb
+                    args.output_dimensions = None
+                    args.templates = None
+                    
+                    with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                        cmd_build_fsm(args)
+                    outputs.append(capsys.readouterr().out)
+                
+                assert outputs[0] == outputs[1]
+                assert '"NEW_REQUESTED" -> "ACKED_NEW" [label="ACK_NEW\\n(2)' in outputs[1]
+        
+        finally:
+            os.unlink(config_path)
+    
+    def test_cmd_build_fsm_templates(self, capsys):
+        """Test build_fsm command classifying once per line template."""
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "ACK_NEW",
+                    "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "ACKED_NEW"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            config_path = f.name
+        
+        try:
+            mock_lines = [
+                "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+                "2023-10-26T12:35:00.123 INFO NewOrderSingle ClOrdID=ABC456",
+                "2023-10-26T12:34:57.789 INFO ExecutionReport ExecType=0 ClOrdID=ABC123",
+                "2023-10-26T12:35:01.123 INFO ExecutionReport ExecType=4 ClOrdID=ABC456"
+            ]
+            for latency, spill_mb in ((False, None), (False, 0.0001), (True, None)):
+                outputs = []
+                for templates in (None, 1):
+                    args = MagicMock()
+                    args.config = config_path
+                    args.output_dot = None
+                    args.save_events = None
+                    args.window = None
+                    args.latency = latency
+                    args.output_json = None
+                    args.stats = False
+                    args.stats_json = None
+                    args.progress = None
+                    args.output_csv = None
+                    args.output_npz = None
+                    args.min_count = 0
+                    args.top_k = None
+                    args.variants = None
+                    args.threads = None
+                    args.spill_mb = spill_mb
+                    args.output_dimensions = None
+                    args.templates = templates
+                    
+                    with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                        cmd_build_fsm(args)
+                    outputs.append(capsys.readouterr())
+                
+                assert outputs[0].out == outputs[1].out
+                assert '"NEW_REQUESTED" -> "ACKED_NEW" [label="ACK_NEW\\n(1)' in outputs[1].out
+                assert "2 of 4 lines classified from cached templates (2 templates evaluated)" in outputs[1].err
+        
+        finally:
+            os.unlink(config_path)
+    
+    def test_cmd_build_fsm_aliases(self, capsys):
+        """Test build_fsm command linking entity id aliases."""
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "REPLACE",
+                    "regex": r"(?i)ordercancelreplacerequest.*\bclordid=(?P<order_id>[A-Z0-9]+).*origclordid=(?P<orig_id>[A-Z0-9]+)",
+                    "state": "REPLACE_REQUESTED"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "alias_fields": ["orig_id"],
+            "start_state": "START",
+            "terminal_states": ["REPLACE_REQUESTED"]
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            config_path = f.name
+        
+        try:
+            mock_lines = [
+                "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+                "2023-10-26T12:34:57.789 INFO OrderCancelReplaceRequest ClOrdID=DEF456 OrigClOrdID=ABC123"
+            ]
+            
+            args = MagicMock()
+            args.config = config_path
+            args.output_dot = None
+            args.save_events = None
+            args.window = None
+            args.latency = False
+            args.output_json = None
+            args.stats = False
+            args.stats_json = None
+            args.progress = None
+            args.output_csv = None
+            args.output_npz = None
+            args.min_count = 0
+            args.top_k = None
+            args.variants = None
+            args.threads = None
+            args.output_dimensions = None
+            args.templates = None
+            
+            for spill_mb in (None, 64):
+                args.spill_mb = spill_mb
+                with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                    cmd_build_fsm(args)
+                
+                captured = capsys.readouterr()
+                assert '"NEW_REQUESTED" -> "REPLACE_REQUESTED" [label="REPLACE\\n(1)"];' in captured.out
+                assert '"START" -> "REPLACE_REQUESTED"' not in captured.out
+                assert ("--spill-mb has no effect with alias_fields" in captured.err) == bool(spill_mb)
+        
+        finally:
+            os.unlink(config_path)
+    
+    def test_cmd_build_fsm_dimensions(self, capsys):
+        """Test build_fsm command writing per-dimension FSMs."""
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+).*venue=(?P<venue>[A-Z]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "ACK_NEW",
+                    "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "ACKED_NEW"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START",
+            "dimensions": ["venue"],
+            "dimension_limit": 1,
+            "terminal_states": ["ACKED_NEW"]
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            config_path = f.name
+        
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            dims_path = f.name
+        
+        try:
+            mock_lines = [
+                "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123 Venue=XNYS",
+                "2023-10-26T12:34:57.789 INFO ExecutionReport ExecType=0 ClOrdID=ABC123",
+                "2023-10-26T12:35:00.123 INFO NewOrderSingle ClOrdID=DEF456 Venue=XNAS"
+            ]
+            
+            args = MagicMock()
+            args.config = config_path
+            args.output_dot = None
+            args.save_events = None
+            args.window = None
+            args.latency = False
+            args.output_json = None
+            args.stats = False
+            args.stats_json = None
+            args.progress = None
+            args.output_csv = None
+            args.output_npz = None
+            args.min_count = 0
+            args.top_k = None
+            args.variants = None
+            args.threads = None
+            args.spill_mb = None
+            args.output_dimensions = dims_path
+            args.templates = None
+            
+            with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                cmd_build_fsm(args)
+            
+            captured = capsys.readouterr()
+            assert f"Per-dimension FSMs (venue) written to {dims_path}" in captured.err
+            assert '"START" -> "NEW_REQUESTED" [label="NEW_ORDER\\n(2)"];' in captured.out
+            
+            with open(dims_path, 'r', encoding='utf-8') as f:
+                venues = json.load(f)["dimensions"]["venue"]
+            assert set(venues) == {"XNYS", "OTHER"}
+            assert len(venues["XNYS"]["transitions"]) == 2
+            assert venues["OTHER"]["entities"] == 1
+        
+        finally:
+            os.unlink(config_path)
+            os.unlink(dims_path)
+    
+    def test_cmd_build_fsm_stats(self, capsys):
+        """Test build_fsm command reporting stage statistics."""
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            config_path = f.name
+        
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            stats_path = f.name
+        
+        try:
+            mock_lines = [
+                "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+                "2023-10-26T12:35:00.123 INFO NewOrderSingle ClOrdID=DEF456",
+                "2023-10-26T12:35:30.456 INFO Unknown message",
+                "2023-10-26T12:35:31.456 INFO Unknown message"
+            ]
+            
+            args = MagicMock()
+            args.config = config_path
+            args.output_dot = None
+            args.save_events = None
+            args.window = None
+            args.latency = False
+            args.output_json = None
+            args.stats = True
+            args.stats_json = stats_path
+            args.progress = 2
+            args.output_csv = None
+            args.output_npz = None
+            args.min_count = 0
+            args.top_k = None
+            args.variants = None
+            args.threads = None
+            args.spill_mb = None
+            args.output_dimensions = None
+            args.templates = None
+            
+            with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                cmd_build_fsm(args)
+            
+            captured = capsys.readouterr()
+            assert "digraph FSM {" in captured.out
+            assert "[logfsm] 2 lines" in captured.err
+            assert "match_ratio: 0.500" in captured.err
+            
+            with open(stats_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            
+            assert set(data["stages"]) == {"load_config", "read", "classify", "build_fsm", "render"}
+            assert data["counters"] == {"lines": 4, "fsm_events": 2, "entities": 2, "edges": 1}
+        
+        finally:
+            os.unlink(config_path)
+            os.unlink(stats_path)
+    
+    def test_cmd_build_fsm_windows(self, capsys):
+        """Test build_fsm command emitting one DOT graph per window."""
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "ACK_NEW",
+                    "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "ACKED_NEW"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            config_path = f.name
+        
+        try:
+            mock_lines = [
+                "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+                "2023-10-26T12:41:00.123 INFO ExecutionReport ExecType=0 ClOrdID=ABC123"
+            ]
+            
+            args = MagicMock()
+            args.config = config_path
+            args.output_dot = None
+            args.save_events = None
+            args.window = 300
+            args.stats = False
+            args.stats_json = None
+            args.progress = None
+            args.output_csv = None
+            args.output_npz = None
+            args.min_count = 0
+            args.top_k = None
+            args.variants = None
+            args.threads = None
+            args.spill_mb = None
+            args.output_dimensions = None
+            args.templates = None
+            args.slide = None
+            args.window_diff = False
+            
+            with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+                cmd_build_fsm(args)
+            
+            output = capsys.readouterr().out
+            
+            assert output.count("digraph FSM {") == 2
+            assert "// window 2023-10-26T12:30:00.000 +300s" in output
+            assert "// window 2023-10-26T12:40:00.000 +300s" in output
+        
+        finally:
+            os.unlink(config_path)
+
+
+class TestCmdCheck:
+    """Test the check command."""
+    
+    def setup_method(self):
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "FILL",
+                    "regex": r"(?i)executionreport.*exectype=f.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "FILLED"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        }
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            self.config_path = f.name
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f:
+            json.dump({"transitions": [
+                {"from": "START", "to": "NEW_REQUESTED", "trigger": "NEW_ORDER", "count": 1},
+                {"from": "NEW_REQUESTED", "to": "FILLED", "trigger": "FILL", "count": 1}
+            ]}, f)
+            self.model_path = f.name
+    
+    def teardown_method(self):
+        os.unlink(self.config_path)
+        os.unlink(self.model_path)
+    
+    def make_args(self):
+        args = MagicMock()
+        args.config = self.config_path
+        args.model = self.model_path
+        args.output = None
+        return args
+    
+    def test_cmd_check_conforming(self, capsys):
+        """Test check command on logs that follow the model."""
+        mock_lines = [
+            "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+            "2023-10-26T12:34:57.789 INFO ExecutionReport ExecType=F ClOrdID=ABC123"
+        ]
+        
+        with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+            cmd_check(self.make_args())
+        
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert "2 events checked, 0 violations" in captured.err
+    
+    def test_cmd_check_violation(self, capsys):
+        """Test check command reporting a transition the model lacks."""
+        mock_lines = [
+            "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+            "2023-10-26T12:34:57.789 INFO ExecutionReport ExecType=F ClOrdID=XYZ999"
+        ]
+        
+        with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+            with pytest.raises(SystemExit) as exc:
+                cmd_check(self.make_args())
+        
+        assert exc.value.code == 1
+        captured = capsys.readouterr()
+        violation = json.loads(captured.out)
+        assert violation == {
+            "entity": "XYZ999", "from": "START", "to": "FILLED", "trigger": "FILL",
+            "timestamp": "2023-10-26T12:34:57.789", "line": mock_lines[1]
+        }
+        assert "2 events checked, 1 violations" in captured.err
+    
+    def test_cmd_check_own_log_with_ttl_and_aliases(self, capsys):
+        """Test that a log conforms to the model build-fsm builds from it with entity_ttl and aliases."""
+        config_data = {
+            "signal_rules": [
+                {"name": "NEW_ORDER", "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)", "state": "NEW"},
+                {"name": "REPLACE", "regex": r"(?i)cancelreplace.*clordid=(?P<order_id>[A-Z0-9]+) origclordid=(?P<orig_id>[A-Z0-9]+)", "state": "REPLACED"},
+                {"name": "FILL", "regex": r"(?i)executionreport.*exectype=f.*clordid=(?P<order_id>[A-Z0-9]+)", "state": "FILLED"}
+            ],
+            "entity_id_field": "order_id",
+            "alias_fields": ["orig_id"],
+            "start_state": "START",
+            "entity_ttl": 10
+        }
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+        mock_lines = [
+            "2023-10-26T12:00:00.000 INFO NewOrderSingle ClOrdID=A1",
+            "2023-10-26T12:01:40.000 INFO NewOrderSingle ClOrdID=A1",
+            "2023-10-26T12:01:41.000 INFO CancelReplace ClOrdID=B1 OrigClOrdID=A1",
+            "2023-10-26T12:01:42.000 INFO ExecutionReport ExecType=F ClOrdID=B1"
+        ]
+        
+        args = MagicMock()
+        args.config = self.config_path
+        args.output_dot = None
+        args.save_events = None
+        args.window = None
+        args.latency = False
+        args.output_json = self.model_path
+        args.stats = False
+        args.stats_json = None
+        args.progress = None
+        args.output_csv = None
+        args.output_npz = None
+        args.min_count = 0
+        args.top_k = None
+        args.variants = None
+        args.threads = None
+        args.spill_mb = None
+        args.output_dimensions = None
+        args.templates = None
+        with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+            cmd_build_fsm(args)
+        capsys.readouterr()
+        
+        with patch('sys.stdin', io.StringIO('\n'.join(mock_lines))):
+            cmd_check(self.make_args())
+        
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert "4 events checked, 0 violations" in captured.err
+
+
+class TestCmdAnalyze:
+    """Test the analyze command."""
+    
+    def setup_method(self):
+        config_data = {
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "ACK_NEW",
+                    "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "ACKED_NEW"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        }
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+            self.config_path = f.name
+        self.lines = [
+            "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+            "2023-10-26T12:34:57.000 WARN Session heartbeat timeout",
+            "2023-10-26T12:34:57.789 INFO ExecutionReport ExecType=0 ClOrdID=ABC123",
+            "2023-10-26T12:34:58.000 WARN Session heartbeat timeout",
+            "2023-10-26T12:34:59.000 INFO Unrelated status line"
+        ]
+    
+    def teardown_method(self):
+        os.unlink(self.config_path)
+    
+    def make_args(self, **overrides):
+        args = MagicMock()
+        args.config = self.config_path
+        args.top_n = 20
+        args.save = None
+        args.output_dot = None
+        args.output_json = None
+        args.output_csv = None
+        args.output_npz = None
+        args.min_count = 0
+        args.top_k = None
+        args.latency = False
+        args.stats = False
+        args.stats_json = None
+        args.cache = None
+        args.templates = None
+        for name, value in overrides.items():
+            setattr(args, name, value)
+        return args
+    
+    def make_build_args(self, **overrides):
+        args = self.make_args(**overrides)
+        args.save_events = None
+        args.window = None
+        args.progress = None
+        args.variants = None
+        args.threads = None
+        args.spill_mb = None
+        args.output_dimensions = None
+        return args
+    
+    def test_matches_separate_commands(self, capsys):
+        """Test that analyze prints what suggest-rules and build-fsm would."""
+        with patch('sys.stdin', io.StringIO('\n'.join(self.lines))):
+            cmd_analyze(self.make_args())
+        combined = capsys.readouterr()
+        
+        suggest_args = MagicMock()
+        suggest_args.config = self.config_path
+        suggest_args.top_n = 20
+        suggest_args.save = None
+        with patch('sys.stdin', io.StringIO('\n'.join(self.lines))):
+            cmd_suggest_rules(suggest_args)
+        suggested = capsys.readouterr().out
+        
+        with patch('sys.stdin', io.StringIO('\n'.join(self.lines))):
+            cmd_build_fsm(self.make_build_args())
+        built = capsys.readouterr().out
+        
+        assert combined.err == suggested
+        assert "- 2x  <ts> warn session heartbeat timeout" in combined.err
+        assert combined.out == built
+        assert '"START" -> "NEW_REQUESTED"' in combined.out
+    
+    def test_save_and_outputs(self, capsys):
+        """Test writing draft rules, the DOT file and stats."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            save_path = os.path.join(tmpdir, "draft.yaml")
+            dot_path = os.path.join(tmpdir, "fsm.dot")
+            stats_path = os.path.join(tmpdir, "stats.json")
+            args = self.make_args(save=save_path, output_dot=dot_path, top_n=1, stats_json=stats_path)
+            
+            with patch('sys.stdin', io.StringIO('\n'.join(self.lines))):
+                cmd_analyze(args)
+            captured = capsys.readouterr()
+            
+            with open(save_path, 'r', encoding='utf-8') as f:
+                rules = yaml.safe_load(f)["signal_rules"]
+            with open(dot_path, 'r', encoding='utf-8') as f:
+                dot = f.read()
+            with open(stats_path, 'r', encoding='utf-8') as f:
+                stats = json.load(f)
+        
+        assert [r["name"] for r in rules] == ["NEW_ORDER", "ACK_NEW", "AUTO_RULE_0"]
+        assert f"Wrote draft rules to {save_path}" in captured.err
+        assert "# Suggested candidate patterns" in captured.out
+        assert '"NEW_REQUESTED" -> "ACKED_NEW"' in dot
+        assert stats["counters"]["unmatched_lines"] == 3
+        assert stats["counters"]["fsm_events"] == 2
+
+    
+    def test_cache(self, capsys):
+        """Test that a second run with the cache re-evaluates no lines."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_path = os.path.join(tmpdir, "classify.cache")
+            outputs = []
+            for _ in range(2):
+                with patch('sys.stdin', io.StringIO('\n'.join(self.lines))):
+                    cmd_analyze(self.make_args(cache=cache_path))
+                outputs.append(capsys.readouterr())
+        
+        assert f"5 of 5 lines re-evaluated (classification cache {cache_path})" in outputs[0].err
+        assert f"0 of 5 lines re-evaluated (classification cache {cache_path})" in outputs[1].err
+        assert outputs[0].out == outputs[1].out
+        assert '"NEW_REQUESTED" -> "ACKED_NEW"' in outputs[1].out
+    
+    def test_templates(self, capsys):
+        """Test that per-template classification gives the same output."""
+        with patch('sys.stdin', io.StringIO('\n'.join(self.lines))):
+            cmd_analyze(self.make_args())
+        plain = capsys.readouterr()
+        
+        with patch('sys.stdin', io.StringIO('\n'.join(self.lines))):
+            cmd_analyze(self.make_args(templates=16))
+        cached = capsys.readouterr()
+        
+        assert cached.out == plain.out
+        assert "1 of 5 lines classified from cached templates (4 templates evaluated)" in cached.err
+        assert "- 2x  <ts> warn session heartbeat timeout" in cached.err
+    
+    def test_lifecycle_matches_build_fsm(self, capsys):
+        """Test that analyze restarts lifecycles as build-fsm does."""
+        config_data = {
+            "signal_rules": [
+                {"name": "NEW_ORDER", "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)", "state": "NEW"},
+                {"name": "FILL", "regex": r"(?i)executionreport.*exectype=f.*clordid=(?P<order_id>[A-Z0-9]+)", "state": "FILLED"}
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START",
+            "terminal_states": ["FILLED"],
+            "entity_ttl": 600
+        }
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            yaml.safe_dump(config_data, f)
+        lines = [
+            "2023-10-26T12:00:00.000 INFO NewOrderSingle ClOrdID=A1",
+            "2023-10-26T12:00:01.000 INFO ExecutionReport ExecType=F ClOrdID=A1",
+            "2023-10-26T12:00:02.000 INFO NewOrderSingle ClOrdID=A1",
+            "2023-10-26T12:00:03.000 INFO ExecutionReport ExecType=F ClOrdID=A1"
+        ]
+        
+        for latency in (False, True):
+            with patch('sys.stdin', io.StringIO('\n'.join(lines))):
+                cmd_analyze(self.make_args(latency=latency))
+            analyzed = capsys.readouterr().out
+            with patch('sys.stdin', io.StringIO('\n'.join(lines))):
+                cmd_build_fsm(self.make_build_args(latency=latency))
+            built = capsys.readouterr().out
+            
+            assert analyzed == built
+            assert '"START" -> "NEW" [label="NEW_ORDER\\n(2)' in analyzed
+            assert '"FILLED" -> "NEW"' not in analyzed
+
 class TestMain:
     """Test the main function and argument parsing."""
     
@@ -357,4 +1544,209 @@ class TestMain:
                 mock_cmd.assert_called_once()
                 args = mock_cmd.call_args[0][0]
                 assert args.config == 'rules.yaml'
-                assert args.output_dot == 'fsm.dot'
\ No newline at end of file
+                assert args.output_dot == 'fsm.dot'
+    
+    def test_main_build_fsm_window_variants_rejected(self, capsys):
+        """Test that --variants with --window is a usage error."""
+        test_args = [
+            'logfsm', 'build-fsm', '--config', 'rules.yaml',
+            '--window', '60', '--variants', 'variants.json'
+        ]
+        
+        with patch('sys.argv', test_args):
+            with patch('logfsm.cli.cmd_build_fsm') as mock_cmd:
+                with pytest.raises(SystemExit):
+                    main()
+                mock_cmd.assert_not_called()
+        
+        assert "--variants cannot be combined with --window" in capsys.readouterr().err
+    
+    def test_main_build_fsm_window_dimensions_rejected(self, capsys):
+        """Test that --output-dimensions with --window is a usage error."""
+        test_args = [
+            'logfsm', 'build-fsm', '--config', 'rules.yaml',
+            '--window', '60', '--output-dimensions', 'dims.json'
+        ]
+        
+        with patch('sys.argv', test_args):
+            with patch('logfsm.cli.cmd_build_fsm') as mock_cmd:
+                with pytest.raises(SystemExit):
+                    main()
+                mock_cmd.assert_not_called()
+        
+        assert "--output-dimensions cannot be combined with --window" in capsys.readouterr().err
+    
+    @pytest.mark.parametrize("flag, value", [
+        ("--save-events", "events.lfe"), ("--window", "60"), ("--output-dimensions", "dims.json")
+    ])
+    def test_main_build_fsm_spill_rejected(self, capsys, flag, value):
+        """Test that options needing every event in memory are usage errors with --spill-mb."""
+        test_args = [
+            'logfsm', 'build-fsm', '--config', 'rules.yaml',
+            '--spill-mb', '64', flag, value
+        ]
+        
+        with patch('sys.argv', test_args):
+            with patch('logfsm.cli.cmd_build_fsm') as mock_cmd:
+                with pytest.raises(SystemExit):
+                    main()
+                mock_cmd.assert_not_called()
+        
+        assert f"--spill-mb cannot be combined with {flag}" in capsys.readouterr().err
+    
+    @pytest.mark.parametrize("flag, value", [
+        ("--latency", None), ("--window", "60"), ("--save-events", "events.lfe"),
+        ("--spill-mb", "64"), ("--output-dimensions", "dims.json")
+    ])
+    def test_main_build_fsm_threads_rejected(self, capsys, flag, value):
+        """Test that options off the plain classification path are usage errors with --threads."""
+        test_args = ['logfsm', 'build-fsm', '--config', 'rules.yaml', '--threads', '4', flag]
+        if value is not None:
+            test_args.append(value)
+        
+        with patch('sys.argv', test_args):
+            with patch('logfsm.cli.cmd_build_fsm') as mock_cmd:
+                with pytest.raises(SystemExit):
+                    main()
+                mock_cmd.assert_not_called()
+        
+        assert f"--threads cannot be combined with {flag}" in capsys.readouterr().err
+    
+    def test_main_analyze_cache_templates_rejected(self, capsys):
+        """Test that --cache with --templates is a usage error."""
+        test_args = [
+            'logfsm', 'analyze', '--config', 'rules.yaml',
+            '--cache', 'abc.cache', '--templates', '65536'
+        ]
+        
+        with patch('sys.argv', test_args):
+            with patch('logfsm.cli.cmd_analyze') as mock_cmd:
+                with pytest.raises(SystemExit):
+                    main()
+                mock_cmd.assert_not_called()
+        
+        assert "--templates cannot be combined with --cache" in capsys.readouterr().err
+    
+    def test_main_build_fsm_threads_templates_rejected(self, capsys):
+        """Test that --threads with --templates is a usage error."""
+        test_args = [
+            'logfsm', 'build-fsm', '--config', 'rules.yaml',
+            '--threads', '4', '--templates', '65536'
+        ]
+        
+        with patch('sys.argv', test_args):
+            with patch('logfsm.cli.cmd_build_fsm') as mock_cmd:
+                with pytest.raises(SystemExit):
+                    main()
+                mock_cmd.assert_not_called()
+        
+        assert "--threads cannot be combined with --templates" in capsys.readouterr().err
+    
+    def test_main_fsm_from_events_command(self):
+        """Test main function with fsm-from-events command."""
+        test_args = ['logfsm', 'fsm-from-events', '--events', 'events.lfe']
+        
+        with patch('sys.argv', test_args):
+            with patch('logfsm.cli.cmd_fsm_from_events') as mock_cmd:
+                main()
+                mock_cmd.assert_called_once()
+                args = mock_cmd.call_args[0][0]
+                assert args.events == 'events.lfe'
+                assert args.start_state is None
+    
+    def test_main_analyze_command(self):
+        """Test main function with analyze command."""
+        test_args = ['logfsm', 'analyze', '--config', 'rules.yaml', '--top-n', '5']
+        
+        with patch('sys.argv', test_args):
+            with patch('logfsm.cli.cmd_analyze') as mock_cmd:
+                main()
+                mock_cmd.assert_called_once()
+                args = mock_cmd.call_args[0][0]
+                assert args.config == 'rules.yaml'
+                assert args.top_n == 5
+                assert args.output_dot is None
+    
+    def test_main_check_command(self):
+        """Test main function with check command."""
+        test_args = ['logfsm', 'check', '--config', 'rules.yaml', '--model', 'fsm.json']
+        
+        with patch('sys.argv', test_args):
+            with patch('logfsm.cli.cmd_check') as mock_cmd:
+                main()
+                mock_cmd.assert_called_once()
+                args = mock_cmd.call_args[0][0]
+                assert args.model == 'fsm.json'
+                assert args.output is None
+    
+    def test_main_profile_option(self, capsys):
+        """Test main function wrapping the command in the profiler."""
+        with tempfile.NamedTemporaryFile(suffix='.folded', delete=False) as f:
+            out_path = f.name
+        test_args = [
+            'logfsm', '--profile', out_path, '--profile-mode', 'sample',
+            'build-fsm', '--config', 'rules.yaml'
+        ]
+        
+        try:
+            with patch('sys.argv', test_args):
+                with patch('logfsm.cli.cmd_build_fsm') as mock_cmd:
+                    main()
+                    mock_cmd.assert_called_once()
+            
+            assert os.path.exists(out_path)
+            assert f"Profile written to {out_path}" in capsys.readouterr().err
+        finally:
+            os.unlink(out_path)
+    
+    def test_main_unknown_profile_mode(self, capsys):
+        """Test that an unknown profile mode is a usage error."""
+        test_args = [
+            'logfsm', '--profile', 'out.prof', '--profile-mode', 'perf',
+            'build-fsm', '--config', 'rules.yaml'
+        ]
+        
+        with patch('sys.argv', test_args):
+            with patch('logfsm.cli.cmd_build_fsm') as mock_cmd:
+                with pytest.raises(SystemExit):
+                    main()
+                mock_cmd.assert_not_called()
+        
+        assert "--profile-mode must be one of: cprofile, sample" in capsys.readouterr().err
+
+
+# cumulative import time of logfsm.cli from a cold interpreter; argparse is
+# the only dependency loaded at startup
+STARTUP_BUDGET_US = 60000
+DEFERRED_MODULES = {"yaml", "dataclasses", "json", "logfsm.config", "logfsm.rule_engine", "logfsm.fsm_builder"}
+
+
+class TestStartup:
+    """Test the cold-start cost of the logfsm entry point."""
+    
+    def import_times(self):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import logfsm.cli"],
+            capture_output=True, text=True, check=True
+        )
+        times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+        return times
+    
+    def test_subcommand_modules_not_imported(self):
+        """Test that YAML and the pipeline modules load only when a command runs."""
+        times = self.import_times()
+        
+        assert "logfsm.cli" in times
+        assert not DEFERRED_MODULES & set(times)
+    
+    def test_import_time_budget(self):
+        """Test that importing the CLI stays within the startup budget."""
+        times = self.import_times()
+        
+        assert times["logfsm.cli"] < STARTUP_BUDGET_US
@@ -16,6 +16,27 @@ class TestConfig:
         assert cfg.entity_id_field == "order_id"
         assert cfg.start_state == "START"
         assert cfg.unknown_state == "UNKNOWN"
+        assert cfg.terminal_states == []
+        assert cfg.entity_ttl is None
+    
+    def test_config_lifecycle_round_trip(self):
+        """Test that terminal states and entity TTL are saved only when set."""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            temp_path = f.name
+        
+        try:
+            Config({}).save(temp_path)
+            with open(temp_path, 'r', encoding='utf-8') as f:
+                saved_data = yaml.safe_load(f)
+            assert "terminal_states" not in saved_data
+            assert "entity_ttl" not in saved_data
+            
+            Config({"terminal_states": ["FILLED", "REJECTED"], "entity_ttl": 3600}).save(temp_path)
+            cfg = Config.load(temp_path)
+            assert cfg.terminal_states == ["FILLED", "REJECTED"]
+            assert cfg.entity_ttl == 3600
+        finally:
+            os.unlink(temp_path)
     
     def test_config_creation_with_values(self):
         """Test creating a Config with custom values."""
@@ -161,4 +182,62 @@ unknown_state: "UNKNOWN"
             with pytest.raises(yaml.YAMLError):
                 Config.load(temp_path)
         finally:
-            os.unlink(temp_path)
\ No newline at end of file
+            os.unlink(temp_path)
+    
+    def test_config_uses_c_yaml_when_available(self):
+        """Test that loading and saving prefer the libyaml C classes."""
+        from logfsm.config import _yaml
+        
+        _, loader, dumper = _yaml()
+        if yaml.__with_libyaml__:
+            assert loader is yaml.CSafeLoader
+            assert dumper is yaml.CSafeDumper
+        else:
+            assert loader is yaml.SafeLoader
+            assert dumper is yaml.SafeDumper
+    
+    def test_config_regex_engine(self):
+        """Test the regex_engine option default and round trip."""
+        assert Config({}).regex_engine == "re"
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            temp_path = f.name
+        try:
+            Config({}).save(temp_path)
+            with open(temp_path, 'r', encoding='utf-8') as f:
+                assert "regex_engine" not in f.read()
+            
+            Config({"regex_engine": "regex"}).save(temp_path)
+            assert Config.load(temp_path).regex_engine == "regex"
+        finally:
+            os.unlink(temp_path)
+    
+    def test_config_alias_fields(self):
+        """Test the alias_fields option default and round trip."""
+        assert Config({}).alias_fields == []
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            temp_path = f.name
+        try:
+            Config({}).save(temp_path)
+            with open(temp_path, 'r', encoding='utf-8') as f:
+                assert "alias_fields" not in f.read()
+            
+            Config({"alias_fields": ["orig_order_id"]}).save(temp_path)
+            assert Config.load(temp_path).alias_fields == ["orig_order_id"]
+        finally:
+            os.unlink(temp_path)
+    
+    def test_config_dimensions(self):
+        """Test the dimensions options defaults and round trip."""
+        cfg = Config({})
+        assert cfg.dimensions == [] and cfg.dimension_limit == 100
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False, encoding='utf-8') as f:
+            temp_path = f.name
+        try:
+            Config({"dimensions": ["venue"], "dimension_limit": 5}).save(temp_path)
+            loaded = Config.load(temp_path)
+            assert loaded.dimensions == ["venue"] and loaded.dimension_limit == 5
+        finally:
+            os.unlink(temp_path)
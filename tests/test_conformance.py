@@ -0,0 +1,108 @@
+import pytest
+import os
+import tempfile
+from logfsm.models import FSM
+from logfsm.fsm_builder import fsm_to_json
+from logfsm.symbols import SymbolTable
+from logfsm.writers import write_npz
+from logfsm.correlate import EntityCorrelator
+from logfsm.conformance import ConformanceChecker, load_model
+
+
+MODEL = FSM(transitions={
+    "START": {("NEW_REQUESTED", "NEW_ORDER"): 10},
+    "NEW_REQUESTED": {("ACKED_NEW", "ACK_NEW"): 8, ("REJECTED", "REJECT"): 2},
+    "ACKED_NEW": {("FILLED", "FILL"): 8},
+})
+
+
+class TestConformanceChecker:
+    """Test streaming conformance checks."""
+    
+    def test_conforming_lifecycle(self):
+        """Test that allowed transitions pass."""
+        checker = ConformanceChecker(MODEL, "START")
+        
+        assert checker.check_names("O1", "NEW_REQUESTED", "NEW_ORDER") is None
+        assert checker.check_names("O1", "ACKED_NEW", "ACK_NEW") is None
+        assert checker.check_names("O1", "FILLED", "FILL") is None
+        assert (checker.events, checker.violations) == (3, 0)
+    
+    def test_violation(self):
+        """Test that a transition missing from the model is reported."""
+        checker = ConformanceChecker(MODEL, "START")
+        checker.check_names("O1", "NEW_REQUESTED", "NEW_ORDER")
+        
+        edge = checker.check_names("O1", "FILLED", "FILL")
+        
+        assert checker.describe(edge) == ("NEW_REQUESTED", "FILLED", "FILL")
+        assert checker.violations == 1
+    
+    def test_continues_from_observed_state(self):
+        """Test that checking resumes from the state actually reached."""
+        checker = ConformanceChecker(MODEL, "START")
+        checker.check_names("O1", "ACKED_NEW", "ACK_NEW")
+        
+        assert checker.check_names("O1", "FILLED", "FILL") is None
+        assert checker.violations == 1
+    
+    def test_trigger_must_match(self):
+        """Test that the same states reached by another rule are flagged."""
+        checker = ConformanceChecker(MODEL, "START")
+        
+        assert checker.check_names("O1", "NEW_REQUESTED", "RESEND") is not None
+    
+    def test_terminal_states_forgotten(self):
+        """Test that entities reaching a terminal state are dropped."""
+        checker = ConformanceChecker(MODEL, "START", terminal_states=["REJECTED", "FILLED"])
+        checker.check_names("O1", "NEW_REQUESTED", "NEW_ORDER")
+        checker.check_names("O2", "NEW_REQUESTED", "NEW_ORDER")
+        checker.check_names("O1", "REJECTED", "REJECT")
+        
+        assert list(checker.current) == ["O2"]
+    
+    def test_ttl_restarts_idle_entities(self):
+        """Test that an entity idle for the TTL is checked from the start state again."""
+        checker = ConformanceChecker(MODEL, "START", ttl=10)
+        checker.check_names("O1", "NEW_REQUESTED", "NEW_ORDER", "2023-10-26T12:00:00.0")
+        
+        assert checker.check_names("O1", "NEW_REQUESTED", "NEW_ORDER", "2023-10-26T12:01:40.0") is None
+        assert checker.check_names("O1", "NEW_REQUESTED", "NEW_ORDER", "2023-10-26T12:01:45.0") is not None
+        assert checker.violations == 1
+    
+    def test_aliases_resolved(self):
+        """Test that an alias continues its entity's lifecycle."""
+        checker = ConformanceChecker(MODEL, "START", correlator=EntityCorrelator())
+        checker.check_names("O1", "NEW_REQUESTED", "NEW_ORDER")
+        
+        assert checker.check_names("O2", "ACKED_NEW", "ACK_NEW", aliases=("O1",)) is None
+        assert checker.check_names("O2", "FILLED", "FILL") is None
+        assert list(checker.current) == ["O1"]
+    
+    def test_shared_symbols(self):
+        """Test checking ids from an existing symbol table."""
+        symbols = SymbolTable(["START", "NEW_REQUESTED", "NEW_ORDER"])
+        checker = ConformanceChecker(MODEL, "START", symbols=symbols)
+        
+        assert checker.check("O1", symbols.id_of("NEW_REQUESTED"), symbols.id_of("NEW_ORDER")) is None
+        assert "FILLED" in symbols
+
+
+class TestLoadModel:
+    """Test loading reference FSMs."""
+    
+    def test_json_and_npz(self):
+        """Test that both JSON and NPZ models load."""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f:
+            f.write(fsm_to_json(MODEL))
+            json_path = f.name
+        with tempfile.NamedTemporaryFile(suffix='.npz', delete=False) as f:
+            write_npz(MODEL, f)
+            npz_path = f.name
+        
+        try:
+            assert load_model(json_path).transitions == MODEL.transitions
+            assert load_model(npz_path).transitions == MODEL.transitions
+        finally:
+            os.unlink(json_path)
+            os.unlink(npz_path)
@@ -0,0 +1,97 @@
+import pytest
+import random
+from logfsm.fsm_builder import build_fsm
+from logfsm.correlate import UnionFind, EntityCorrelator, correlate_events
+from tests.conftest import make_event
+
+
+def event(ts, entity_id, state, rule, aliases=()):
+    return make_event(entity_id, f"2023-10-26T12:00:{ts:02d}.000", rule, state, aliases=aliases)
+
+
+class TestUnionFind:
+    """Test disjoint sets over entity ids."""
+    
+    def test_union_and_find(self):
+        """Test that linked keys resolve to the first-seen key."""
+        uf = UnionFind()
+        uf.union("B", "C")
+        uf.union("A", "D")
+        uf.union("D", "C")
+        
+        assert {uf.find(k) for k in "ABCD"} == {"B"}
+        assert uf.find("Z") == "Z" and "Z" not in uf
+        assert len(uf) == 4 and uf.sets == 1
+        assert uf.groups() == {"B": ["B", "C", "A", "D"]}
+    
+    def test_repeated_union(self):
+        """Test that unioning linked keys again changes nothing."""
+        uf = UnionFind()
+        uf.union("A", "B")
+        uf.union("B", "A")
+        uf.union("C", "D")
+        
+        assert uf.sets == 2
+        assert uf.groups() == {"A": ["A", "B"], "C": ["C", "D"]}
+    
+    def test_long_chains(self):
+        """Test a long alias chain linked in random order."""
+        keys = [f"ID{i}" for i in range(5000)]
+        links = list(zip(keys, keys[1:]))
+        random.Random(1).shuffle(links)
+        uf = UnionFind()
+        for key in keys:
+            uf.union(key, key)
+        for a, b in links:
+            uf.union(a, b)
+        
+        assert uf.sets == 1
+        assert {uf.find(k) for k in keys} == {"ID0"}
+
+
+class TestCorrelateEvents:
+    """Test attributing aliased events to one entity."""
+    
+    def test_cancel_replace_lifecycle(self):
+        """Test that a cancel/replace chain builds one lifecycle."""
+        events = [
+            event(1, "A1", "NEW", "NEW_ORDER"),
+            event(2, "A1", "ACKED", "ACK"),
+            event(3, "B2", "REPLACE_REQUESTED", "REPLACE", aliases=("A1",)),
+            event(4, "B2", "REPLACED", "ACK_REPLACE"),
+            event(5, "C3", "CANCEL_REQUESTED", "CANCEL", aliases=("B2",)),
+            event(6, "C3", "CANCELED", "ACK_CANCEL"),
+            event(7, "X9", "NEW", "NEW_ORDER"),
+        ]
+        
+        correlated = correlate_events(events)
+        fsm = build_fsm(correlated, "START")
+        
+        assert [ev.entity_id for ev in correlated] == ["A1"] * 6 + ["X9"]
+        assert fsm.transitions["START"][("NEW", "NEW_ORDER")] == 2
+        assert fsm.transitions["ACKED"] == {("REPLACE_REQUESTED", "REPLACE"): 1}
+        assert fsm.transitions["REPLACED"] == {("CANCEL_REQUESTED", "CANCEL"): 1}
+        assert ("REPLACE_REQUESTED", "REPLACE") not in fsm.transitions["START"]
+    
+    def test_link_after_events(self):
+        """Test that a link seen late still merges earlier events."""
+        events = [
+            event(1, "B2", "REPLACED", "ACK_REPLACE"),
+            event(2, "A1", "NEW", "NEW_ORDER"),
+            event(3, "A1", "REPLACE_REQUESTED", "REPLACE", aliases=("B2",)),
+        ]
+        correlator = EntityCorrelator()
+        
+        correlated = correlate_events(events, correlator)
+        
+        assert {ev.entity_id for ev in correlated} == {"B2"}
+        assert correlator.resolve("A1") == "B2"
+        assert correlator.aliases.groups() == {"B2": ["B2", "A1"]}
+    
+    def test_empty_and_self_aliases(self):
+        """Test that empty aliases and self links are ignored."""
+        correlator = EntityCorrelator()
+        correlator.observe("A1", ("", "A1", None))
+        
+        assert len(correlator.aliases) == 1 and correlator.aliases.sets == 1
+        assert correlator.resolve("A1") == "A1"
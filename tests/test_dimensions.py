@@ -0,0 +1,99 @@
+import pytest
+import json
+from logfsm.fsm_builder import build_fsm
+from logfsm.dimensions import DimensionBreakdown, dimensions_to_dict, dimensions_to_json, OTHER, UNSET
+from tests.conftest import make_event
+
+
+def event(ts, entity_id, state, rule, venue=None, symbol=None):
+    return make_event(entity_id, f"2023-10-26T12:00:{ts:02d}.000", rule, state,
+                      dimensions=(venue, symbol) if venue or symbol else ())
+
+
+def lifecycle(t, entity_id, venue=None, symbol=None, filled=True):
+    events = [event(t, entity_id, "NEW", "NEW_ORDER", venue, symbol), event(t + 1, entity_id, "ACKED", "ACK")]
+    if filled:
+        events.append(event(t + 2, entity_id, "FILLED", "FILL"))
+    return events
+
+
+class TestDimensionBreakdown:
+    """Test per-dimension FSMs filled by build_fsm."""
+    
+    def test_counts_per_value(self):
+        """Test that each value's FSM holds its entities' full lifecycles."""
+        events = (lifecycle(0, "A", "XNYS", "IBM") + lifecycle(3, "B", "XNAS", "IBM")
+                  + lifecycle(6, "C", "XNYS", "MSFT", filled=False))
+        breakdown = DimensionBreakdown(["venue", "symbol"])
+        
+        fsm = build_fsm(events, "START", dimensions=breakdown)
+        
+        nyse = breakdown.fsms["venue"]["XNYS"]
+        assert nyse.transitions["START"][("NEW", "NEW_ORDER")] == 2
+        assert nyse.transitions["ACKED"] == {("FILLED", "FILL"): 1}
+        assert breakdown.fsms["symbol"]["IBM"].transitions["ACKED"] == {("FILLED", "FILL"): 2}
+        assert dict(breakdown.entities["venue"]) == {"XNYS": 2, "XNAS": 1}
+        
+        for name in ("venue", "symbol"):
+            total = sum(f.transitions["START"][("NEW", "NEW_ORDER")] for f in breakdown.fsms[name].values())
+            assert total == fsm.transitions["START"][("NEW", "NEW_ORDER")]
+    
+    def test_limit_and_unset(self):
+        """Test that values past the limit go to OTHER and missing ones to UNSET."""
+        events = []
+        for i, venue in enumerate(["V1", "V2", "V3", "V1", None]):
+            events += lifecycle(i * 3, f"E{i}", venue, "IBM")
+        breakdown = DimensionBreakdown(["venue", "symbol"], limit=1)
+        
+        build_fsm(events, "START", dimensions=breakdown)
+        
+        assert set(breakdown.fsms["venue"]) == {"V1", OTHER, UNSET}
+        assert dict(breakdown.entities["venue"]) == {"V1": 2, OTHER: 2, UNSET: 1}
+        assert breakdown.fsms["venue"][OTHER].transitions["START"][("NEW", "NEW_ORDER")] == 2
+    
+    def test_value_from_later_event(self):
+        """Test that the first captured value is used even when not on the first event."""
+        events = [
+            event(0, "A", "NEW", "NEW_ORDER"),
+            event(1, "A", "ACKED", "ACK", venue="XNYS"),
+            event(2, "A", "FILLED", "FILL", venue="XNAS"),
+        ]
+        breakdown = DimensionBreakdown(["venue", "symbol"])
+        
+        build_fsm(events, "START", dimensions=breakdown)
+        
+        assert list(breakdown.fsms["venue"]) == ["XNYS"]
+        assert list(breakdown.fsms["symbol"]) == [UNSET]
+    
+    def test_latency(self):
+        """Test that per-value FSMs get latency sketches when latency is tracked."""
+        breakdown = DimensionBreakdown(["venue", "symbol"])
+        
+        build_fsm(lifecycle(0, "A", "XNYS"), "START", latency=True, dimensions=breakdown)
+        
+        sketch = breakdown.fsms["venue"]["XNYS"].latencies["NEW"][("ACKED", "ACK")]
+        assert sketch.count == 1
+    
+    def test_invalid_limit(self):
+        """Test that a negative limit is rejected."""
+        with pytest.raises(ValueError):
+            DimensionBreakdown(["venue"], limit=-1)
+
+
+class TestDimensionsOutput:
+    """Test serializing per-dimension FSMs."""
+    
+    def test_to_dict(self):
+        """Test that values are listed by entity count with their edges."""
+        events = lifecycle(0, "A", "XNAS") + lifecycle(3, "B", "XNYS") + lifecycle(6, "C", "XNYS")
+        breakdown = DimensionBreakdown(["venue", "symbol"], limit=5)
+        build_fsm(events, "START", dimensions=breakdown)
+        
+        data = dimensions_to_dict(breakdown)
+        
+        assert data["limit"] == 5
+        assert list(data["dimensions"]["venue"]) == ["XNYS", "XNAS"]
+        assert data["dimensions"]["venue"]["XNYS"]["entities"] == 2
+        assert {"from": "ACKED", "to": "FILLED", "trigger": "FILL", "count": 2} in data["dimensions"]["venue"]["XNYS"]["transitions"]
+        assert data["dimensions"]["symbol"][UNSET]["entities"] == 3
+        assert json.loads(dimensions_to_json(breakdown)) == data
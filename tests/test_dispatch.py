@@ -0,0 +1,126 @@
+import pytest
+import random
+from logfsm import dispatch
+from logfsm.dispatch import required_literal, RuleDispatcher
+from logfsm.config import Config
+from logfsm.rule_engine import compile_rules, classify_line, first_match
+
+
+class TestRequiredLiteral:
+    """Test leading-literal extraction from rule regexes."""
+    
+    def test_case_insensitive_prefix(self):
+        """Test a typical (?i) rule."""
+        assert required_literal(r"(?i)executionreport.*exectype=0") == ("executionreport", True)
+    
+    def test_case_sensitive_prefix(self):
+        """Test a rule without flags keeps its case."""
+        assert required_literal(r"NewOrderSingle ClOrdID=(?P<id>\w+)") == ("NewOrderSingle ClOrdID=", False)
+    
+    def test_escapes_and_anchor(self):
+        """Test escaped punctuation and a leading anchor."""
+        assert required_literal(r"^order\.new\[") == ("order.new[", False)
+    
+    def test_quantified_last_char_dropped(self):
+        """Test that a quantified character is not part of the literal."""
+        assert required_literal(r"orders?x") == ("order", False)
+        assert required_literal(r"abcd{2}") == ("abc", False)
+    
+    def test_no_usable_literal(self):
+        """Test patterns whose prefix cannot be relied on."""
+        assert required_literal(r".*order") is None
+        assert required_literal(r"ab\d+") is None
+        assert required_literal(r"order|cancel") is None
+        assert required_literal(r"(?x)order  new") is None
+        assert required_literal(r"\border") is None
+
+
+class TestRuleDispatcher:
+    """Test routing lines to candidate rules."""
+    
+    def setup_method(self):
+        self.cfg = Config({
+            "signal_rules": [
+                {"name": "NEW_ORDER", "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)", "state": "NEW_REQUESTED"},
+                {"name": "ACK_NEW", "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>[A-Z0-9]+)", "state": "ACKED_NEW"},
+                {"name": "ANY_ID", "regex": r".*clordid=(?P<order_id>[A-Z0-9]+)", "state": "SEEN"},
+                {"name": "FILLED", "regex": r"(?i)executionreport.*exectype=f.*clordid=(?P<order_id>[A-Z0-9]+)", "state": "FILLED"},
+                {"name": "REJECT", "fix": {"MsgType": "8", "ExecType": "8"}, "capture": {"order_id": "ClOrdID"}, "state": "REJECTED"},
+                {"name": "HB", "fix": {"MsgType": "0"}, "state": "ALIVE"},
+            ]
+        })
+        self.compiled = compile_rules(self.cfg)
+    
+    def names(self, rules):
+        return [r.name for r in rules]
+    
+    def test_shared_literal_checked_once(self):
+        """Test that rules sharing a prefix share one literal check."""
+        assert self.compiled.dispatcher.literals == ["newordersingle", "executionreport"]
+    
+    def test_routes_to_candidates_in_config_order(self):
+        """Test that only rules whose key is present are candidates."""
+        candidates, _ = self.compiled.dispatcher.route("ExecutionReport ExecType=F ClOrdID=ABC")
+        assert self.names(candidates) == ["ACK_NEW", "ANY_ID", "FILLED", "REJECT"]
+        
+        candidates, fields = self.compiled.dispatcher.route("35=0|")
+        assert self.names(candidates) == ["ANY_ID", "HB"]
+        assert fields == {"35": "0"}
+    
+    def test_routes_are_memoized(self):
+        """Test that lines with the same signature reuse the candidate tuple."""
+        d = self.compiled.dispatcher
+        a, _ = d.route("NewOrderSingle ClOrdID=A")
+        b, _ = d.route("NEWORDERSINGLE clordid=B")
+        assert a is b
+    
+    def test_dispatcher_over_rule_subset(self):
+        """Test a dispatcher built directly over some of the compiled rules."""
+        d = RuleDispatcher(self.compiled[3:])
+        
+        assert d.size == 3
+        assert d.literals == ["executionreport"]
+        candidates, fields = d.route("35=8|150=8|11=ABC")
+        assert self.names(candidates) == ["REJECT"]
+        assert fields["11"] == "ABC"
+    
+    def test_route_memo_bounded(self, monkeypatch):
+        """Test that the route memo is cleared once it holds MAX_ROUTES signatures."""
+        monkeypatch.setattr(dispatch, "MAX_ROUTES", 2)
+        d = RuleDispatcher(self.compiled)
+        
+        a, _ = d.route("NewOrderSingle")
+        d.route("ExecutionReport")
+        assert len(d._routes) == 2
+        d.route("35=0|")
+        
+        assert len(d._routes) == 1
+        b, _ = d.route("NewOrderSingle")
+        assert a is not b and a == b
+    
+    def test_non_ascii_line_keeps_case_insensitive_rules(self):
+        """Test that non-ASCII lines do not lose case-insensitive candidates."""
+        cfg = Config({"signal_rules": [{"name": "I", "regex": r"(?i)ping", "state": "P"}]})
+        compiled = compile_rules(cfg)
+        rule, m = first_match("PıNG", compiled)
+        assert rule is not None and rule.name == "I"
+    
+    def test_same_results_as_linear_scan(self):
+        """Test that dispatch never changes which rule matches."""
+        rng = random.Random(7)
+        words = ["NewOrderSingle", "ExecutionReport", "ExecType=0", "ExecType=F", "ExecType=8",
+                 "ClOrdID=ABC123", "35=8", "150=8", "11=XYZ", "35=0", "noise"]
+        linear = list(self.compiled)
+        for _ in range(500):
+            line = rng.choice([" ", "|"]).join(rng.sample(words, rng.randrange(1, 6)))
+            routed = classify_line(line, self.compiled, self.cfg)
+            expected = classify_line(line, linear, self.cfg)
+            assert (routed.rule_name, routed.entity_id) == (expected.rule_name, expected.entity_id)
+    
+    def test_stale_dispatcher_ignored(self):
+        """Test that rules appended after compile_rules are still evaluated."""
+        extra = compile_rules(Config({"signal_rules": [{"name": "EXTRA", "regex": "zzz", "state": "Z"}]}))[0]
+        self.compiled.append(extra)
+        assert self.compiled.dispatcher.size == len(self.compiled) - 1
+        rule, _ = first_match("zzz", self.compiled)
+        assert rule.name == "EXTRA"
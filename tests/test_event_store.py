@@ -0,0 +1,101 @@
+import pytest
+import tempfile
+import os
+from logfsm.event_store import EventStore, EventStoreWriter, write_event_store
+from logfsm.normalizer import timestamp_to_ns, MISSING_TS
+from tests.conftest import make_event
+
+
+class TestEventStore:
+    """Test writing and reading the columnar event store."""
+
+    def setup_method(self):
+        with tempfile.NamedTemporaryFile(suffix='.lfe', delete=False) as f:
+            self.path = f.name
+
+    def teardown_method(self):
+        os.unlink(self.path)
+
+    def test_round_trip(self):
+        """Test that records read back match the events written."""
+        events = [
+            make_event("ORDER1", "2023-10-26T12:34:56.789", "NEW_ORDER", "NEW_REQUESTED"),
+            make_event("ORDER2", "2023-10-26T12:35:00.123", "NEW_ORDER", "NEW_REQUESTED"),
+            make_event("ORDER1", "2023-10-26T12:35:30.456", "ACK_NEW", "ACKED_NEW"),
+        ]
+
+        count = write_event_store(self.path, events, "START")
+        assert count == 3
+
+        with EventStore(self.path) as store:
+            assert len(store) == 3
+            assert store.start_state == "START"
+            records = list(store.iter_records())
+
+        assert records == [
+            ("ORDER1", timestamp_to_ns("2023-10-26T12:34:56.789"), "NEW_REQUESTED", "NEW_ORDER"),
+            ("ORDER2", timestamp_to_ns("2023-10-26T12:35:00.123"), "NEW_REQUESTED", "NEW_ORDER"),
+            ("ORDER1", timestamp_to_ns("2023-10-26T12:35:30.456"), "ACKED_NEW", "ACK_NEW"),
+        ]
+
+    def test_dictionary_encoding(self):
+        """Test that repeated strings are stored once in the dictionaries."""
+        events = [
+            make_event(f"ORDER{i % 3}", "2023-10-26T12:34:56.789", "NEW_ORDER", "NEW_REQUESTED")
+            for i in range(30)
+        ]
+        write_event_store(self.path, events, "START")
+
+        with EventStore(self.path) as store:
+            assert store.entities == ["ORDER0", "ORDER1", "ORDER2"]
+            assert store.states == ["NEW_REQUESTED"]
+            assert store.rules == ["NEW_ORDER"]
+
+    def test_skips_events_without_entity_or_state(self):
+        """Test that events build_fsm would ignore are not stored."""
+        events = [
+            make_event(None, "2023-10-26T12:34:56.789", "NEW_ORDER", "NEW_REQUESTED"),
+            make_event("ORDER1", "2023-10-26T12:34:56.789", "NEW_ORDER", None),
+            make_event("ORDER1", "2023-10-26T12:34:56.789", "NEW_ORDER", "NEW_REQUESTED"),
+        ]
+
+        assert write_event_store(self.path, events, "START") == 1
+
+    def test_missing_rule_and_timestamp(self):
+        """Test events without rule name or timestamp."""
+        events = [make_event("ORDER1", "", None, "NEW_REQUESTED")]
+        write_event_store(self.path, events, "START")
+
+        with EventStore(self.path) as store:
+            assert list(store.iter_records()) == [("ORDER1", MISSING_TS, "NEW_REQUESTED", None)]
+
+    def test_multiple_blocks(self):
+        """Test that events spanning several blocks are all read back in order."""
+        events = [
+            make_event(f"ORDER{i}", f"2023-10-26T12:34:{i:02d}.0", "NEW_ORDER", "NEW_REQUESTED")
+            for i in range(7)
+        ]
+
+        with EventStoreWriter(self.path, "START", block_size=3) as w:
+            for ev in events:
+                w.add(ev)
+
+        with EventStore(self.path) as store:
+            assert [n for _, n in store.blocks] == [3, 3, 1]
+            assert [r[0] for r in store.iter_records()] == [f"ORDER{i}" for i in range(7)]
+
+    def test_empty_store(self):
+        """Test writing and reading a store with no events."""
+        write_event_store(self.path, [], "START")
+
+        with EventStore(self.path) as store:
+            assert len(store) == 0
+            assert list(store.iter_records()) == []
+
+    def test_invalid_file(self):
+        """Test that opening a non-store file raises ValueError."""
+        with open(self.path, 'wb') as f:
+            f.write(b"not an event store at all")
+
+        with pytest.raises(ValueError):
+            EventStore(self.path)
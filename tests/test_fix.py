@@ -0,0 +1,135 @@
+import pytest
+import os
+from logfsm.fix import parse_fix, resolve_tag, FixRule, SOH
+from logfsm.config import Config
+from logfsm.rule_engine import compile_rules, classify_line, classify_line_ids
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+class TestParseFix:
+    """Test the parse_fix tokenizer."""
+    
+    def test_soh_delimited(self):
+        """Test a raw SOH-delimited FIX message."""
+        msg = SOH.join(["8=FIX.4.4", "35=8", "150=F", "151=0", "11=ABC123", "58=two words", ""])
+        fields = parse_fix(msg)
+        
+        assert fields == {"8": "FIX.4.4", "35": "8", "150": "F", "151": "0", "11": "ABC123", "58": "two words"}
+    
+    def test_pipe_delimited_with_log_prefix(self):
+        """Test a '|' delimited message after a log prefix."""
+        fields = parse_fix("2023-10-26T12:34:56.789 INFO 8=FIX.4.4|35=D|11=ABC123|")
+        
+        assert fields["8"] == "FIX.4.4"
+        assert fields["35"] == "D"
+        assert fields["11"] == "ABC123"
+    
+    def test_named_tags_and_message_type(self):
+        """Test whitespace-separated named fields with a bare message type."""
+        fields = parse_fix("2023-10-26T12:34:56.789 INFO ExecutionReport ExecType=0 OrdStatus=0 ClOrdID=ABC123")
+        
+        assert fields == {"35": "8", "150": "0", "39": "0", "11": "ABC123"}
+    
+    def test_first_occurrence_wins(self):
+        """Test that repeated tags keep their first value."""
+        assert parse_fix("35=8|11=FIRST|11=SECOND")["11"] == "FIRST"
+    
+    def test_unknown_names_kept(self):
+        """Test that unknown field names are kept as-is."""
+        assert parse_fix("Venue=XNYS|11=A")["Venue"] == "XNYS"
+
+
+class TestResolveTag:
+    """Test the resolve_tag function."""
+    
+    def test_names_and_numbers(self):
+        """Test resolving tag names case-insensitively and numbers as-is."""
+        assert resolve_tag("ClOrdID") == "11"
+        assert resolve_tag("leavesqty") == "151"
+        assert resolve_tag("150") == "150"
+        assert resolve_tag(35) == "35"
+    
+    def test_unknown_name(self):
+        """Test that an unknown tag name raises ValueError."""
+        with pytest.raises(ValueError):
+            resolve_tag("NotATag")
+
+
+class TestFixRule:
+    """Test the FixRule class."""
+    
+    def test_match_and_capture(self):
+        """Test field predicates and captured groups."""
+        rule = FixRule(
+            name="FILLED",
+            fields={"MsgType": "ExecutionReport", "ExecType": "F", "LeavesQty": 0},
+            state="FILLED",
+            capture={"order_id": "ClOrdID"}
+        )
+        
+        m = rule.match("8=FIX.4.4|35=8|150=F|151=0|11=ABC123|")
+        assert m.groupdict() == {"order_id": "ABC123"}
+        assert m.group("order_id") == "ABC123"
+        assert rule.match("8=FIX.4.4|35=8|150=F|151=10|11=ABC123|") is None
+        assert rule.groupindex == {"order_id": 1}
+    
+    def test_match_without_captures_is_truthy(self):
+        """Test that a match with no captured groups still counts as a match."""
+        rule = FixRule(name="HB", fields={"MsgType": "0"}, state="ALIVE")
+        
+        assert rule.match("35=0|")
+        assert rule.match("35=8|") is None
+
+
+class TestFixClassification:
+    """Test classifying lines with FIX field rules."""
+    
+    def setup_method(self):
+        self.cfg = Config.load(os.path.join(EXAMPLES, "rules.fix.example.yaml"))
+        self.compiled = compile_rules(self.cfg)
+    
+    def test_classify_line(self):
+        """Test that field rules classify like regex rules."""
+        ev = classify_line("2023-10-26T12:34:56.789 INFO 35=8|150=F|151=0|11=ABC123|", self.compiled, self.cfg)
+        
+        assert ev.rule_name == "FILLED"
+        assert ev.state == "FILLED"
+        assert ev.entity_id == "ABC123"
+        assert ev.timestamp == "2023-10-26T12:34:56.789"
+    
+    def test_config_order_preserved(self):
+        """Test that the first matching rule wins."""
+        rec = classify_line_ids("35=8|150=F|151=25|11=ABC123|", self.compiled)
+        
+        assert self.compiled.symbols.lookup(rec[3]) == "PARTIAL_FILL"
+    
+    def test_mixed_with_regex_rules(self):
+        """Test a config mixing regex and FIX field rules."""
+        cfg = Config({
+            "signal_rules": [
+                {"name": "NEW_ORDER", "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)", "state": "NEW_REQUESTED"},
+                {"name": "REJECT", "fix": {"MsgType": "8", "ExecType": "8"}, "capture": {"order_id": "ClOrdID"}, "state": "REJECTED"},
+            ]
+        })
+        compiled = compile_rules(cfg)
+        
+        assert classify_line("NewOrderSingle ClOrdID=ABC123", compiled, cfg).rule_name == "NEW_ORDER"
+        assert classify_line("35=8|150=8|11=ABC123", compiled, cfg).rule_name == "REJECT"
+        assert classify_line("35=8|150=0|11=ABC123", compiled, cfg).rule_name is None
+    
+    def test_matches_regex_rules_on_example_lines(self):
+        """Test that the FIX example config agrees with the regex example."""
+        regex_cfg = Config.load(os.path.join(EXAMPLES, "rules.example.yaml"))
+        regex_rules = compile_rules(regex_cfg)
+        lines = [
+            "2023-10-26T12:34:56.789 INFO NewOrderSingle|ClOrdID=ABC123",
+            "2023-10-26T12:34:57.789 INFO ExecutionReport|ExecType=0|OrdStatus=0|ClOrdID=ABC123",
+            "2023-10-26T12:34:58.789 INFO ExecutionReport|ExecType=8|OrdStatus=8|ClOrdID=DEF456",
+            "2023-10-26T12:34:59.789 INFO Heartbeat",
+        ]
+        
+        for line in lines:
+            expected = classify_line(line, regex_rules, regex_cfg)
+            actual = classify_line(line, self.compiled, self.cfg)
+            assert (actual.rule_name, actual.entity_id) == (expected.rule_name, expected.entity_id)
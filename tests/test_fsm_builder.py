@@ -1,6 +1,14 @@
 import pytest
-from logfsm.fsm_builder import build_fsm, fsm_to_dot
+import tempfile
+import os
+import json
+import random
+from array import array
+from logfsm.fsm_builder import build_fsm, build_fsm_ids, decode_fsm, build_fsm_from_store, fsm_to_dot, fsm_to_dict, fsm_to_json, fsm_from_dict
+from logfsm.fsm_builder import count_code_transitions, fold_code_transitions
+from logfsm.event_store import EventStore, write_event_store
 from logfsm.models import ClassifiedEvent, FSM
+from logfsm.symbols import SymbolTable
 
 
 class TestBuildFSM:
@@ -321,6 +329,176 @@ class TestBuildFSM:
         assert fsm.transitions == expected_transitions
 
 
+class TestBuildFSMLatency:
+    """Test per-edge latency tracking in build_fsm."""
+    
+    def setup_method(self):
+        self.events = [
+            ClassifiedEvent("l1", "n1", "2023-10-26T12:00:00.000", "ORDER1", "NEW_ORDER", "NEW_REQUESTED"),
+            ClassifiedEvent("l2", "n2", "2023-10-26T12:00:00.100", "ORDER1", "ACK_NEW", "ACKED_NEW"),
+            ClassifiedEvent("l3", "n3", "2023-10-26T12:00:01.000", "ORDER2", "NEW_ORDER", "NEW_REQUESTED"),
+            ClassifiedEvent("l4", "n4", "2023-10-26T12:00:01.300", "ORDER2", "ACK_NEW", "ACKED_NEW"),
+            ClassifiedEvent("l5", "n5", "", "ORDER3", "NEW_ORDER", "NEW_REQUESTED"),
+            ClassifiedEvent("l6", "n6", "2023-10-26T12:00:02.000", "ORDER3", "ACK_NEW", "ACKED_NEW"),
+        ]
+    
+    def test_latency_disabled_by_default(self):
+        """Test that no latencies are tracked unless requested."""
+        fsm = build_fsm(self.events, "START")
+        assert fsm.latencies == {}
+    
+    def test_latency_per_edge(self):
+        """Test latency between consecutive events of the same entity."""
+        fsm = build_fsm(self.events, "START", latency=True)
+        
+        sketch = fsm.latencies["NEW_REQUESTED"][("ACKED_NEW", "ACK_NEW")]
+        # ORDER3 has no timestamp on its first event, so only two samples
+        assert sketch.count == 2
+        assert sketch.min == pytest.approx(0.1)
+        assert sketch.max == pytest.approx(0.3)
+        assert ("NEW_REQUESTED", "NEW_ORDER") not in fsm.latencies.get("START", {})
+        assert fsm.transitions == build_fsm(self.events, "START").transitions
+    
+    def test_latency_in_dot_label(self):
+        """Test that DOT labels include latency quantiles."""
+        dot = fsm_to_dot(build_fsm(self.events[:2], "START", latency=True))
+        
+        assert '"NEW_REQUESTED" -> "ACKED_NEW" [label="ACK_NEW\\n(1)\\np50=100ms p99=100ms"];' in dot
+        assert '"START" -> "NEW_REQUESTED" [label="NEW_ORDER\\n(1)"];' in dot
+
+
+class TestFSMJson:
+    """Test JSON conversion of FSMs."""
+    
+    def test_fsm_to_dict(self):
+        """Test the edge-list dictionary form."""
+        fsm = FSM(transitions={"START": {("NEW_REQUESTED", "NEW_ORDER"): 2}})
+        
+        assert fsm_to_dict(fsm) == {
+            "transitions": [
+                {"from": "START", "to": "NEW_REQUESTED", "trigger": "NEW_ORDER", "count": 2}
+            ]
+        }
+    
+    def test_fsm_to_json_with_latency(self):
+        """Test that JSON output carries latency summaries."""
+        events = [
+            ClassifiedEvent("l1", "n1", "2023-10-26T12:00:00.000", "ORDER1", "NEW_ORDER", "NEW_REQUESTED"),
+            ClassifiedEvent("l2", "n2", "2023-10-26T12:00:00.250", "ORDER1", "ACK_NEW", "ACKED_NEW"),
+        ]
+        data = json.loads(fsm_to_json(build_fsm(events, "START", latency=True)))
+        
+        ack = [e for e in data["transitions"] if e["trigger"] == "ACK_NEW"][0]
+        assert ack["latency"]["count"] == 1
+        assert ack["latency"]["p50"] == pytest.approx(0.25)
+        assert "latency" not in data["transitions"][0]
+    
+    def test_fsm_from_dict_round_trip(self):
+        """Test that counts survive a JSON round trip."""
+        transitions = {
+            "START": {("NEW_REQUESTED", "NEW_ORDER"): 2, ("REJECTED", "REJECT"): 1},
+            "NEW_REQUESTED": {("ACKED_NEW", "ACK_NEW"): 2},
+        }
+        fsm = fsm_from_dict(json.loads(fsm_to_json(FSM(transitions=transitions))))
+        
+        assert fsm.transitions == transitions
+
+
+class TestBuildFSMIds:
+    """Test FSM building on symbol ids."""
+    
+    def setup_method(self):
+        self.symbols = SymbolTable(["START", "NEW_REQUESTED", "NEW_ORDER", "ACKED_NEW", "ACK_NEW"])
+        s = self.symbols.id_of
+        self.records = [
+            ("ORDER1", "2023-10-26T12:35:00.123", s("ACKED_NEW"), s("ACK_NEW")),
+            ("ORDER1", "2023-10-26T12:34:56.789", s("NEW_REQUESTED"), s("NEW_ORDER")),
+            ("ORDER2", "2023-10-26T12:36:00.789", s("NEW_REQUESTED"), s("NEW_ORDER")),
+        ]
+    
+    def test_counts_keyed_by_ids(self):
+        """Test that transitions stay keyed by symbol ids."""
+        fsm = build_fsm_ids(self.records, self.symbols.id_of("START"), self.symbols)
+        s = self.symbols.id_of
+        
+        assert fsm.symbols is self.symbols
+        assert fsm.transitions == {
+            s("START"): {(s("NEW_REQUESTED"), s("NEW_ORDER")): 2},
+            s("NEW_REQUESTED"): {(s("ACKED_NEW"), s("ACK_NEW")): 1},
+        }
+    
+    def test_decode_matches_build_fsm(self):
+        """Test that decoding gives the same FSM as the string pipeline."""
+        fsm = decode_fsm(build_fsm_ids(self.records, 0, self.symbols))
+        events = [
+            ClassifiedEvent("", "", ts, eid, self.symbols.lookup(r), self.symbols.lookup(st))
+            for eid, ts, st, r in self.records
+        ]
+        
+        assert fsm.symbols is None
+        assert fsm.transitions == build_fsm(events, "START").transitions
+    
+    def test_dot_decodes_ids(self):
+        """Test that DOT output shows names rather than ids."""
+        dot = fsm_to_dot(build_fsm_ids(self.records, 0, self.symbols))
+        
+        assert '  "START" -> "NEW_REQUESTED" [label="NEW_ORDER\\n(2)"];' in dot
+        assert '  "NEW_REQUESTED" -> "ACKED_NEW" [label="ACK_NEW\\n(1)"];' in dot
+        assert fsm_to_dict(build_fsm_ids(self.records, 0, self.symbols))["transitions"][0]["from"] == "START"
+
+    
+    def test_fold_code_transitions(self):
+        """Test that folding columns counts what grouping and sorting does, ties included."""
+        rng = random.Random(3)
+        blocks = []
+        for _ in range(3):
+            n = 500
+            blocks.append((
+                array("q", (i // 4 + rng.choice([0, 0, 0, -30]) for i in range(n))),
+                array("i", (rng.randrange(40) for _ in range(n))),
+                array("i", (rng.randrange(5) for _ in range(n))),
+                array("i", (rng.randrange(3) for _ in range(n))),
+            ))
+        
+        assert fold_code_transitions(blocks, 7) == count_code_transitions(blocks, 7)
+        assert fold_code_transitions([], 7) == {}
+
+
+class TestBuildFSMFromStore:
+    """Test the build_fsm_from_store function."""
+    
+    def setup_method(self):
+        with tempfile.NamedTemporaryFile(suffix='.lfe', delete=False) as f:
+            self.path = f.name
+        self.events = [
+            ClassifiedEvent("l1", "n1", "2023-10-26T12:35:00.123", "ORDER1", "ACK_NEW", "ACKED_NEW"),
+            ClassifiedEvent("l2", "n2", "2023-10-26T12:34:56.789", "ORDER1", "NEW_ORDER", "NEW_REQUESTED"),
+            ClassifiedEvent("l3", "n3", "2023-10-26T12:36:00.789", "ORDER2", "NEW_ORDER", "NEW_REQUESTED"),
+            ClassifiedEvent("l4", "n4", "2023-10-26T12:36:10.123", "ORDER2", "REJECT", "REJECTED"),
+            ClassifiedEvent("l5", "n5", "2023-10-26T12:36:20.000", "ORDER2", None, "REJECTED"),
+        ]
+        write_event_store(self.path, self.events, "START")
+    
+    def teardown_method(self):
+        os.unlink(self.path)
+    
+    def test_matches_build_fsm(self):
+        """Test that building from the store gives the same FSM as build_fsm."""
+        with EventStore(self.path) as store:
+            fsm = build_fsm_from_store(store)
+        
+        assert fsm.transitions == build_fsm(self.events, "START").transitions
+        assert fsm.transitions["REJECTED"] == {("REJECTED", "UNKNOWN_RULE"): 1}
+    
+    def test_start_state_override(self):
+        """Test overriding the start state recorded in the store."""
+        with EventStore(self.path) as store:
+            fsm = build_fsm_from_store(store, "INIT")
+        
+        assert "START" not in fsm.transitions
+        assert fsm.transitions["INIT"] == {("NEW_REQUESTED", "NEW_ORDER"): 2}
+
+
 class TestFSMToDot:
     """Test the fsm_to_dot function."""
     
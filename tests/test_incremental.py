@@ -0,0 +1,149 @@
+import pytest
+import os
+import random
+import tempfile
+from logfsm.config import Config
+from logfsm.rule_engine import compile_rules, classify_line
+from logfsm.incremental import (
+    ClassificationCache, classify_incremental, rule_fingerprint, config_fingerprints
+)
+
+
+RULES = [
+    {"name": "NEW_ORDER", "regex": r"(?i)newordersingle.*clordid=(?P<order_id>\w+)", "state": "NEW"},
+    {"name": "ACK", "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>\w+)", "state": "ACKED"},
+    {"name": "FILL", "regex": r"(?i)executionreport.*exectype=f.*clordid=(?P<order_id>\w+)", "state": "FILLED"},
+    {"name": "CANCEL", "fix": {"MsgType": "OrderCancelRequest"}, "capture": {"order_id": "ClOrdID"}, "state": "CANCELED"},
+]
+
+TEMPLATES = [
+    "2023-10-26T12:00:{s:02d}.000 INFO NewOrderSingle ClOrdID=ORD{n}",
+    "2023-10-26T12:00:{s:02d}.000 INFO ExecutionReport ExecType=0 ClOrdID=ORD{n}",
+    "2023-10-26T12:00:{s:02d}.000 INFO ExecutionReport ExecType=F ClOrdID=ORD{n}",
+    "2023-10-26T12:00:{s:02d}.000 INFO ExecutionReport ExecType=4 ClOrdID=ORD{n}",
+    "35=F|11=ORD{n}|41=ORD{n}",
+    "2023-10-26T12:00:{s:02d}.000 INFO heartbeat seq={n}",
+]
+
+
+def make_lines(n, seed=1):
+    rng = random.Random(seed)
+    return [rng.choice(TEMPLATES).format(s=i % 60, n=rng.randrange(50)) for i in range(n)]
+
+
+def classify(rules, lines, cache=None):
+    cfg = Config({"signal_rules": rules, "entity_id_field": "order_id"})
+    compiled = compile_rules(cfg)
+    events, new_cache, reevaluated = classify_incremental(lines, compiled, cfg, cache)
+    expected = [classify_line(ln, compiled, cfg) for ln in lines]
+    return events, new_cache, reevaluated, expected
+
+
+class TestFingerprints:
+    """Test rule fingerprints."""
+    
+    def test_only_matching_fields_count(self):
+        """Test that names and states do not change a fingerprint."""
+        renamed = dict(RULES[0], name="OTHER", state="OTHER")
+        assert rule_fingerprint(renamed) == rule_fingerprint(RULES[0])
+        assert rule_fingerprint(RULES[0]) != rule_fingerprint(RULES[1])
+        assert rule_fingerprint(RULES[0]) != rule_fingerprint(RULES[0], "regex")
+        assert rule_fingerprint(RULES[3]) != rule_fingerprint(dict(RULES[3], capture={"order_id": "OrigClOrdID"}))
+    
+    def test_config_fingerprints(self):
+        """Test one fingerprint per rule in config order."""
+        cfg = Config({"signal_rules": RULES})
+        assert config_fingerprints(cfg) == [rule_fingerprint(rule) for rule in RULES]
+
+
+class TestClassifyIncremental:
+    """Test re-classification against a cache of earlier results."""
+    
+    def setup_method(self):
+        self.lines = make_lines(600)
+        self.events, self.cache, reevaluated, _ = classify(RULES, self.lines)
+        assert reevaluated == len(self.lines)
+    
+    def test_first_run_matches_classify_line(self):
+        """Test that a run without a cache classifies every line."""
+        _, _, _, expected = classify(RULES, self.lines)
+        assert self.events == expected
+    
+    def test_unchanged_config(self):
+        """Test that no line is re-evaluated when no rule changed."""
+        renamed = [dict(RULES[0], state="NEW_REQUESTED")] + RULES[1:]
+        events, _, reevaluated, expected = classify(renamed, self.lines, self.cache)
+        
+        assert reevaluated == 0
+        assert events == expected
+        assert {ev.state for ev in events if ev.rule_name == "NEW_ORDER"} == {"NEW_REQUESTED"}
+    
+    def test_appended_rule(self):
+        """Test that an appended rule is only tried on unmatched lines."""
+        rules = RULES + [{"name": "CXL_ACK", "regex": r"(?i)exectype=4.*clordid=(?P<order_id>\w+)", "state": "CXL"}]
+        events, _, reevaluated, expected = classify(rules, self.lines, self.cache)
+        
+        assert events == expected
+        assert reevaluated == sum(1 for ev in self.events if ev.rule_name is None)
+        assert any(ev.rule_name == "CXL_ACK" for ev in events)
+    
+    def test_edited_rule(self):
+        """Test that editing a rule re-evaluates the lines it could affect."""
+        rules = [RULES[0], dict(RULES[1], regex=r"(?i)executionreport.*clordid=(?P<order_id>\w+)")] + RULES[2:]
+        events, _, reevaluated, expected = classify(rules, self.lines, self.cache)
+        
+        assert events == expected
+        assert reevaluated == sum(1 for ev in self.events if ev.rule_name != "NEW_ORDER")
+    
+    @pytest.mark.parametrize("seed", range(8))
+    def test_random_edits(self, seed):
+        """Test random removals, insertions and reorders against a full run."""
+        rng = random.Random(seed)
+        rules = list(RULES)
+        rng.shuffle(rules)
+        if rng.random() < 0.5:
+            rules.pop(rng.randrange(len(rules)))
+        rules.insert(rng.randrange(len(rules) + 1),
+                     {"name": "ANY_ORD", "regex": r"clordid=(?P<order_id>ORD1\d)\b", "state": "SEEN"})
+        cache = self.cache
+        for _ in range(2):
+            events, cache, _, expected = classify(rules, self.lines, cache)
+            assert events == expected
+            rules = rules[::-1]
+    
+    def test_other_lines_ignore_cache(self):
+        """Test that a cache built from different lines is not used."""
+        lines = make_lines(600, seed=2)
+        events, _, reevaluated, expected = classify(RULES, lines, self.cache)
+        
+        assert reevaluated == len(lines)
+        assert events == expected
+
+
+class TestClassificationCache:
+    """Test saving and loading the cache file."""
+    
+    def test_round_trip(self):
+        """Test that a saved cache loads back unchanged."""
+        lines = make_lines(50)
+        _, cache, _, _ = classify(RULES, lines)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "classify.cache")
+            assert ClassificationCache.load(path) is None
+            cache.save(path)
+            loaded = ClassificationCache.load(path)
+        
+        assert loaded.fingerprints == cache.fingerprints
+        assert loaded.positions == cache.positions
+        assert loaded.digest == cache.digest
+    
+    def test_not_a_cache(self):
+        """Test that other files are rejected."""
+        with tempfile.NamedTemporaryFile(suffix='.cache', delete=False) as f:
+            f.write(b"not a cache")
+            path = f.name
+        try:
+            with pytest.raises(ValueError, match="not a logfsm classification cache"):
+                ClassificationCache.load(path)
+        finally:
+            os.unlink(path)
@@ -0,0 +1,150 @@
+import pytest
+import random
+from logfsm.lifecycle import EntityLifecycleManager, build_fsm_streaming, split_lifecycles
+from logfsm.paths import PathTrie
+from logfsm.fsm_builder import build_fsm
+from tests.conftest import make_event
+
+
+EVENTS = [
+    make_event("ORDER1", "2023-10-26T12:00:00.0", "NEW_ORDER", "NEW_REQUESTED"),
+    make_event("ORDER2", "2023-10-26T12:00:01.0", "NEW_ORDER", "NEW_REQUESTED"),
+    make_event("ORDER1", "2023-10-26T12:00:03.0", "FILLED", "FILLED"),
+    make_event("ORDER1", "2023-10-26T12:00:02.0", "ACK_NEW", "ACKED_NEW"),
+    make_event("ORDER2", "2023-10-26T12:00:04.0", "REJECT", "REJECTED"),
+    make_event("ORDER3", "2023-10-26T12:00:05.0", "NEW_ORDER", "NEW_REQUESTED"),
+]
+
+
+class TestEntityLifecycleManager:
+    """Test the EntityLifecycleManager class."""
+    
+    def test_without_eviction_matches_build_fsm(self):
+        """Test that with no terminal states or TTL the counts equal build_fsm."""
+        fsm = build_fsm_streaming(EVENTS, "START")
+        assert fsm.transitions == build_fsm(EVENTS, "START").transitions
+    
+    def test_terminal_state_finalizes_entity(self):
+        """Test that reaching a terminal state evicts the entity."""
+        manager = EntityLifecycleManager("START", terminal_states=["FILLED", "REJECTED"])
+        for ev in EVENTS[:3]:
+            manager.add(ev)
+        
+        assert manager.in_flight == 1
+        assert manager.finalized == 1
+        assert manager.transitions["START"][("NEW_REQUESTED", "NEW_ORDER")] == 1
+        assert manager.transitions["NEW_REQUESTED"][("FILLED", "FILLED")] == 1
+    
+    def test_events_after_finalize_start_over(self):
+        """Test that an entity seen again after eviction starts from start_state."""
+        fsm = build_fsm_streaming(EVENTS, "START", terminal_states=["FILLED", "REJECTED"])
+        
+        # ORDER1's ACK arrives after its FILLED event was already finalized
+        assert fsm.transitions["START"][("ACKED_NEW", "ACK_NEW")] == 1
+        assert fsm.transitions["START"][("NEW_REQUESTED", "NEW_ORDER")] == 3
+    
+    def test_ttl_expires_idle_entities(self):
+        """Test that entities idle for the TTL are finalized."""
+        manager = EntityLifecycleManager("START", ttl=2)
+        for ev in EVENTS[:3]:
+            manager.add(ev)
+        # ORDER1 and ORDER2 were last active at 12:00:00 and 12:00:01, two
+        # seconds or more before 12:00:03, so ORDER1 starts over
+        assert manager.in_flight == 1
+        assert manager.expired == 2
+        assert manager.transitions["START"][("NEW_REQUESTED", "NEW_ORDER")] == 2
+        
+        manager.add(EVENTS[3])
+        manager.add(EVENTS[4])
+        assert manager.in_flight == 2
+        manager.add(EVENTS[5])
+        # ORDER1 was last active at 12:00:03
+        assert manager.in_flight == 2
+        assert manager.expired == 3
+        assert manager.transitions["START"][("ACKED_NEW", "ACK_NEW")] == 1
+        assert manager.transitions["ACKED_NEW"][("FILLED", "FILLED")] == 1
+    
+    def test_ttl_restarts_returning_entity(self):
+        """Test that an entity idle past the TTL starts over with no other traffic in between."""
+        events = [
+            make_event("A", "2023-10-26T12:00:00.0", "NEW_ORDER", "NEW_REQUESTED"),
+            make_event("A", "2023-10-26T12:01:40.0", "FILLED", "FILLED"),
+        ]
+        fsm = build_fsm_streaming(events, "START", ttl=10)
+        
+        assert fsm.transitions["START"] == {("NEW_REQUESTED", "NEW_ORDER"): 1, ("FILLED", "FILLED"): 1}
+        assert "NEW_REQUESTED" not in fsm.transitions
+    
+    def test_expire_with_explicit_clock(self):
+        """Test expiring against an explicit time."""
+        manager = EntityLifecycleManager("START", ttl=60)
+        for ev in EVENTS:
+            manager.add(ev)
+        assert manager.in_flight == 3
+        
+        manager.expire(manager.now + 61 * 1_000_000_000)
+        assert manager.in_flight == 0
+        assert manager.expired == 3
+    
+    def test_finish_flushes_in_flight(self):
+        """Test that finish folds every remaining entity."""
+        manager = EntityLifecycleManager("START", terminal_states=["FILLED"])
+        for ev in EVENTS:
+            manager.add(ev)
+        fsm = manager.finish()
+        
+        assert manager.in_flight == 0
+        assert fsm.transitions["NEW_REQUESTED"][("REJECTED", "REJECT")] == 1
+    
+    def test_skips_incomplete_events(self):
+        """Test that events without entity or state are ignored."""
+        manager = EntityLifecycleManager("START")
+        manager.add(make_event(None, "2023-10-26T12:00:00.0", "NEW_ORDER", "NEW_REQUESTED"))
+        manager.add(make_event("ORDER1", "2023-10-26T12:00:00.0", "NEW_ORDER", None))
+        
+        assert manager.in_flight == 0
+        assert manager.finish().transitions == {}
+
+
+class TestSplitLifecycles:
+    """Test lifecycle restarts for builds that keep every event."""
+    
+    def make_events(self, n, seed):
+        rng = random.Random(seed)
+        states = ["NEW_REQUESTED", "ACKED_NEW", "FILLED", "REJECTED"]
+        events = []
+        for i in range(n):
+            # mostly increasing log time with some late events
+            secs = max(0, i * 5 + rng.randrange(-20, 5))
+            events.append(make_event(f"ORDER{rng.randrange(15)}", f"2023-10-26T12:{secs // 60 % 60:02d}:{secs % 60:02d}.0",
+                                     "RULE", rng.choice(states)))
+        return events
+    
+    @pytest.mark.parametrize("terminal_states, ttl", [(["FILLED", "REJECTED"], None), ((), 30), (["FILLED"], 60)])
+    def test_build_fsm_matches_streaming(self, terminal_states, ttl):
+        """Test that build_fsm over split lifecycles counts what streaming does."""
+        streamed_paths, split_paths = PathTrie(), PathTrie()
+        streamed = build_fsm_streaming(self.make_events(600, 5), "START", terminal_states, ttl, streamed_paths)
+        
+        events = list(split_lifecycles(self.make_events(600, 5), terminal_states, ttl))
+        split = build_fsm(events, "START", paths=split_paths)
+        
+        assert split.transitions == streamed.transitions
+        assert sorted(split_paths.top()) == sorted(streamed_paths.top())
+        assert any("#" in ev.entity_id for ev in events)
+    
+    def test_restart_ids(self):
+        """Test that only restarted lifecycles are renamed."""
+        events = list(split_lifecycles(EVENTS + [make_event("ORDER2", "2023-10-26T12:00:06.0", "NEW_ORDER", "NEW_REQUESTED")],
+                                       terminal_states=["REJECTED"]))
+        
+        assert [ev.entity_id for ev in events] == ["ORDER1", "ORDER2", "ORDER1", "ORDER1", "ORDER2", "ORDER3", "ORDER2#1"]
+    
+    def test_ttl_restart_without_other_traffic(self):
+        """Test that an entity idle past the TTL is renamed even when nothing else logged."""
+        events = [
+            make_event("A", "2023-10-26T12:00:00.0", "NEW_ORDER", "NEW_REQUESTED"),
+            make_event("A", "2023-10-26T12:01:40.0", "FILLED", "FILLED"),
+        ]
+        
+        assert [ev.entity_id for ev in split_lifecycles(events, ttl=10)] == ["A", "A#1"]
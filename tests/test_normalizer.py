@@ -1,5 +1,5 @@
 import pytest
-from logfsm.normalizer import normalize_line, extract_timestamp
+from logfsm.normalizer import normalize_line, extract_timestamp, timestamp_to_ns, ns_to_timestamp, MISSING_TS
 
 
 class TestNormalizeLine:
@@ -124,4 +124,42 @@ class TestExtractTimestamp:
         """Test extracting timestamp when it's in the middle of the line."""
         line = "Process started at 2023-10-26T12:34:56.789 successfully"
         timestamp = extract_timestamp(line)
-        assert timestamp == "2023-10-26T12:34:56.789"
\ No newline at end of file
+        assert timestamp == "2023-10-26T12:34:56.789"
+
+
+class TestTimestampToNs:
+    """Test the timestamp_to_ns function."""
+    
+    def test_timestamp_to_ns_epoch(self):
+        """Test converting the Unix epoch."""
+        assert timestamp_to_ns("1970-01-01T00:00:00.0") == 0
+    
+    def test_timestamp_to_ns_fraction_digits(self):
+        """Test that fractions of any length are scaled to nanoseconds."""
+        assert timestamp_to_ns("1970-01-01T00:00:01.5") == 1_500_000_000
+        assert timestamp_to_ns("1970-01-01T00:00:01.123456") == 1_123_456_000
+        assert timestamp_to_ns("1970-01-01T00:00:01.1234567891") == 1_123_456_789
+    
+    def test_timestamp_to_ns_missing(self):
+        """Test that a missing timestamp sorts before any real one."""
+        assert timestamp_to_ns("") == MISSING_TS
+        assert timestamp_to_ns(None) == MISSING_TS
+        assert MISSING_TS < timestamp_to_ns("1900-01-01T00:00:00.0")
+    
+    def test_timestamp_to_ns_preserves_order(self):
+        """Test that numeric order matches string order of timestamps."""
+        stamps = [
+            "2023-10-26T12:34:56.78",
+            "2023-10-26T12:34:56.789",
+            "2023-10-26T12:34:56.9",
+            "2023-10-26T12:35:00.123",
+            "2023-10-27T00:00:00.0",
+        ]
+        values = [timestamp_to_ns(ts) for ts in stamps]
+        assert values == sorted(values)
+        assert len(set(values)) == len(values)
+    
+    def test_ns_to_timestamp_round_trip(self):
+        """Test formatting nanoseconds back to a millisecond timestamp."""
+        ns = timestamp_to_ns("2023-10-26T12:34:56.789")
+        assert ns_to_timestamp(ns) == "2023-10-26T12:34:56.789"
@@ -0,0 +1,204 @@
+import pytest
+import os
+import signal
+import tempfile
+from array import array
+from logfsm.config import Config
+from logfsm.rule_engine import compile_rules, classify_line_ids
+from logfsm.fsm_builder import build_fsm_ids, decode_fsm
+from logfsm.normalizer import timestamp_to_ns
+from logfsm.event_store import EventStore, write_event_store
+from logfsm.fsm_builder import build_fsm_from_store
+from logfsm import parallel
+from logfsm.parallel import (ShmRing, split_ranges, classify_file_parallel, build_fsm_parallel,
+                             build_fsm_from_store_sharded)
+from tests.conftest import make_event
+
+
+CONFIG = {
+    "signal_rules": [
+        {
+            "name": "NEW_ORDER",
+            "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+            "state": "NEW_REQUESTED"
+        },
+        {
+            "name": "ACK_NEW",
+            "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>[A-Z0-9]+)",
+            "state": "ACKED_NEW"
+        }
+    ],
+    "entity_id_field": "order_id",
+    "start_state": "START"
+}
+
+
+def _killed_worker(*args):
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def write_log(n):
+    lines = []
+    for i in range(n):
+        order = f"ORD{i % 97}"
+        ts = f"2023-10-26T12:{i // 6000 % 60:02d}:{i // 100 % 60:02d}.{i % 100:03d}"
+        if i % 5 == 0:
+            lines.append(f"{ts} INFO heartbeat")
+        elif i % 2:
+            lines.append(f"{ts} INFO NewOrderSingle ClOrdID={order}")
+        else:
+            lines.append(f"{ts} INFO ExecutionReport ExecType=0 ClOrdID={order}")
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.log', delete=False, encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    return f.name, lines
+
+
+class TestSplitRanges:
+    """Test newline-aligned file splitting."""
+    
+    def test_ranges_cover_file_on_line_boundaries(self):
+        """Test that ranges are contiguous and end on newlines."""
+        path, _ = write_log(1000)
+        try:
+            ranges = split_ranges(path, 4)
+            with open(path, "rb") as f:
+                data = f.read()
+        finally:
+            os.unlink(path)
+        
+        assert len(ranges) == 4
+        assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert end == start
+            assert data[end - 1:end] == b"\n"
+    
+    def test_more_parts_than_lines(self):
+        """Test that tiny files give fewer, non-empty ranges."""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.log', delete=False) as f:
+            f.write("one line\n")
+            path = f.name
+        try:
+            assert split_ranges(path, 8) == [(0, 9)]
+        finally:
+            os.unlink(path)
+
+
+class TestShmRing:
+    """Test the shared-memory record ring."""
+    
+    def test_write_and_view_columns(self):
+        """Test that written columns read back through typed views."""
+        ring = ShmRing(slots=2, slot_records=8)
+        try:
+            ring.write(1, array("q", [10, -20]), array("i", [0, 1]), array("i", [5, 6]), array("i", [7, 8]))
+            cols = ring.columns(1, 2)
+            
+            assert [list(c) for c in cols] == [[10, -20], [0, 1], [5, 6], [7, 8]]
+            for view in cols:
+                view.release()
+            
+            attached = ShmRing(2, 8, ring.name)
+            assert list(attached.columns(1, 2)[0]) == [10, -20]
+            attached.close()
+        finally:
+            ring.close()
+            ring.unlink()
+
+
+class TestClassifyFileParallel:
+    """Test multi-process classification through shared memory."""
+    
+    def test_matches_serial(self):
+        """Test that records and FSM equal the serial fast path."""
+        path, lines = write_log(3000)
+        cfg = Config(CONFIG)
+        compiled = compile_rules(cfg)
+        try:
+            # small slots so every ring wraps around several times
+            records, entities = classify_file_parallel(path, cfg, workers=3, slots=2, slot_records=64)
+            fsm = build_fsm_parallel(path, cfg, workers=2)
+        finally:
+            os.unlink(path)
+        
+        expected = [r for r in (classify_line_ids(ln, compiled) for ln in lines) if r]
+        decoded = [(entities.lookup(e), ts, st, rl) for e, ts, st, rl in records]
+        assert decoded == [(e, timestamp_to_ns(ts), st, rl) for e, ts, st, rl in expected]
+        assert len(entities) == 97
+        
+        serial = build_fsm_ids(expected, compiled.start_id, compiled.symbols)
+        assert decode_fsm(fsm).transitions == decode_fsm(serial).transitions
+    
+    def test_out_of_order_entities(self):
+        """Test that entities logged out of timestamp order count as build_fsm_ids would."""
+        path, lines = write_log(2000)
+        # move every 7th line to the end so its entity's timestamps go back
+        lines = [ln for i, ln in enumerate(lines) if i % 7] + lines[::7]
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        cfg = Config(CONFIG)
+        compiled = compile_rules(cfg)
+        try:
+            fsm = build_fsm_parallel(path, cfg, workers=3, slots=2, slot_records=64)
+        finally:
+            os.unlink(path)
+        
+        expected = [r for r in (classify_line_ids(ln, compiled) for ln in lines) if r]
+        serial = build_fsm_ids(expected, compiled.start_id, compiled.symbols)
+        assert decode_fsm(fsm).transitions == decode_fsm(serial).transitions
+    
+    def test_empty_file(self):
+        """Test that an empty file yields no records."""
+        with tempfile.NamedTemporaryFile(suffix='.log', delete=False) as f:
+            path = f.name
+        try:
+            records, entities = classify_file_parallel(path, Config(CONFIG), workers=2)
+        finally:
+            os.unlink(path)
+        
+        assert records == [] and len(entities) == 0
+    
+    def test_worker_killed(self, monkeypatch):
+        """Test that a worker killed without reporting is detected instead of waited on."""
+        path, _ = write_log(10)
+        monkeypatch.setattr(parallel, "_worker", _killed_worker)
+        monkeypatch.setattr(parallel, "WORKER_POLL", 0.1)
+        try:
+            with pytest.raises(RuntimeError, match="worker 0 died with exit code -9"):
+                classify_file_parallel(path, Config(CONFIG), workers=1)
+        finally:
+            os.unlink(path)
+    
+    def test_worker_error(self):
+        """Test that a failing worker is reported in the parent."""
+        path, _ = write_log(10)
+        bad = Config(dict(CONFIG, signal_rules=[{"name": "BAD", "regex": "(", "state": "X"}]))
+        try:
+            with pytest.raises(RuntimeError, match="worker 0 failed"):
+                classify_file_parallel(path, bad, workers=1)
+        finally:
+            os.unlink(path)
+
+
+class TestShardedBuild:
+    """Test FSM building sharded by entity across processes."""
+    
+    def test_store_matches_serial(self):
+        """Test that the sharded store build equals build_fsm_from_store."""
+        events = [
+            make_event(f"ORD{i % 13}", f"2023-10-26T12:00:{i % 60:02d}.{i:03d}",
+                       ["N", "A", None][i % 3], ["NEW", "ACKED", "FILLED"][i % 3])
+            for i in range(500)
+        ]
+        with tempfile.NamedTemporaryFile(suffix='.events', delete=False) as f:
+            path = f.name
+        try:
+            write_event_store(path, events, "START", block_size=32)
+            with EventStore(path) as store:
+                serial = build_fsm_from_store(store)
+            fsm = build_fsm_from_store_sharded(path, workers=3)
+            renamed = build_fsm_from_store_sharded(path, "BEGIN", workers=2)
+        finally:
+            os.unlink(path)
+        
+        assert fsm.transitions == serial.transitions
+        assert "BEGIN" in renamed.transitions and "START" not in renamed.transitions
@@ -0,0 +1,150 @@
+import pytest
+import json
+import random
+from collections import Counter
+from logfsm.models import ClassifiedEvent
+from logfsm.fsm_builder import build_fsm, build_fsm_ids
+from logfsm.lifecycle import build_fsm_streaming
+from logfsm.symbols import SymbolTable
+from logfsm.paths import (
+    PathTrie, SpaceSaving, TopVariants, make_collector, variants_to_dict, variants_to_json
+)
+
+
+FILLED = ("START", "NEW", "ACKED", "FILLED")
+PARTIAL = ("START", "NEW", "ACKED", "PARTIAL", "FILLED")
+REJECTED = ("START", "NEW", "REJECTED")
+
+
+class TestPathTrie:
+    """Test exact variant counting."""
+    
+    def setup_method(self):
+        self.trie = PathTrie()
+        for path, n in ((FILLED, 5), (PARTIAL, 3), (REJECTED, 1)):
+            for _ in range(n):
+                self.trie.add(path)
+    
+    def test_top(self):
+        """Test that variants come back most frequent first."""
+        assert self.trie.top() == [(FILLED, 5, 0), (PARTIAL, 3, 0), (REJECTED, 1, 0)]
+        assert self.trie.top(1) == [(FILLED, 5, 0)]
+    
+    def test_counts(self):
+        """Test exact and prefix counts."""
+        assert self.trie.total == 9
+        assert len(self.trie) == 3
+        assert self.trie.count(FILLED) == 5
+        assert self.trie.count(("START", "NEW", "ACKED")) == 0
+        assert self.trie.prefix_count(("START", "NEW", "ACKED")) == 8
+        assert self.trie.prefix_count(("START", "OTHER")) == 0
+    
+    def test_shared_prefixes(self):
+        """Test that common prefixes are stored once."""
+        # root + START, NEW, ACKED, FILLED, PARTIAL, FILLED, REJECTED
+        assert self.trie.nodes == 8
+
+
+class TestSpaceSaving:
+    """Test the heavy-hitter counter."""
+    
+    def test_exact_under_capacity(self):
+        """Test that counts are exact while all keys fit."""
+        ss = SpaceSaving(10)
+        for key in "aabbbc":
+            ss.add(key)
+        
+        assert ss.top() == [("b", 3, 0), ("a", 2, 0), ("c", 1, 0)]
+    
+    def test_eviction_error(self):
+        """Test that a replacing key inherits the evicted count as error."""
+        ss = SpaceSaving(2)
+        for key in "aaab":
+            ss.add(key)
+        ss.add("c")
+        
+        assert len(ss) == 2
+        assert ss.top() == [("a", 3, 0), ("c", 2, 1)]
+    
+    def test_heavy_hitters_kept(self):
+        """Test the guarantee on skewed streams with bounded memory."""
+        rng = random.Random(3)
+        stream = [f"rare{rng.randrange(5000)}" for _ in range(20000)]
+        stream += ["hot1"] * 3000 + ["hot2"] * 2000
+        rng.shuffle(stream)
+        truth = Counter(stream)
+        
+        ss = SpaceSaving(50)
+        for key in stream:
+            ss.add(key)
+        
+        assert len(ss) == 50
+        assert len(ss._heap) <= 4 * 50 + 1
+        top = ss.top(2)
+        assert [key for key, _, _ in top] == ["hot1", "hot2"]
+        for key, c, error in top:
+            assert c - error <= truth[key] <= c
+    
+    def test_invalid_capacity(self):
+        """Test that a zero capacity is rejected."""
+        with pytest.raises(ValueError):
+            SpaceSaving(0)
+
+
+class TestVariantsOutput:
+    """Test variant reports."""
+    
+    def test_dict_exact(self):
+        """Test the report of an exact collector."""
+        trie = make_collector()
+        trie.add(FILLED)
+        
+        assert variants_to_dict(trie) == {
+            "total": 1, "exact": True, "variants": [{"path": list(FILLED), "count": 1}]
+        }
+    
+    def test_json_bounded_with_names(self):
+        """Test decoding id paths in a bounded collector report."""
+        top = make_collector(capacity=5)
+        top.add([0, 1, 2])
+        data = json.loads(variants_to_json(top, names=["START", "NEW", "ACKED"]))
+        
+        assert isinstance(top, TopVariants)
+        assert data["exact"] is False
+        assert data["variants"] == [{"path": ["START", "NEW", "ACKED"], "count": 1, "error": 0}]
+
+
+class TestBuilderHooks:
+    """Test the paths hook of the FSM builders."""
+    
+    def setup_method(self):
+        self.events = [
+            ClassifiedEvent("l2", "n2", "2023-10-26T12:00:01.000", "O1", "ACK", "ACKED"),
+            ClassifiedEvent("l1", "n1", "2023-10-26T12:00:00.000", "O1", "NEW_ORDER", "NEW"),
+            ClassifiedEvent("l3", "n3", "2023-10-26T12:00:02.000", "O2", "NEW_ORDER", "NEW"),
+            ClassifiedEvent("l4", "n4", "2023-10-26T12:00:03.000", "O1", "FILL", "FILLED"),
+        ]
+    
+    def test_build_fsm(self):
+        """Test that build_fsm reports time-ordered state sequences."""
+        trie = PathTrie()
+        build_fsm(self.events, "START", paths=trie)
+        
+        assert sorted(trie.top()) == [(("START", "NEW"), 1, 0), (("START", "NEW", "ACKED", "FILLED"), 1, 0)]
+    
+    def test_build_fsm_ids(self):
+        """Test that build_fsm_ids reports id sequences."""
+        symbols = SymbolTable(["START", "NEW", "NEW_ORDER", "ACKED", "ACK"])
+        records = [("O1", "t2", 3, 4), ("O1", "t1", 1, 2)]
+        trie = PathTrie()
+        build_fsm_ids(records, 0, symbols, paths=trie)
+        
+        assert trie.count((0, 1, 3)) == 1
+    
+    def test_build_fsm_streaming(self):
+        """Test that streaming building reports each finalized entity."""
+        trie = PathTrie()
+        build_fsm_streaming(self.events, "START", terminal_states=["FILLED"], paths=trie)
+        
+        assert trie.total == 2
+        assert trie.count(("START", "NEW", "ACKED", "FILLED")) == 1
@@ -0,0 +1,127 @@
+import pytest
+import io
+import os
+import pstats
+import tempfile
+import time
+from logfsm.config import Config
+from logfsm.rule_engine import compile_rules, classify_line, CompiledRule
+from logfsm.fix import FixRule
+from logfsm.profiling import RuleTimer, StackSampler, run_profiled
+
+
+def make_compiled():
+    cfg = Config({
+        "signal_rules": [
+            {"name": "NEW_ORDER", "regex": r"NewOrderSingle.*ClOrdID=(?P<order_id>\w+)", "state": "NEW"},
+            {"name": "FILL", "fix": {"MsgType": "ExecutionReport", "ExecType": "F"},
+             "capture": {"order_id": "ClOrdID"}, "state": "FILLED"}
+        ],
+        "entity_id_field": "order_id",
+        "start_state": "START"
+    })
+    return cfg, compile_rules(cfg)
+
+
+class TestRuleTimer:
+    """Test per-rule match timing."""
+    
+    def test_counts_calls_and_hits(self):
+        """Test that calls, hits and time are recorded per rule."""
+        cfg, compiled = make_compiled()
+        timer = RuleTimer()
+        lines = [
+            "NewOrderSingle ClOrdID=A1",
+            "ExecutionReport ExecType=F ClOrdID=A1",
+            "heartbeat NewOrderSingle without id"
+        ]
+        
+        with timer.installed():
+            events = [classify_line(ln, compiled, cfg) for ln in lines]
+        
+        assert [ev.state for ev in events] == ["NEW", "FILLED", None]
+        calls, hits, seconds = timer.rules["NEW_ORDER"]
+        # the dispatcher skips rules whose literal or MsgType is absent
+        assert (calls, hits) == (2, 1)
+        assert seconds >= 0
+        assert timer.rules["FILL"][:2] == [1, 1]
+        assert "NEW_ORDER" in timer.format()
+    
+    def test_restores_match_methods(self):
+        """Test that rule classes are restored after profiling."""
+        originals = (CompiledRule.match, FixRule.match_fields)
+        with pytest.raises(RuntimeError):
+            with RuleTimer().installed():
+                raise RuntimeError("boom")
+        
+        assert (CompiledRule.match, FixRule.match_fields) == originals
+
+
+class TestStackSampler:
+    """Test the sampling profiler."""
+    
+    def test_collapsed_stacks(self):
+        """Test that samples are written as collapsed stacks."""
+        sampler = StackSampler(interval=0.0005)
+        sampler.start()
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            sum(range(1000))
+        sampler.stop()
+        
+        assert sampler.stacks
+        with tempfile.NamedTemporaryFile(suffix='.folded', delete=False) as f:
+            path = f.name
+        try:
+            sampler.write(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        finally:
+            os.unlink(path)
+        
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+        assert "test_collapsed_stacks (test_profiling.py:" in stack
+
+
+class TestRunProfiled:
+    """Test running a command under the profiler."""
+    
+    def test_cprofile_writes_pstats(self):
+        """Test the deterministic profiler output and rule table."""
+        cfg, compiled = make_compiled()
+        out = io.StringIO()
+        
+        def command(args):
+            return [classify_line("NewOrderSingle ClOrdID=A1", compiled, cfg) for _ in range(args)]
+        
+        with tempfile.NamedTemporaryFile(suffix='.prof', delete=False) as f:
+            path = f.name
+        try:
+            result = run_profiled(command, 10, path, "cprofile", stream=out)
+            stats = pstats.Stats(path)
+        finally:
+            os.unlink(path)
+        
+        assert len(result) == 10
+        assert any(func[2] == "classify_line" for func in stats.stats)
+        assert "NEW_ORDER" in out.getvalue()
+    
+    def test_profile_written_on_error(self):
+        """Test that the profile is still written when the command fails."""
+        def command(args):
+            raise ValueError("bad input")
+        
+        with tempfile.NamedTemporaryFile(suffix='.folded', delete=False) as f:
+            path = f.name
+        try:
+            with pytest.raises(ValueError):
+                run_profiled(command, None, path, "sample", stream=io.StringIO())
+            assert os.path.exists(path)
+        finally:
+            os.unlink(path)
+    
+    def test_unknown_mode(self):
+        """Test that an unknown profile mode is rejected."""
+        with pytest.raises(ValueError):
+            run_profiled(lambda args: None, None, "out", "perf")
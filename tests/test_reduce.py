@@ -0,0 +1,185 @@
+import pytest
+import random
+import time
+from logfsm.models import FSM, ClassifiedEvent
+from logfsm.fsm_builder import build_fsm, build_fsm_ids
+from logfsm.symbols import SymbolTable
+from logfsm.reduce import (
+    prune_edges, equivalence_classes, merge_equivalent_states, collapse_chains, reduce_fsm
+)
+
+
+class TestPruneEdges:
+    """Test dropping low-support edges."""
+    
+    def test_min_count(self):
+        """Test that edges below the count threshold are removed."""
+        fsm = FSM(transitions={
+            "START": {("NEW", "NEW_ORDER"): 10, ("ODD", "WEIRD"): 1},
+            "ODD": {("NEW", "RETRY"): 1},
+        })
+        
+        pruned = prune_edges(fsm, min_count=2)
+        
+        assert pruned.transitions == {"START": {("NEW", "NEW_ORDER"): 10}}
+        assert fsm.transitions["ODD"] == {("NEW", "RETRY"): 1}
+    
+    def test_min_share(self):
+        """Test that edges below a share of their state's traffic are removed."""
+        fsm = FSM(transitions={"START": {("A", "X"): 95, ("B", "Y"): 4, ("C", "Z"): 1}})
+        
+        pruned = prune_edges(fsm, min_share=0.05)
+        
+        assert pruned.transitions == {"START": {("A", "X"): 95}}
+    
+    def test_keeps_latency_of_kept_edges(self):
+        """Test that latency sketches follow their edges."""
+        events = [
+            ClassifiedEvent("l1", "n1", "2023-10-26T12:00:00.000", "O1", "NEW_ORDER", "NEW"),
+            ClassifiedEvent("l2", "n2", "2023-10-26T12:00:01.000", "O1", "ACK", "ACKED"),
+        ]
+        pruned = prune_edges(build_fsm(events, "START", latency=True))
+        
+        assert pruned.latencies["NEW"][("ACKED", "ACK")].count == 1
+    
+    def test_decodes_symbol_ids(self):
+        """Test that id-keyed FSMs come back keyed by name."""
+        symbols = SymbolTable(["START", "NEW", "NEW_ORDER"])
+        fsm = build_fsm_ids([("O1", "t1", 1, 2)], 0, symbols)
+        
+        assert prune_edges(fsm).transitions == {"START": {("NEW", "NEW_ORDER"): 1}}
+
+
+class TestMergeEquivalentStates:
+    """Test bisimulation-style state merging."""
+    
+    def setup_method(self):
+        # two venues with the same ack/fill behaviour in different volumes
+        self.fsm = FSM(transitions={
+            "START": {("SENT_A", "ROUTE_A"): 20, ("SENT_B", "ROUTE_B"): 10},
+            "SENT_A": {("ACKED", "ACK"): 18, ("REJECTED", "REJECT"): 2},
+            "SENT_B": {("ACKED", "ACK"): 9, ("REJECTED", "REJECT"): 1},
+            "ACKED": {("FILLED", "FILL"): 27},
+        })
+    
+    def test_classes(self):
+        """Test that proportional outgoing distributions are equivalent."""
+        assert equivalence_classes(self.fsm, keep=["START"]) == [["SENT_A", "SENT_B"]]
+    
+    def test_merge(self):
+        """Test that merged states carry the summed counts."""
+        merged = merge_equivalent_states(self.fsm, keep=["START"])
+        
+        assert merged.transitions["START"] == {("SENT_A|SENT_B", "ROUTE_A"): 20, ("SENT_A|SENT_B", "ROUTE_B"): 10}
+        assert merged.transitions["SENT_A|SENT_B"] == {("ACKED", "ACK"): 27, ("REJECTED", "REJECT"): 3}
+    
+    def test_different_distributions_not_merged(self):
+        """Test that states with different ratios stay apart."""
+        self.fsm.transitions["SENT_B"] = {("ACKED", "ACK"): 5, ("REJECTED", "REJECT"): 5}
+        
+        assert equivalence_classes(self.fsm, keep=["START"]) == []
+    
+    def test_refinement_through_targets(self):
+        """Test that states are split when their targets are not equivalent."""
+        fsm = FSM(transitions={
+            "START": {("A", "GO"): 1, ("B", "GO"): 1},
+            "A": {("A2", "NEXT"): 1},
+            "B": {("B2", "NEXT"): 1},
+            "A2": {("DONE", "FINISH"): 1},
+            "B2": {("FAILED", "FINISH"): 1},
+        })
+        
+        # DONE and FAILED are sinks and never merge, so neither do A2/B2 or A/B
+        assert equivalence_classes(fsm) == []
+        
+        fsm.transitions["B2"] = {("DONE", "FINISH"): 1}
+        assert equivalence_classes(fsm, keep=["START"]) == [["A", "B"], ["A2", "B2"]]
+
+
+class TestCollapseChains:
+    """Test collapsing pass-through states."""
+    
+    def test_chain(self):
+        """Test that a linear chain becomes one edge."""
+        fsm = FSM(transitions={
+            "START": {("NEW", "NEW_ORDER"): 5},
+            "NEW": {("VALIDATED", "VALIDATE"): 5},
+            "VALIDATED": {("ACKED", "ACK"): 5},
+            "ACKED": {("FILLED", "FILL"): 3, ("CANCELED", "CANCEL"): 2},
+        })
+        
+        collapsed = collapse_chains(fsm, keep=["START"])
+        
+        assert collapsed.transitions == {
+            "START": {("ACKED", "NEW_ORDER > VALIDATE > ACK"): 5},
+            "ACKED": {("FILLED", "FILL"): 3, ("CANCELED", "CANCEL"): 2},
+        }
+    
+    def test_lossy_states_kept(self):
+        """Test that states where entities stop are not collapsed."""
+        fsm = FSM(transitions={
+            "START": {("NEW", "NEW_ORDER"): 5},
+            "NEW": {("ACKED", "ACK"): 4},
+        })
+        
+        assert collapse_chains(fsm).transitions == fsm.transitions
+    
+    def test_self_loop_kept(self):
+        """Test that a state with a self-loop is not collapsed."""
+        fsm = FSM(transitions={
+            "START": {("RETRYING", "SEND"): 3},
+            "RETRYING": {("RETRYING", "RETRY"): 3},
+        })
+        
+        assert collapse_chains(fsm).transitions == fsm.transitions
+
+
+class TestReduceFsm:
+    """Test the combined reduction."""
+    
+    def test_pipeline(self):
+        """Test prune, merge and collapse together."""
+        fsm = FSM(transitions={
+            "START": {("SENT_A", "ROUTE_A"): 20, ("SENT_B", "ROUTE_B"): 10, ("ODD", "WEIRD"): 1},
+            "SENT_A": {("ACKED", "ACK"): 20},
+            "SENT_B": {("ACKED", "ACK"): 10},
+            "ACKED": {("FILLED", "FILL"): 30},
+        })
+        
+        reduced = reduce_fsm(fsm, keep=["START"], min_count=2)
+        
+        assert reduced.transitions == {
+            "START": {("SENT_A|SENT_B", "ROUTE_A"): 20, ("SENT_A|SENT_B", "ROUTE_B"): 10},
+            "SENT_A|SENT_B": {("FILLED", "ACK > FILL"): 30},
+        }
+    
+    def test_large_graph(self):
+        """Test that a 100k-edge FSM reduces in reasonable time."""
+        rng = random.Random(7)
+        transitions = {}
+        for s in range(20000):
+            transitions[f"S{s}"] = {(f"S{rng.randrange(20000)}", f"R{k}"): rng.randint(1, 5) for k in range(5)}
+        fsm = FSM(transitions=transitions)
+        
+        start = time.perf_counter()
+        reduced = reduce_fsm(fsm, keep=["S0"], min_count=2)
+        
+        assert time.perf_counter() - start < 30
+        assert sum(len(d) for d in reduced.transitions.values()) < 100000
+    
+    def test_long_chains(self):
+        """Test that refinement stays near-linear on 50k edges of chains."""
+        n = 25000
+        transitions = {"START": {("A0", "GO"): 1, ("B0", "GO"): 1}}
+        for i in range(n):
+            last = i == n - 1
+            transitions[f"A{i}"] = {("END" if last else f"A{i + 1}", "NEXT"): 1}
+            transitions[f"B{i}"] = {("END" if last else f"B{i + 1}", "NEXT"): 1}
+        fsm = FSM(transitions=transitions)
+        
+        start = time.perf_counter()
+        classes = equivalence_classes(fsm, keep=["START"])
+        
+        assert time.perf_counter() - start < 30
+        assert len(classes) == n
+        assert sorted(classes[0]) == ["A0", "B0"]
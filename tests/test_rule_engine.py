@@ -1,8 +1,14 @@
 import pytest
 import re
-from logfsm.rule_engine import CompiledRule, compile_rules, classify_line
+import mmap
+import tempfile
+from logfsm.rule_engine import (
+    CompiledRule, compile_rules, classify_line, classify_line_ids, classify_batch,
+    classify_threaded, iter_classified_batches, regex_engine
+)
 from logfsm.config import Config
 from logfsm.models import ClassifiedEvent
+from logfsm.normalizer import timestamp_to_ns, MISSING_TS
 
 
 class TestCompiledRule:
@@ -273,4 +279,258 @@ class TestClassifyLine:
         
         # Should match first rule, not second
         assert event.rule_name == "GENERAL_RULE"
-        assert event.state == "GENERAL_STATE"
\ No newline at end of file
+        assert event.state == "GENERAL_STATE"
+
+    
+    def test_classify_line_aliases(self):
+        """Test that alias_fields groups are captured as aliases."""
+        cfg = Config({
+            "signal_rules": [
+                {
+                    "name": "REPLACE",
+                    "regex": r"(?i)ordercancelreplacerequest.*\bclordid=(?P<order_id>\w+)(?:.*origclordid=(?P<orig_id>\w+))?",
+                    "state": "REPLACE_REQUESTED"
+                },
+                {
+                    "name": "FIX_CANCEL",
+                    "fix": {"MsgType": "OrderCancelRequest"},
+                    "capture": {"order_id": "ClOrdID", "orig_id": "OrigClOrdID"},
+                    "state": "CANCEL_REQUESTED"
+                }
+            ],
+            "alias_fields": ["orig_id"]
+        })
+        compiled = compile_rules(cfg)
+        assert [rule.alias_groups for rule in compiled] == [("orig_id",), ("orig_id",)]
+        
+        event = classify_line("OrderCancelReplaceRequest ClOrdID=B2 OrigClOrdID=A1", compiled, cfg)
+        assert event.entity_id == "B2" and event.aliases == ("A1",)
+        
+        event = classify_line("OrderCancelReplaceRequest ClOrdID=B2", compiled, cfg)
+        assert event.aliases == ()
+        
+        event = classify_line("35=F|11=C3|41=B2", compiled, cfg)
+        assert event.entity_id == "C3" and event.aliases == ("B2",)
+    
+    def test_classify_line_dimensions(self):
+        """Test that dimension groups are captured in config order."""
+        cfg = Config({
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>\w+).*symbol=(?P<symbol>\w+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "ACK_NEW",
+                    "regex": r"(?i)executionreport.*clordid=(?P<order_id>\w+)",
+                    "state": "ACKED_NEW"
+                }
+            ],
+            "dimensions": ["venue", "symbol"]
+        })
+        compiled = compile_rules(cfg)
+        assert [rule.dimension_groups for rule in compiled] == [(None, "symbol"), ()]
+        
+        event = classify_line("NewOrderSingle ClOrdID=A1 Symbol=IBM", compiled, cfg)
+        assert event.dimensions == (None, "IBM")
+        
+        event = classify_line("ExecutionReport ClOrdID=A1", compiled, cfg)
+        assert event.dimensions == ()
+
+class TestClassifyLineIds:
+    """Test symbol ids from compile_rules and the classify_line_ids fast path."""
+    
+    def setup_method(self):
+        self.cfg = Config({
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "FILLED",
+                    "regex": r"(?i)executionreport.*exectype=f.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "FILLED"
+                },
+                {
+                    "name": "HEARTBEAT",
+                    "regex": r"(?i)heartbeat",
+                    "state": "ALIVE"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        })
+        self.compiled = compile_rules(self.cfg)
+    
+    def test_compile_rules_interns_names(self):
+        """Test that states and rule names share one symbol table."""
+        symbols = self.compiled.symbols
+        
+        assert symbols.lookup(self.compiled.start_id) == "START"
+        assert symbols.lookup(self.compiled[0].rule_id) == "NEW_ORDER"
+        assert symbols.lookup(self.compiled[0].state_id) == "NEW_REQUESTED"
+        # the FILLED rule and FILLED state are the same symbol
+        assert self.compiled[1].rule_id == self.compiled[1].state_id
+        assert self.compiled[0].entity_group == "order_id"
+        assert self.compiled[2].entity_group is None
+    
+    def test_classify_line_ids_match(self):
+        """Test that a matching line yields an id record."""
+        line = "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123DEF"
+        rec = classify_line_ids(line, self.compiled)
+        
+        assert rec == ("ABC123DEF", "2023-10-26T12:34:56.789", self.compiled[0].state_id, self.compiled[0].rule_id)
+    
+    def test_classify_line_ids_agrees_with_classify_line(self):
+        """Test that the fast path picks the same rule as classify_line."""
+        line = "ExecutionReport ExecType=F ClOrdID=XYZ789"
+        rec = classify_line_ids(line, self.compiled)
+        ev = classify_line(line, self.compiled, self.cfg)
+        symbols = self.compiled.symbols
+        
+        assert rec[0] == ev.entity_id
+        assert rec[1] == ev.timestamp
+        assert symbols.lookup(rec[2]) == ev.state
+        assert symbols.lookup(rec[3]) == ev.rule_name
+    
+    def test_classify_line_ids_no_fsm_event(self):
+        """Test lines that match nothing or match a rule without entity id."""
+        assert classify_line_ids("Unknown log message", self.compiled) is None
+        assert classify_line_ids("Heartbeat ClOrdID=ABC123", self.compiled) is None
+
+
+class TestClassifyBatch:
+    """Test column-wise classification of line blocks."""
+    
+    def setup_method(self):
+        self.cfg = Config({
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                },
+                {
+                    "name": "HEARTBEAT",
+                    "regex": r"(?i)heartbeat",
+                    "state": "ALIVE"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        })
+        self.compiled = compile_rules(self.cfg)
+        self.lines = [
+            "2023-10-26T12:34:56.789 INFO NewOrderSingle ClOrdID=ABC123",
+            "2023-10-26T12:34:57.000 INFO Heartbeat",
+            "2023-10-26T12:34:58.000 INFO something else",
+            "INFO NewOrderSingle ClOrdID=DEF456"
+        ]
+    
+    def test_columns(self):
+        """Test the per-line column values."""
+        batch = classify_batch(self.lines, self.compiled)
+        
+        assert len(batch) == 4
+        assert list(batch.rule) == [0, 1, -1, 0]
+        assert batch.entity_id == ["ABC123", None, None, "DEF456"]
+        assert batch.timestamp[0] == timestamp_to_ns("2023-10-26T12:34:56.789")
+        assert batch.timestamp[2] == MISSING_TS
+        assert batch.timestamp[3] == MISSING_TS
+        assert list(batch.state_id) == [self.compiled[0].state_id, self.compiled[1].state_id, -1, self.compiled[0].state_id]
+    
+    def test_records_agree_with_classify_line_ids(self):
+        """Test that batch records match the per-line fast path."""
+        batch = classify_batch(self.lines, self.compiled)
+        expected = [classify_line_ids(ln, self.compiled) for ln in self.lines]
+        expected = [(eid, timestamp_to_ns(ts), st, rl) for eid, ts, st, rl in filter(None, expected)]
+        
+        assert list(batch.records()) == expected
+    
+    def test_buffer_inputs(self):
+        """Test that str, bytes and mmap blocks are split into lines."""
+        text = "\n".join(self.lines) + "\n"
+        expected = classify_batch(self.lines, self.compiled)
+        
+        assert classify_batch(text, self.compiled) == expected
+        assert classify_batch(text.encode("utf-8"), self.compiled) == expected
+        assert classify_batch(memoryview(text.encode("utf-8")), self.compiled) == expected
+        
+        with tempfile.TemporaryFile() as f:
+            f.write(text.encode("utf-8"))
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                assert classify_batch(mm, self.compiled) == expected
+                assert len(classify_batch(mm[:mm.find(b"\n")], self.compiled)) == 1
+    
+    def test_buffer_split_on_newlines_only(self):
+        """Test that buffers split on \\n like file iteration, not on every line break."""
+        lines = [self.lines[0] + " \x0c\x1c\u2028 note", self.lines[1], ""]
+        expected = classify_batch(lines, self.compiled)
+        text = "\r\n".join(lines) + "\n"
+        
+        assert len(expected) == 3
+        assert classify_batch(text, self.compiled) == expected
+        assert classify_batch(text.encode("utf-8"), self.compiled) == expected
+        assert classify_batch(memoryview(text.encode("utf-8")), self.compiled) == expected
+    
+    def test_empty_block(self):
+        """Test classifying an empty block."""
+        assert len(classify_batch(b"", self.compiled)) == 0
+
+
+class TestClassifyThreaded:
+    """Test threaded batch classification and regex engines."""
+    
+    def setup_method(self):
+        self.cfg = Config({
+            "signal_rules": [
+                {
+                    "name": "NEW_ORDER",
+                    "regex": r"(?i)newordersingle.*clordid=(?P<order_id>[A-Z0-9]+)",
+                    "state": "NEW_REQUESTED"
+                }
+            ],
+            "entity_id_field": "order_id",
+            "start_state": "START"
+        })
+        self.compiled = compile_rules(self.cfg)
+        self.lines = [
+            f"2023-10-26T12:34:{i % 60:02d}.000 INFO NewOrderSingle ClOrdID=ORD{i}" if i % 3 else f"noise {i}"
+            for i in range(1000)
+        ]
+    
+    def test_matches_serial(self):
+        """Test that any thread count gives the serial result in order."""
+        expected = classify_batch(self.lines, self.compiled)
+        
+        for threads in (1, 2, 4):
+            assert classify_threaded(self.lines, self.compiled, threads, batch_lines=37) == expected
+    
+    def test_iterator_input(self):
+        """Test that batches stream from an iterator in order."""
+        batches = list(iter_classified_batches(iter(self.lines), self.compiled, threads=3, batch_lines=100))
+        
+        assert [len(b) for b in batches] == [100] * 10
+        assert batches[-1].entity_id[-2:] == ["ORD998", None]
+    
+    def test_unknown_engine(self):
+        """Test that an unknown regex engine is rejected."""
+        with pytest.raises(ValueError, match="unknown regex_engine"):
+            regex_engine("pcre")
+    
+    def test_regex_engine(self):
+        """Test compiling and matching with the regex package."""
+        try:
+            import regex
+        except ImportError:
+            with pytest.raises(ValueError, match="requires the regex package"):
+                regex_engine("regex")
+            return
+        self.cfg.regex_engine = "regex"
+        compiled = compile_rules(self.cfg)
+        
+        assert classify_threaded(self.lines, compiled, 2) == classify_batch(self.lines, self.compiled)
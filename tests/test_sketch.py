@@ -0,0 +1,98 @@
+import pytest
+import random
+from logfsm.sketch import LatencySketch, format_duration
+
+
+class TestLatencySketch:
+    """Test the LatencySketch class."""
+    
+    def test_empty_sketch(self):
+        """Test quantiles of an empty sketch."""
+        sketch = LatencySketch()
+        assert sketch.count == 0
+        assert sketch.quantile(0.5) is None
+        assert sketch.to_dict() == {"count": 0}
+    
+    def test_quantiles_within_relative_accuracy(self):
+        """Test that quantiles stay within the configured relative error."""
+        rng = random.Random(42)
+        values = [rng.lognormvariate(-4, 1.5) for _ in range(20000)]
+        sketch = LatencySketch(relative_accuracy=0.01)
+        for v in values:
+            sketch.add(v)
+        
+        values.sort()
+        for q in (0.01, 0.5, 0.9, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            assert abs(sketch.quantile(q) - exact) <= 0.011 * exact
+    
+    def test_memory_is_bounded(self):
+        """Test that the number of buckets does not grow with the value count."""
+        sketch = LatencySketch(relative_accuracy=0.05)
+        for i in range(100000):
+            sketch.add(0.001 + (i % 1000) * 0.001)
+        assert len(sketch.bins) < 100
+        
+        capped = LatencySketch(relative_accuracy=0.01, max_bins=50)
+        for i in range(1, 10000):
+            capped.add(i * 1e-3)
+        assert len(capped.bins) == 50
+        assert capped.quantile(0.99) == pytest.approx(9.9, rel=0.02)
+    
+    def test_zero_values(self):
+        """Test that zero latencies are counted separately."""
+        sketch = LatencySketch()
+        for _ in range(3):
+            sketch.add(0.0)
+        sketch.add(1.0)
+        
+        assert sketch.zero_count == 3
+        assert sketch.quantile(0.5) == 0.0
+        assert sketch.quantile(1.0) == pytest.approx(1.0, rel=0.01)
+    
+    def test_merge(self):
+        """Test that merging two sketches equals sketching all values."""
+        a, b, both = LatencySketch(), LatencySketch(), LatencySketch()
+        for i in range(1, 1000):
+            (a if i % 2 else b).add(i / 100)
+            both.add(i / 100)
+        
+        a.merge(b)
+        assert a.count == both.count
+        assert a.bins == both.bins
+        assert a.min == both.min and a.max == both.max
+        assert a.quantile(0.9) == both.quantile(0.9)
+    
+    def test_merge_different_accuracy(self):
+        """Test that merging incompatible sketches raises ValueError."""
+        with pytest.raises(ValueError):
+            LatencySketch(0.01).merge(LatencySketch(0.02))
+    
+    def test_invalid_accuracy(self):
+        """Test that an invalid relative accuracy is rejected."""
+        with pytest.raises(ValueError):
+            LatencySketch(relative_accuracy=1.5)
+    
+    def test_to_dict(self):
+        """Test the summary dictionary."""
+        sketch = LatencySketch()
+        sketch.add(0.5)
+        summary = sketch.to_dict()
+        
+        assert summary["count"] == 1
+        assert summary["min"] == 0.5
+        assert summary["max"] == 0.5
+        assert summary["p50"] == pytest.approx(0.5)
+        assert set(summary) == {"count", "min", "max", "p50", "p90", "p99"}
+
+
+class TestFormatDuration:
+    """Test the format_duration function."""
+    
+    def test_units(self):
+        """Test that durations pick a readable unit."""
+        assert format_duration(2.5) == "2.5s"
+        assert format_duration(0.0123) == "12.3ms"
+        assert format_duration(0.000350) == "350us"
+        assert format_duration(4e-8) == "40ns"
+        assert format_duration(None) == "-"
@@ -0,0 +1,108 @@
+import pytest
+import os
+import random
+import tempfile
+from logfsm.fsm_builder import build_fsm, build_fsm_ids, decode_fsm
+from logfsm.paths import PathTrie
+from logfsm.symbols import SymbolTable
+from logfsm import spill
+from logfsm.spill import SpillSorter, build_fsm_external, build_fsm_ids_external
+from tests.conftest import make_event
+
+
+STATES = ["NEW", "ACKED", "PARTIAL", "FILLED", "CANCELED"]
+
+
+def make_events(n, seed=7):
+    rng = random.Random(seed)
+    events = []
+    for i in range(n):
+        # coarse timestamps so many events of an entity tie
+        secs = rng.randrange(20)
+        events.append(make_event(f"ORD{rng.randrange(40)}", f"2023-10-26T12:00:{secs:02d}.000",
+                                 rng.choice(["R1", "R2", None]), rng.choice(STATES)))
+    return events
+
+
+class TestSpillSorter:
+    """Test grouping records by entity through sorted runs."""
+    
+    def test_groups_in_memory(self):
+        """Test that nothing is spilled under the budget."""
+        with SpillSorter(10) as sorter:
+            sorter.add("B", 2, 1, 0)
+            sorter.add("A", 5, 1, 0)
+            sorter.add("B", 1, 2, 0)
+            assert sorter.runs == []
+            groups = list(sorter.groups())
+        
+        assert groups == [("A", [(5, 1, 0)]), ("B", [(1, 2, 0), (2, 1, 0)])]
+    
+    def test_spilled_runs_keep_tie_order(self):
+        """Test that merged runs are sorted and ties keep input order."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with SpillSorter(2, tmpdir) as sorter:
+                for i, eid in enumerate(["B", "A", "B", "A", "B"]):
+                    sorter.add(eid, 0 if i < 4 else -1, i, -1)
+                groups = list(sorter.groups())
+                assert len(sorter.runs) == 3
+            
+            assert os.listdir(tmpdir) == []
+        
+        assert groups == [("A", [(0, 1, -1), (0, 3, -1)]), ("B", [(-1, 4, -1), (0, 0, -1), (0, 2, -1)])]
+    
+    def test_merge_passes(self, monkeypatch):
+        """Test that runs beyond the fan-in are merged in passes."""
+        monkeypatch.setattr(spill, "MAX_FANIN", 3)
+        with SpillSorter(1) as sorter:
+            for i in range(10):
+                sorter.add(f"E{i % 3}", 10 - i, i, 0)
+            groups = dict(sorter.groups())
+            assert len(sorter.runs) <= 3
+        
+        assert [ev[1] for ev in groups["E0"]] == [9, 6, 3, 0]
+    
+    def test_non_ascii_entities(self):
+        """Test that entity ids survive the run files."""
+        with SpillSorter(1) as sorter:
+            sorter.add("ордер-1", 1, 0, 0)
+            sorter.add("注文", 2, 0, 0)
+            assert [eid for eid, _ in sorter.groups()] == sorted(["ордер-1", "注文"])
+    
+    def test_invalid_budget(self):
+        """Test that a budget below one record is rejected."""
+        with pytest.raises(ValueError):
+            SpillSorter(0)
+        assert SpillSorter.for_memory(0.00001).max_records == 1
+
+
+class TestExternalBuild:
+    """Test FSM building with external-memory grouping."""
+    
+    def test_build_fsm_external_matches(self):
+        """Test that spilled builds equal build_fsm, latency and paths included."""
+        events = make_events(2000)
+        expected_paths, paths = PathTrie(), PathTrie()
+        expected = build_fsm(events, "START", latency=True, paths=expected_paths)
+        
+        fsm = build_fsm_external(events, "START", latency=True, paths=paths, memory_mb=0.01)
+        
+        assert fsm.transitions == {s: dict(d) for s, d in expected.transitions.items()}
+        assert set(fsm.latencies) == set(expected.latencies)
+        edge = ("FILLED", "R1")
+        assert fsm.latencies["NEW"][edge].count == expected.latencies["NEW"][edge].count
+        assert sorted(paths.top()) == sorted(expected_paths.top())
+    
+    def test_build_fsm_ids_external_matches(self):
+        """Test that spilled id builds equal build_fsm_ids."""
+        symbols = SymbolTable(["START"] + STATES + ["R1", "R2", "UNKNOWN_RULE"])
+        records = [
+            (ev.entity_id, ev.timestamp, symbols.id_of(ev.state), symbols.id_of(ev.rule_name or "UNKNOWN_RULE"))
+            for ev in make_events(1000, seed=3)
+        ]
+        expected = build_fsm_ids(records, 0, symbols)
+        
+        fsm = build_fsm_ids_external(iter(records), 0, symbols, memory_mb=0.005)
+        
+        assert fsm.symbols is symbols
+        assert decode_fsm(fsm).transitions == decode_fsm(expected).transitions
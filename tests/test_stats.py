@@ -0,0 +1,96 @@
+import pytest
+import io
+import json
+import tempfile
+import os
+from logfsm.stats import PipelineStats, NullStats, NULL_STATS, peak_rss_mb
+
+
+class TestPipelineStats:
+    """Test the PipelineStats class."""
+    
+    def test_stage_timing_accumulates(self):
+        """Test that repeated stages add up."""
+        stats = PipelineStats()
+        with stats.stage("classify"):
+            sum(range(10000))
+        with stats.stage("classify"):
+            sum(range(10000))
+        
+        st = stats.stages["classify"]
+        assert st["wall_s"] > 0
+        assert st["cpu_s"] >= 0
+    
+    def test_track_lines_counts(self):
+        """Test that consumed lines are counted."""
+        stats = PipelineStats()
+        assert list(stats.track_lines(["a", "b", "c"])) == ["a", "b", "c"]
+        assert stats.counters["lines"] == 3
+    
+    def test_progress_reports(self):
+        """Test periodic progress lines."""
+        out = io.StringIO()
+        stats = PipelineStats(progress_every=2, stream=out)
+        list(stats.track_lines(["a"] * 5))
+        
+        reports = out.getvalue().splitlines()
+        assert len(reports) == 2
+        assert reports[0].startswith("[logfsm] 2 lines")
+        assert reports[1].startswith("[logfsm] 4 lines")
+    
+    def test_to_dict(self):
+        """Test derived metrics in the summary."""
+        stats = PipelineStats()
+        list(stats.track_lines(["x"] * 10))
+        stats.set("fsm_events", 4)
+        stats.set("entities", 2)
+        with stats.stage("read"):
+            pass
+        
+        data = stats.to_dict()
+        assert data["counters"] == {"lines": 10, "fsm_events": 4, "entities": 2}
+        assert data["match_ratio"] == pytest.approx(0.4)
+        assert "read" in data["stages"]
+        assert data["lines_per_s"] > 0
+    
+    def test_report(self):
+        """Test the stderr table and JSON report."""
+        out = io.StringIO()
+        stats = PipelineStats(stream=out)
+        list(stats.track_lines(["x"]))
+        with stats.stage("classify"):
+            pass
+        
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            path = f.name
+        try:
+            stats.report(to_stderr=True, json_path=path)
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        finally:
+            os.unlink(path)
+        
+        assert "classify" in out.getvalue()
+        assert "lines: 1" in out.getvalue()
+        assert data["counters"]["lines"] == 1
+    
+    def test_peak_rss(self):
+        """Test that peak RSS is reported where the platform supports it."""
+        rss = peak_rss_mb()
+        assert rss is None or rss > 0
+
+
+class TestNullStats:
+    """Test the disabled stats stand-in."""
+    
+    def test_noop(self):
+        """Test that every hook does nothing and passes lines through."""
+        lines = ["a", "b"]
+        assert NULL_STATS.track_lines(lines) is lines
+        with NULL_STATS.stage("x"):
+            pass
+        NULL_STATS.count("x")
+        NULL_STATS.set("y", 1)
+        NULL_STATS.report(True, None)
+        assert isinstance(NULL_STATS, NullStats)
+        assert not NULL_STATS.enabled
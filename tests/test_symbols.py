@@ -0,0 +1,29 @@
+import pytest
+from logfsm.symbols import SymbolTable
+
+
+class TestSymbolTable:
+    """Test the SymbolTable class."""
+    
+    def test_intern_assigns_dense_ids(self):
+        """Test that ids are assigned in first-seen order."""
+        table = SymbolTable()
+        assert table.intern("START") == 0
+        assert table.intern("NEW_REQUESTED") == 1
+        assert table.intern("START") == 0
+        assert len(table) == 2
+    
+    def test_lookup(self):
+        """Test mapping ids back to names."""
+        table = SymbolTable(["START", "FILLED"])
+        assert table.lookup(1) == "FILLED"
+        assert table.names == ["START", "FILLED"]
+    
+    def test_id_of_and_contains(self):
+        """Test looking up names without interning them."""
+        table = SymbolTable(["START"])
+        assert table.id_of("START") == 0
+        assert table.id_of("MISSING") is None
+        assert "START" in table
+        assert "MISSING" not in table
+        assert len(table) == 1
@@ -0,0 +1,196 @@
+import pytest
+import random
+from logfsm.config import Config
+from logfsm.rule_engine import compile_rules, classify_line, classify_line_ids
+from logfsm.templates import TemplateClassifier, digit_uniform
+
+
+RULES = [
+    {"name": "NEW_ORDER", "regex": r"(?i)newordersingle.*clordid=(?P<order_id>\w+).*venue=(?P<venue>\w+)", "state": "NEW"},
+    {"name": "ACK", "regex": r"(?i)executionreport.*exectype=0.*clordid=(?P<order_id>\w+)", "state": "ACKED"},
+    {"name": "FILL", "regex": r"(?i)executionreport.*exectype=f.*clordid=(?P<order_id>\w+)", "state": "FILLED"},
+    {"name": "REPLACE", "regex": r"(?i)cancelreplace.*clordid=(?P<order_id>\w+) origclordid=(?P<orig_id>\w+)", "state": "REPLACED"},
+    {"name": "REJECT", "regex": r"(?i)reject.*clordid=ord(?P<order_id>\d+)", "state": "REJECTED"},
+    {"name": "CANCEL", "fix": {"MsgType": "OrderCancelRequest"}, "capture": {"order_id": "ClOrdID", "orig_id": "OrigClOrdID"}, "state": "CANCELED"},
+]
+
+LINES = [
+    "2023-10-26T12:00:{s:02d}.000 INFO NewOrderSingle ClOrdID={id} Venue=XNYS qty={n}",
+    "2023-10-26T12:00:{s:02d}.000 INFO NewOrderSingle ClOrdID={id} Venue={venue} qty={n}",
+    "2023-10-26T12:00:{s:02d}.000 INFO ExecutionReport ExecType=0 ClOrdID={id}",
+    "2023-10-26T12:00:{s:02d}.000 INFO ExecutionReport ExecType=F ClOrdID={id} LastQty={n}",
+    "2023-10-26T12:00:{s:02d}.000 INFO ExecutionReport ExecType=4 ClOrdID={id}",
+    "2023-10-26T12:00:{s:02d}.000 INFO CancelReplace ClOrdID={id} OrigClOrdID={other}",
+    "2023-10-26T12:00:{s:02d}.000 WARN Reject ClOrdID={id}",
+    "35=F|11={id}|41={other}|",
+    "2023-10-26T12:00:{s:02d}.000 INFO heartbeat seq={n}",
+]
+
+
+def make_lines(n, seed=1):
+    rng = random.Random(seed)
+    ids = ["ORD%05d" % i for i in range(30)] + ["A%d" % i for i in range(10)]
+    return [
+        rng.choice(LINES).format(s=i % 60, id=rng.choice(ids), other=rng.choice(ids),
+                                 n=rng.randrange(1000), venue=rng.choice(["XNAS", "X2"]))
+        for i in range(n)
+    ]
+
+
+def make_config(rules=RULES):
+    return Config({
+        "signal_rules": rules,
+        "entity_id_field": "order_id",
+        "alias_fields": ["orig_id"],
+        "dimensions": ["venue"],
+    })
+
+
+# the same rules without any literal digit, so no regex rule tells digits apart
+DIGITLESS = [dict(rule, regex=rule["regex"].replace("exectype=0", "exectype=new")) if "regex" in rule else rule
+             for rule in RULES]
+
+
+class TestDigitUniform:
+    """Test which rule patterns treat every digit alike."""
+    
+    @pytest.mark.parametrize("regex", [
+        r"(?i)newordersingle.*clordid=(?P<order_id>\w+)",
+        r"code=\d{3} (?P<order_id2>[A-Z0-9]+)",
+        r"[^0-9]+ [\w.-]+ [!-~] \S\b",
+        r"(?<=id=)ORD\w+",
+    ])
+    def test_uniform(self, regex):
+        """Test patterns that match every digit or none at each step."""
+        assert digit_uniform(regex)
+    
+    @pytest.mark.parametrize("regex", [
+        r"exectype=0",
+        r"code=[45]\d\d",
+        r"[1-9]\d*",
+        r"(?P<a>\d)(?P=a)",
+        r"(\d)\1",
+        r"\x30",
+        r"[\x30-\x39]",
+    ])
+    def test_tells_digits_apart(self, regex):
+        """Test patterns with a literal digit, a partial class or a backreference."""
+        assert not digit_uniform(regex)
+    
+    def test_template_masks_digits_only(self):
+        """Test that templates keep every non-digit character in place."""
+        cfg = make_config()
+        classifier = TemplateClassifier(compile_rules(cfg), cfg)
+        
+        assert classifier.template("ORD123 x9") == classifier.template("ORD456 x0")
+        assert classifier.template("ORD123") != classifier.template("ABC123")
+        assert len(classifier.template("ORD123")) == 6
+        assert classifier.sensitive == [False, True, False, False, False, True]
+
+
+class TestTemplateClassifier:
+    """Test classification once per line template."""
+    
+    @pytest.mark.parametrize("rules", [RULES, DIGITLESS])
+    def test_matches_classify_line(self, rules):
+        """Test that every line classifies as classify_line and classify_line_ids would."""
+        cfg = make_config(rules)
+        compiled = compile_rules(cfg)
+        classifier = TemplateClassifier(compiled, cfg)
+        lines = make_lines(3000)
+        
+        for ln in lines:
+            assert classifier.classify(ln) == classify_line(ln, compiled, cfg)
+            assert classifier.classify_ids(ln) == classify_line_ids(ln, compiled)
+        
+        assert classifier.hits > classifier.misses
+        assert len(classifier) == classifier.misses
+    
+    def test_captures_by_position(self):
+        """Test that later lines of a template take their own captured values."""
+        cfg = make_config()
+        compiled = compile_rules(cfg)
+        classifier = TemplateClassifier(compiled, cfg)
+        
+        first = classifier.classify("2023-10-26T12:00:01.000 INFO CancelReplace ClOrdID=ORD00001 OrigClOrdID=ORD00002")
+        second = classifier.classify("2023-10-26T12:00:02.000 INFO CancelReplace ClOrdID=ORD00003 OrigClOrdID=ORD00004")
+        
+        assert (classifier.hits, classifier.misses) == (1, 1)
+        assert (first.entity_id, first.aliases) == ("ORD00001", ("ORD00002",))
+        assert (second.entity_id, second.aliases) == ("ORD00003", ("ORD00004",))
+        assert second.timestamp == "2023-10-26T12:00:02.000"
+    
+    def test_captures_within_numbers(self):
+        """Test captures that start or end inside a run of digits."""
+        cfg = make_config()
+        compiled = compile_rules(cfg)
+        classifier = TemplateClassifier(compiled, cfg)
+        
+        entities = [classifier.classify(f"WARN Reject ClOrdID=ORD0000{i}").entity_id for i in range(3)]
+        
+        assert entities == ["00000", "00001", "00002"]
+        assert (classifier.hits, classifier.misses) == (2, 1)
+    
+    def test_rule_telling_digits_apart_before_cached_rule(self):
+        """Test that an earlier rule with a digit class is evaluated on every hit."""
+        rules = [
+            {"name": "ERR", "regex": r"req (?P<order_id>\w+) code=[45]\d\d", "state": "ERR"},
+            {"name": "OK", "regex": r"req (?P<order_id>\w+) code=\d+", "state": "OK"},
+        ]
+        cfg = make_config(rules)
+        compiled = compile_rules(cfg)
+        classifier = TemplateClassifier(compiled, cfg)
+        
+        first = classifier.classify("req 17 code=200")
+        second = classifier.classify("req 18 code=404")
+        
+        assert (first.state, first.entity_id) == ("OK", "17")
+        assert (second.state, second.entity_id) == ("ERR", "18")
+        assert (classifier.hits, classifier.misses) == (1, 1)
+    
+    def test_literal_prefix_before_cached_rule(self):
+        """Test that ids differing in their letters do not share a template."""
+        rules = [
+            {"name": "A", "regex": r"order (?P<order_id>ORD\w+) status", "state": "A"},
+            {"name": "B", "regex": r"order (?P<order_id>\w+) status", "state": "B"},
+        ]
+        cfg = make_config(rules)
+        compiled = compile_rules(cfg)
+        classifier = TemplateClassifier(compiled, cfg)
+        
+        first = classifier.classify("order ABC12345 status")
+        second = classifier.classify("order ORD12345 status")
+        
+        assert (first.state, first.entity_id) == ("B", "ABC12345")
+        assert (second.state, second.entity_id) == ("A", "ORD12345")
+    
+    def test_cached_rule_telling_digits_apart(self):
+        """Test that a line the cached rule no longer matches falls through to later rules."""
+        cfg = make_config()
+        compiled = compile_rules(cfg)
+        classifier = TemplateClassifier(compiled, cfg)
+        
+        ack = classifier.classify("ExecutionReport ExecType=0 ClOrdID=ORD1")
+        other = classifier.classify("ExecutionReport ExecType=4 ClOrdID=ORD2")
+        
+        assert (ack.state, ack.entity_id) == ("ACKED", "ORD1")
+        assert other.state is None
+        assert (classifier.hits, classifier.misses) == (1, 1)
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used template is evicted at capacity."""
+        cfg = make_config()
+        compiled = compile_rules(cfg)
+        classifier = TemplateClassifier(compiled, cfg, capacity=2)
+        
+        for ln in ["heartbeat", "ExecutionReport ExecType=4", "heartbeat", "Logon", "heartbeat", "ExecutionReport ExecType=4"]:
+            classifier.match(ln)
+        
+        assert len(classifier) == 2
+        assert (classifier.hits, classifier.misses) == (2, 4)
+    
+    def test_invalid_capacity(self):
+        """Test that a capacity below one template is rejected."""
+        cfg = make_config()
+        with pytest.raises(ValueError):
+            TemplateClassifier(compile_rules(cfg), cfg, capacity=0)
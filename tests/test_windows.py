@@ -0,0 +1,125 @@
+import pytest
+from logfsm.windows import iter_window_fsms, diff_fsms
+from logfsm.models import FSM
+from logfsm.normalizer import timestamp_to_ns
+from tests.conftest import make_event
+
+
+EVENTS = [
+    make_event("ORDER1", "2023-10-26T12:00:10.0", "NEW_ORDER", "NEW_REQUESTED"),
+    make_event("ORDER2", "2023-10-26T12:02:00.0", "NEW_ORDER", "NEW_REQUESTED"),
+    make_event("ORDER1", "2023-10-26T12:04:59.0", "ACK_NEW", "ACKED_NEW"),
+    make_event("ORDER2", "2023-10-26T12:06:00.0", "REJECT", "REJECTED"),
+    make_event("ORDER1", "2023-10-26T12:16:00.0", "FILLED", "FILLED"),
+]
+
+
+class TestIterWindowFSMs:
+    """Test the iter_window_fsms function."""
+    
+    def test_tumbling_windows(self):
+        """Test 5-minute tumbling windows."""
+        windows = list(iter_window_fsms(EVENTS, "START", 300))
+        
+        assert [start for start, _ in windows] == [
+            timestamp_to_ns("2023-10-26T12:00:00.0"),
+            timestamp_to_ns("2023-10-26T12:05:00.0"),
+            timestamp_to_ns("2023-10-26T12:15:00.0"),
+        ]
+        assert windows[0][1].transitions == {
+            "START": {("NEW_REQUESTED", "NEW_ORDER"): 2},
+            "NEW_REQUESTED": {("ACKED_NEW", "ACK_NEW"): 1},
+        }
+        assert windows[1][1].transitions == {
+            "NEW_REQUESTED": {("REJECTED", "REJECT"): 1},
+        }
+        assert windows[2][1].transitions == {
+            "ACKED_NEW": {("FILLED", "FILLED"): 1},
+        }
+    
+    def test_sliding_windows(self):
+        """Test that sliding windows count a transition in every window covering it."""
+        windows = dict(iter_window_fsms(EVENTS[:2], "START", 300, 120))
+        
+        # 12:00:10 falls in windows starting 11:56, 11:58 and 12:00;
+        # 12:02:00 falls in windows starting 11:58, 12:00 and 12:02
+        counts = {
+            start: fsm.transitions["START"][("NEW_REQUESTED", "NEW_ORDER")]
+            for start, fsm in windows.items()
+        }
+        assert counts == {
+            timestamp_to_ns("2023-10-26T11:56:00.0"): 1,
+            timestamp_to_ns("2023-10-26T11:58:00.0"): 2,
+            timestamp_to_ns("2023-10-26T12:00:00.0"): 2,
+            timestamp_to_ns("2023-10-26T12:02:00.0"): 1,
+        }
+    
+    def test_windows_close_incrementally(self):
+        """Test that a window is yielded before later events are consumed."""
+        consumed = []
+        
+        def stream():
+            for ev in EVENTS:
+                consumed.append(ev)
+                yield ev
+        
+        it = iter_window_fsms(stream(), "START", 300)
+        next(it)
+        assert len(consumed) == 4
+    
+    def test_window_totals_match_transitions(self):
+        """Test that tumbling windows partition all transitions."""
+        total = 0
+        for _, fsm in iter_window_fsms(EVENTS, "START", 60):
+            total += sum(sum(d.values()) for d in fsm.transitions.values())
+        assert total == len(EVENTS)
+    
+    def test_late_event_for_closed_window_is_dropped(self):
+        """Test that a transition for an already emitted window is not counted."""
+        events = EVENTS[:4] + [make_event("ORDER3", "2023-10-26T12:01:00.0", "NEW_ORDER", "NEW_REQUESTED")]
+        windows = list(iter_window_fsms(events, "START", 300))
+        
+        assert windows[0][1].transitions["START"] == {("NEW_REQUESTED", "NEW_ORDER"): 2}
+        assert len(windows) == 2
+    
+    def test_events_without_timestamp_update_state_only(self):
+        """Test that untimed events advance the entity state without being counted."""
+        events = [
+            make_event("ORDER1", "", "NEW_ORDER", "NEW_REQUESTED"),
+            make_event("ORDER1", "2023-10-26T12:00:10.0", "ACK_NEW", "ACKED_NEW"),
+        ]
+        windows = list(iter_window_fsms(events, "START", 300))
+        
+        assert len(windows) == 1
+        assert windows[0][1].transitions == {"NEW_REQUESTED": {("ACKED_NEW", "ACK_NEW"): 1}}
+    
+    def test_invalid_window(self):
+        """Test that non-positive sizes are rejected."""
+        with pytest.raises(ValueError):
+            list(iter_window_fsms(EVENTS, "START", 0))
+
+
+class TestDiffFSMs:
+    """Test the diff_fsms function."""
+    
+    def test_diff(self):
+        """Test count deltas between two FSMs."""
+        before = FSM(transitions={
+            "START": {("NEW_REQUESTED", "NEW_ORDER"): 5, ("REJECTED", "REJECT"): 1},
+            "NEW_REQUESTED": {("ACKED_NEW", "ACK_NEW"): 4},
+        })
+        after = FSM(transitions={
+            "START": {("NEW_REQUESTED", "NEW_ORDER"): 5, ("REJECTED", "REJECT"): 7},
+            "ACKED_NEW": {("FILLED", "FILLED"): 2},
+        })
+        
+        assert diff_fsms(before, after).transitions == {
+            "START": {("REJECTED", "REJECT"): 6},
+            "NEW_REQUESTED": {("ACKED_NEW", "ACK_NEW"): -4},
+            "ACKED_NEW": {("FILLED", "FILLED"): 2},
+        }
+    
+    def test_diff_identical(self):
+        """Test that identical FSMs have an empty diff."""
+        fsm = FSM(transitions={"START": {("NEW_REQUESTED", "NEW_ORDER"): 5}})
+        assert diff_fsms(fsm, fsm).transitions == {}
@@ -0,0 +1,173 @@
+import pytest
+import io
+import csv
+import json
+import os
+import tempfile
+from logfsm.models import FSM, ClassifiedEvent
+from logfsm.fsm_builder import build_fsm, fsm_to_dot, fsm_from_dict
+from logfsm.writers import (
+    select_edges, write_dot, write_json, write_csv, write_npz, read_npz, write_fsm_file
+)
+
+
+TRANSITIONS = {
+    "START": {("NEW_REQUESTED", "NEW_ORDER"): 10, ("REJECTED", "REJECT"): 1},
+    "NEW_REQUESTED": {("ACKED_NEW", "ACK_NEW"): 9, ("REJECTED", "REJECT"): 2, ("NEW_REQUESTED", "RETRY"): 5},
+}
+
+
+class TestSelectEdges:
+    """Test edge pruning."""
+    
+    def test_all_edges_by_default(self):
+        """Test that no pruning keeps every edge in order."""
+        edges = [e[:4] for e in select_edges(FSM(transitions=TRANSITIONS))]
+        
+        assert len(edges) == 5
+        assert edges[0] == ("START", "NEW_REQUESTED", "NEW_ORDER", 10)
+    
+    def test_min_count(self):
+        """Test dropping edges below a count threshold."""
+        edges = [e[:4] for e in select_edges(FSM(transitions=TRANSITIONS), min_count=5)]
+        
+        assert [e[3] for e in edges] == [10, 9, 5]
+    
+    def test_top_k_per_state(self):
+        """Test keeping the most frequent edges out of each state."""
+        edges = [e[:4] for e in select_edges(FSM(transitions=TRANSITIONS), top_k=2)]
+        
+        assert edges == [
+            ("START", "NEW_REQUESTED", "NEW_ORDER", 10),
+            ("START", "REJECTED", "REJECT", 1),
+            ("NEW_REQUESTED", "ACKED_NEW", "ACK_NEW", 9),
+            ("NEW_REQUESTED", "NEW_REQUESTED", "RETRY", 5),
+        ]
+
+
+class TestTextWriters:
+    """Test the streamed DOT, JSON and CSV writers."""
+    
+    def test_write_dot_matches_fsm_to_dot(self):
+        """Test that unpruned streamed DOT equals fsm_to_dot."""
+        fsm = FSM(transitions=TRANSITIONS)
+        out = io.StringIO()
+        
+        assert write_dot(fsm, out) == 5
+        assert out.getvalue() == fsm_to_dot(fsm) + "\n"
+    
+    def test_write_dot_pruned(self):
+        """Test DOT output with pruning options."""
+        out = io.StringIO()
+        
+        assert write_dot(FSM(transitions=TRANSITIONS), out, min_count=2, top_k=1) == 2
+        assert '"START" -> "REJECTED"' not in out.getvalue()
+    
+    def test_write_json_round_trip(self):
+        """Test that streamed JSON loads back into the same counts."""
+        out = io.StringIO()
+        write_json(FSM(transitions=TRANSITIONS), out)
+        
+        assert fsm_from_dict(json.loads(out.getvalue())).transitions == TRANSITIONS
+    
+    def test_write_json_empty(self):
+        """Test streamed JSON for an FSM without edges."""
+        out = io.StringIO()
+        
+        assert write_json(FSM(transitions={}), out) == 0
+        assert json.loads(out.getvalue()) == {"transitions": []}
+    
+    def test_write_csv(self):
+        """Test the CSV edge list."""
+        out = io.StringIO()
+        write_csv(FSM(transitions=TRANSITIONS), out)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        
+        assert rows[0] == ["from", "to", "trigger", "count"]
+        assert rows[1] == ["START", "NEW_REQUESTED", "NEW_ORDER", "10"]
+        assert len(rows) == 6
+    
+    def test_write_csv_latency_columns(self):
+        """Test that latency quantile columns are added when tracked."""
+        events = [
+            ClassifiedEvent("l1", "n1", "2023-10-26T12:00:00.000", "ORDER1", "NEW_ORDER", "NEW_REQUESTED"),
+            ClassifiedEvent("l2", "n2", "2023-10-26T12:00:00.500", "ORDER1", "ACK_NEW", "ACKED_NEW"),
+        ]
+        out = io.StringIO()
+        write_csv(build_fsm(events, "START", latency=True), out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        
+        assert rows[0]["p50_s"] == ""
+        assert float(rows[1]["p50_s"]) == pytest.approx(0.5, rel=0.02)
+
+
+class TestNpzWriter:
+    """Test the NPZ adjacency writer."""
+    
+    def test_round_trip(self):
+        """Test that read_npz restores the counts."""
+        out = io.BytesIO()
+        
+        assert write_npz(FSM(transitions=TRANSITIONS), out) == 5
+        out.seek(0)
+        assert read_npz(out).transitions == TRANSITIONS
+    
+    def test_npy_layout(self):
+        """Test that array members follow the .npy v1.0 layout."""
+        import zipfile
+        out = io.BytesIO()
+        write_npz(FSM(transitions=TRANSITIONS), out)
+        
+        with zipfile.ZipFile(out) as zf:
+            assert sorted(zf.namelist()) == sorted(
+                ["from.npy", "to.npy", "trigger.npy", "count.npy", "states.npy", "triggers.npy"])
+            data = zf.read("count.npy")
+        
+        header_len = int.from_bytes(data[8:10], "little")
+        assert data.startswith(b"\x93NUMPY\x01\x00")
+        assert (10 + header_len) % 64 == 0
+        assert b"'descr': '<i8'" in data[10:10 + header_len]
+        assert len(data) - 10 - header_len == 5 * 8
+    
+    def test_numpy_load(self):
+        """Test that numpy reads the file when it is installed."""
+        np = pytest.importorskip("numpy")
+        out = io.BytesIO()
+        write_npz(FSM(transitions=TRANSITIONS), out)
+        out.seek(0)
+        
+        data = np.load(out)
+        assert data["count"].sum() == 27
+        assert list(data["states"][data["from"][:2]]) == ["START", "START"]
+    
+    def test_read_invalid(self):
+        """Test that a zip without the FSM arrays is rejected."""
+        import zipfile
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, "w") as zf:
+            zf.writestr("other.txt", "x")
+        out.seek(0)
+        
+        with pytest.raises(ValueError):
+            read_npz(out)
+
+
+class TestWriteFsmFile:
+    """Test writing an FSM to a path by format name."""
+    
+    def test_formats(self):
+        """Test that each format writes its file."""
+        fsm = FSM(transitions=TRANSITIONS)
+        for fmt in ("dot", "json", "csv", "npz"):
+            with tempfile.NamedTemporaryFile(suffix=f'.{fmt}', delete=False) as f:
+                path = f.name
+            try:
+                assert write_fsm_file(fsm, path, fmt, top_k=1) == 2
+                assert os.path.getsize(path) > 0
+            finally:
+                os.unlink(path)
+    
+    def test_unknown_format(self):
+        """Test that an unknown format is rejected."""
+        with pytest.raises(ValueError):
+            write_fsm_file(FSM(transitions={}), "out.xyz", "xyz")